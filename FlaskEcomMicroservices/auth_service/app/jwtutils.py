@@ -1,5 +1,8 @@
+import hashlib
 import json
 import logging
+import threading
+import time
 
 import jwt
 import datetime
@@ -10,6 +13,10 @@ ALGORITHM = "HS256"
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Digests of revoked tokens mapped to their expiry; entries are pruned once the token would have expired anyway
+_revoked_tokens = {}
+_revoked_lock = threading.Lock()
+
 
 def create_token(identity):
     payload = {
@@ -31,3 +38,26 @@ def decode_token(token):
     except jwt.InvalidTokenError as e:
         logging.error(f"Invalid token: {e}")
         return {"error": "Invalid token"}
+
+
+def _token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def revoke_token(token):
+    try:
+        exp = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})["exp"]
+    except jwt.InvalidTokenError:
+        return False
+
+    now = time.time()
+    with _revoked_lock:
+        for digest in [d for d, expires in _revoked_tokens.items() if expires <= now]:
+            del _revoked_tokens[digest]
+        _revoked_tokens[_token_digest(token)] = exp
+    return True
+
+
+def is_token_revoked(token):
+    with _revoked_lock:
+        return _token_digest(token) in _revoked_tokens
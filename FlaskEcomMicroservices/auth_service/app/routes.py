@@ -1,11 +1,12 @@
 import logging
 
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, g
 from prometheus_client import generate_latest, Counter
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from .jwtutils import create_token, decode_token
+from .jwtutils import create_token, decode_token, revoke_token, is_token_revoked
 from .models import Customer, db
+from .streaming import STREAM_BATCH_SIZE, stream_rows
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,6 +17,22 @@ auth_bp = Blueprint('auth', __name__)
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP Requests')
 
 
+TRACE_HEADER = 'X-Request-ID'
+
+
+@auth_bp.before_request
+def start_trace():
+    # Correlation id generated by view_service for the page this call belongs to
+    g.trace_id = request.headers.get(TRACE_HEADER, '-')
+    logger.info(f"{request.method} {request.path} trace_id={g.trace_id}")
+
+
+@auth_bp.after_request
+def finish_trace(response):
+    response.headers[TRACE_HEADER] = g.get('trace_id', '-')
+    return response
+
+
 @auth_bp.route('/metrics')
 def metrics():
     return Response(generate_latest(), mimetype='text/plain; version=0.0.4')
@@ -150,17 +167,16 @@ def get_customers():
     logger.info("Fetching all customers")
 
     try:
-        customers = Customer.query.all()
+        # Streamed from a server-side cursor instead of building the whole list in memory
+        customers = iter(Customer.query.order_by(Customer.id).yield_per(STREAM_BATCH_SIZE))
 
-        customer_list = [{
+        logger.info("Streaming all customers")
+        return stream_rows(customers, lambda customer: {
             'id': customer.id,
             'email': customer.email,
             'username': customer.username,
             'date_joined': customer.date_joined
-        } for customer in customers]
-
-        logger.info("Fetched all customers successfully")
-        return jsonify(customer_list)
+        })
     except Exception as e:
         logger.error(f"Error fetching customers: {str(e)}")
         return jsonify({'message': f'Error fetching customers: {str(e)}'}), 500
@@ -176,6 +192,9 @@ def validate_token():
     if not token:
         return jsonify({'error': 'Token is required'}), 400
 
+    if is_token_revoked(token):
+        return jsonify({'error': 'Token has been revoked'}), 401
+
     try:
         logging.info(token)
         # Decode the token using Flask-JWT-Extended
@@ -193,3 +212,21 @@ def validate_token():
     except Exception as e:
         logging.error(f"Token validation failed: {e}")
         return jsonify({'error': 'Invalid or expired token'}), 401
+
+
+@auth_bp.route('/auth/revoke-token', methods=['POST'])
+def revoke():
+    REQUEST_COUNT.inc()
+    """
+    Endpoint to revoke a JWT token (e.g. on logout) so that consumers verifying tokens locally reject it
+    on their next revocation check.
+    """
+    token = request.json.get('token')
+    if not token:
+        return jsonify({'error': 'Token is required'}), 400
+
+    if not revoke_token(token):
+        return jsonify({'error': 'Invalid token'}), 400
+
+    logger.info("Token revoked")
+    return jsonify({'message': 'Token revoked'}), 200
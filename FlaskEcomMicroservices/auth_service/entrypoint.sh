@@ -1,7 +1,7 @@
 #!/bin/sh
 
 # Run migrations before starting the app
-flask db upgrade
+flask --app main db upgrade
 
 # Start the Flask app
 exec python main.py
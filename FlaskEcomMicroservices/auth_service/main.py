@@ -5,7 +5,8 @@ from flask_migrate import Migrate
 from app.models import db
 
 app = create_app()
-migrate = Migrate(app, db)
+# Services share one database, so each tracks its migrations in its own version table
+migrate = Migrate(app, db, version_table='alembic_version_auth')
 
 if __name__ == '__main__':
     start_http_server(8000)
@@ -0,0 +1,26 @@
+"""Ensure the unique index on customer email
+
+Revision ID: 0e94c1d6b3a7
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0e94c1d6b3a7'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # customer.email is declared UNIQUE in cmd/cmd.md, but databases created by hand may lack it. Postgres
+    # names the index behind that constraint customer_email_key, so this is a no-op where it already exists.
+    op.create_index('customer_email_key', 'customer', ['email'], unique=True, if_not_exists=True)
+
+
+def downgrade():
+    # Left in place: on most databases it backs the UNIQUE constraint from the original DDL
+    pass
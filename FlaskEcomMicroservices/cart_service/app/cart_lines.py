@@ -0,0 +1,21 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import Cart, db
+
+"""
+Cart line writes as single atomic statements (the monolith has the same upsert in website/cart_lines.py)
+"""
+
+
+def add_cart_line(customer_id, product_id, quantity=1):
+    """
+    Add quantity of a product to a customer's cart with one INSERT ... ON CONFLICT DO UPDATE, so concurrent
+    adds of the same product land on a single line and none of them is lost. Commits with the caller.
+
+    :return: the line's quantity after the add
+    """
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(Cart).values(customer_link=customer_id, product_link=product_id, quantity=quantity)
+    statement = statement.on_conflict_do_update(index_elements=[Cart.customer_link, Cart.product_link],
+                                                set_={'quantity': Cart.quantity + statement.excluded.quantity})
+    return db.session.execute(statement.returning(Cart.quantity)).scalar_one()
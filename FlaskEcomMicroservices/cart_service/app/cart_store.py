@@ -0,0 +1,432 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import bindparam, case
+
+from .cart_lines import add_cart_line
+from .cart_summary import SHIPPING_FEE, cart_summary
+from .models import Cart, Product, db
+from .versions import cart_resource, current_version, bump_version, resource_etag
+
+"""
+Where cart lines live: straight in SQL, or in memory with write-behind to SQL (CART_STORE=sql|memory)
+"""
+
+logger = logging.getLogger(__name__)
+
+# Product fields a cart line needs; the cart read never loads the rest of the product row
+CART_PRODUCT_COLUMNS = (Product.id, Product.product_name, Product.current_price, Product.product_picture,
+                        Product.in_stock)
+
+
+def cart_body(lines, products):
+    """
+    :param lines: (line_id, product_id, quantity) in line order
+    :param products: {product_id: {column: value}}; lines of products not in it are left out
+    """
+    items = []
+    amount = 0
+    for line_id, product_id, quantity in lines:
+        product = products.get(product_id)
+        if product is None:
+            continue
+        items.append({'id': line_id, 'product_link': product_id, 'quantity': quantity, 'product': product})
+        amount += product['current_price'] * quantity
+    return {'items': items, 'amount': amount, 'shipping': SHIPPING_FEE, 'total': amount + SHIPPING_FEE}
+
+
+class SQLCartStore:
+    """
+    Every change is its own transaction against the cart table, bumping the cart's version counter.
+    """
+
+    def add(self, user_id, product_id, quantity):
+        line_quantity = add_cart_line(user_id, product_id, quantity)
+        bump_version(cart_resource(user_id))
+        db.session.commit()
+        return line_quantity
+
+    def owner(self, line_id):
+        return db.session.query(Cart.customer_link).filter(Cart.id == line_id).scalar()
+
+    def change(self, user_id, deltas, removals):
+        """
+        Apply quantity deltas to, and remove, some of the user's lines; lines dropping to zero are removed.
+
+        :return: {line_id: resulting quantity, 0 once removed} for every requested line
+        """
+        owned = Cart.query.filter(Cart.customer_link == user_id)
+        if deltas:
+            owned.filter(Cart.id.in_(deltas)).update(
+                {Cart.quantity: Cart.quantity + case(deltas, value=Cart.id, else_=0)}, synchronize_session=False)
+        owned.filter(Cart.id.in_(set(deltas) | removals),
+                     (Cart.quantity <= 0) | Cart.id.in_(removals)).delete(synchronize_session=False)
+        bump_version(cart_resource(user_id))
+        db.session.commit()
+
+        requested = set(deltas) | removals
+        quantities = dict(db.session.query(Cart.id, Cart.quantity)
+                          .filter(Cart.customer_link == user_id, Cart.id.in_(requested)).all())
+        return {line_id: quantities.get(line_id, 0) for line_id in requested}
+
+    def version(self, user_id):
+        name = cart_resource(user_id)
+        return resource_etag(name, current_version(name))
+
+    def read(self, user_id):
+        # Lines and their products from one joined query
+        rows = db.session.query(Cart.id.label('line_id'), Cart.quantity, *CART_PRODUCT_COLUMNS) \
+            .join(Product, Cart.product_link == Product.id) \
+            .filter(Cart.customer_link == user_id).order_by(Cart.id).all()
+        products = {row.id: {column.key: getattr(row, column.key) for column in CART_PRODUCT_COLUMNS}
+                    for row in rows}
+        return cart_body([(row.line_id, row.id, row.quantity) for row in rows], products)
+
+    def summary(self, user_id):
+        return cart_summary(user_id)
+
+
+class _MemoryCart:
+    def __init__(self, lines, sql_version):
+        self.lines = lines  # line_id -> [product_id, quantity]
+        self.sql_version = sql_version
+        self.version = 0
+
+
+class MemoryCartStore:
+    """
+    Carts held in this process and written to SQL in the background.
+
+    A user's cart is loaded from SQL on first use. Quantity changes are applied in memory and appended to a
+    journal; a flusher thread writes the latest quantity of every changed line to SQL in one batch every
+    CART_FLUSH_INTERVAL seconds. Adding a product that isn't in the cart yet is written through, since the
+    line id the pages address comes from the cart table.
+
+    Crash recovery: the journal records absolute quantities, so replaying it is idempotent. It is split
+    into segments; a segment is deleted only once a flush covering it has committed, and on startup the
+    surviving segments are replayed on top of SQL before any cart is served. That only helps if
+    CART_JOURNAL_DIR outlives the process, i.e. sits on a persistent volume.
+
+    Writes from elsewhere (order_service clearing the cart at checkout) bump the cart's version counter in
+    SQL, which this store never does itself; every operation on a cart first checks that counter, and a new
+    version flushes and reloads the cart.
+
+    SQL work for a cart (loading it, writing a new line through) happens under a lock striped by user, so it
+    only holds up requests for the same few carts; the store-wide lock only guards the in-memory state.
+
+    The state is per process: run cart_service as a single process per replica with CART_STORE=memory.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, app, journal_dir, flush_interval, max_carts, fsync):
+        self.app = app
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.max_carts = max_carts
+        self.fsync = fsync
+        # Part of every ETag, so a version number reused after a restart never matches an old response
+        self.instance = uuid.uuid4().hex[:8]
+
+        self._carts = OrderedDict()  # user_id -> _MemoryCart, least recently used first
+        self._owners = {}  # line_id -> user_id
+        self._pending = {}  # line_id -> (user_id, product_id, quantity); quantity 0 deletes the line
+        self._flushing = {}  # the batch being written to SQL, same shape as _pending
+        self._flushes = 0  # flushes committed so far
+        self._lock = threading.RLock()
+        self._user_locks = [threading.RLock() for _ in range(self.LOCK_STRIPES)]
+        self._flush_lock = threading.Lock()
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._recover()
+        self._segment = self._next_segment()
+        self._journal = open(self._segment_path(self._segment), 'a')
+
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='cart-flusher', daemon=True)
+        self._flusher.start()
+
+    # Store interface
+
+    def add(self, user_id, product_id, quantity):
+        with self._user_lock(user_id):
+            for attempt in range(2):
+                cart = self._cart(user_id)
+                with self._lock:
+                    line_id = next((line_id for line_id, (line_product, _) in cart.lines.items()
+                                    if line_product == product_id), None)
+                    if line_id is not None and cart.lines[line_id][1] > 0:
+                        return self._set(user_id, cart, line_id, cart.lines[line_id][1] + quantity)
+                if line_id is None or attempt:
+                    return self._create(user_id, cart, product_id, quantity)
+                # Removed, but the delete hasn't reached SQL yet: let it land before the line is created again
+                self.flush()
+
+    def owner(self, line_id):
+        with self._lock:
+            user_id = self._owners.get(line_id)
+        if user_id is not None:
+            # The cart may have been cleared elsewhere since it was loaded
+            with self._user_lock(user_id):
+                self._refresh(user_id)
+            with self._lock:
+                user_id = self._owners.get(line_id)
+        if user_id is None:
+            user_id = db.session.query(Cart.customer_link).filter(Cart.id == line_id).scalar()
+        return user_id
+
+    def change(self, user_id, deltas, removals):
+        with self._user_lock(user_id):
+            cart = self._cart(user_id)
+            with self._lock:
+                quantities = {}
+                for line_id in set(deltas) | removals:
+                    line = cart.lines.get(line_id)
+                    if line is None or line[1] <= 0:
+                        quantities[line_id] = 0
+                        continue
+                    quantity = 0 if line_id in removals else max(line[1] + deltas[line_id], 0)
+                    quantities[line_id] = self._set(user_id, cart, line_id, quantity)
+                return quantities
+
+    def version(self, user_id):
+        with self._user_lock(user_id):
+            cart = self._cart(user_id)
+            with self._lock:
+                return f'{cart_resource(user_id)}-{cart.sql_version}.{self.instance}.{cart.version}'
+
+    def read(self, user_id):
+        with self._user_lock(user_id):
+            cart = self._cart(user_id)
+            with self._lock:
+                lines = [(line_id, product_id, quantity)
+                         for line_id, (product_id, quantity) in sorted(cart.lines.items()) if quantity > 0]
+        return cart_body(lines, self._products({product_id for _, product_id, _ in lines}))
+
+    def summary(self, user_id):
+        body = self.read(user_id)
+        return {'lines': len(body['items']), 'items': sum(item['quantity'] for item in body['items']),
+                'amount': body['amount'], 'shipping': body['shipping'], 'total': body['total']}
+
+    # Memory
+
+    def _user_lock(self, user_id):
+        return self._user_locks[hash(user_id) % self.LOCK_STRIPES]
+
+    def _cart(self, user_id):
+        """
+        The user's cart, current with SQL's version counter. Call with the user's lock held.
+        """
+        self._refresh(user_id)
+        while True:
+            with self._lock:
+                cart = self._carts.get(user_id)
+                if cart is not None:
+                    self._carts.move_to_end(user_id)
+                    return cart
+                flushes = self._flushes
+
+            sql_version = current_version(cart_resource(user_id))
+            lines = {line_id: [product_id, quantity] for line_id, product_id, quantity in
+                     db.session.query(Cart.id, Cart.product_link, Cart.quantity)
+                     .filter(Cart.customer_link == user_id)}
+
+            with self._lock:
+                if self._flushes != flushes:
+                    continue  # a flush committed while SQL was read: lines may predate it, read again
+                # Changes not flushed yet (or recovered from the journal) win over what SQL has
+                for line_id, (owner, product_id, quantity) in [*self._flushing.items(), *self._pending.items()]:
+                    if owner == user_id:
+                        lines[line_id] = [product_id, quantity]
+                cart = self._carts[user_id] = _MemoryCart(lines, sql_version)
+                self._owners.update((line_id, user_id) for line_id in lines)
+                return cart
+
+    def _refresh(self, user_id):
+        sql_version = current_version(cart_resource(user_id))
+        with self._lock:
+            cart = self._carts.get(user_id)
+            stale = cart is not None and cart.sql_version != sql_version
+        if stale:
+            # Changed outside this store: write our pending quantities, then take SQL's view
+            self.flush()
+            with self._lock:
+                self._drop(user_id)
+
+    def _drop(self, user_id):
+        cart = self._carts.pop(user_id, None)
+        if cart is not None:
+            for line_id in cart.lines:
+                self._owners.pop(line_id, None)
+
+    def _create(self, user_id, cart, product_id, quantity):
+        # A new line is written through: its id, which the pages address it by, comes from the cart table
+        line_quantity = add_cart_line(user_id, product_id, quantity)
+        db.session.commit()
+        line_id = db.session.query(Cart.id).filter_by(customer_link=user_id, product_link=product_id).scalar()
+        with self._lock:
+            self._owners[line_id] = user_id
+            cart.lines[line_id] = [product_id, line_quantity]
+            if line_id in self._pending:
+                # A change to a line of the same id is still pending: supersede it
+                return self._set(user_id, cart, line_id, line_quantity)
+            cart.version += 1
+            return line_quantity
+
+    def _set(self, user_id, cart, line_id, quantity):
+        product_id = cart.lines[line_id][0]
+        self._write_journal({'line': line_id, 'user': user_id, 'product': product_id, 'quantity': quantity})
+        cart.lines[line_id][1] = quantity
+        cart.version += 1
+        self._pending[line_id] = (user_id, product_id, quantity)
+        return quantity
+
+    def _products(self, product_ids):
+        if not product_ids:
+            return {}
+        rows = db.session.query(*CART_PRODUCT_COLUMNS).filter(Product.id.in_(product_ids))
+        return {row.id: {column.key: getattr(row, column.key) for column in CART_PRODUCT_COLUMNS} for row in rows}
+
+    # Journal
+
+    def _segment_path(self, segment):
+        return os.path.join(self.journal_dir, f'cart-journal.{segment:012d}.log')
+
+    def _segments(self):
+        return sorted(int(os.path.basename(path).split('.')[1])
+                      for path in glob.glob(os.path.join(self.journal_dir, 'cart-journal.*.log')))
+
+    def _next_segment(self):
+        segments = self._segments()
+        return segments[-1] + 1 if segments else 1
+
+    def _write_journal(self, entry):
+        # Written before the change is acknowledged; flushed to the OS on every write, so a process crash
+        # loses nothing, and fsynced as well with CART_JOURNAL_FSYNC=1 to survive losing the machine
+        self._journal.write(json.dumps(entry) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _recover(self):
+        recovered = 0
+        for segment in self._segments():
+            with open(self._segment_path(segment)) as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last write of a crash
+                    self._pending[entry['line']] = (entry['user'], entry['product'], entry['quantity'])
+                    recovered += 1
+        if recovered:
+            logger.warning(f"Replaying {recovered} journaled cart changes ({len(self._pending)} lines)")
+
+    # Write-behind
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Cart flush failed, will retry: {e}")
+
+    def flush(self):
+        """
+        Write the latest quantity of every changed line to SQL in one transaction, then drop the journal
+        segments it covers.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+                covered = self._segment
+                self._journal.close()
+                self._segment += 1
+                self._journal = open(self._segment_path(self._segment), 'a')
+
+            cart = Cart.__table__
+            updates = [{'line_id': line_id, 'new_quantity': quantity}
+                       for line_id, (_, _, quantity) in batch.items() if quantity > 0]
+            deletes = [line_id for line_id, (_, _, quantity) in batch.items() if quantity <= 0]
+            try:
+                if updates:
+                    db.session.execute(cart.update().where(cart.c.id == bindparam('line_id'))
+                                       .values(quantity=bindparam('new_quantity')), updates)
+                if deletes:
+                    db.session.execute(cart.delete().where(cart.c.id.in_(deletes)))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    # Keep anything changed again since the batch was taken
+                    self._pending = {**batch, **self._pending}
+                    self._flushing = {}
+                raise
+
+            with self._lock:
+                self._flushing = {}
+                self._flushes += 1
+                for line_id in deletes:
+                    owner = self._owners.get(line_id)
+                    if owner in self._carts and line_id not in self._pending:
+                        self._carts[owner].lines.pop(line_id, None)
+                        self._owners.pop(line_id, None)
+                self._evict()
+            for segment in self._segments():
+                if segment <= covered:
+                    os.remove(self._segment_path(segment))
+            return len(batch)
+
+    def _evict(self):
+        dirty = {user_id for user_id, _, _ in self._pending.values()}
+        for user_id in list(self._carts):
+            if len(self._carts) <= self.max_carts:
+                break
+            if user_id not in dirty:
+                self._drop(user_id)
+
+    def close(self):
+        self._stopped.set()
+        self._flusher.join()
+        with self.app.app_context():
+            self.flush()
+        self._journal.close()
+
+
+_init_lock = threading.Lock()
+
+
+def init_cart_store(app):
+    """
+    Start the configured store. Called on first use rather than in create_app, so processes that only load
+    the app (flask db upgrade) never replay the journal or start a flusher; main.py starts it when serving.
+    """
+    if app.config['CART_STORE'] == 'memory':
+        store = MemoryCartStore(app, app.config['CART_JOURNAL_DIR'], app.config['CART_FLUSH_INTERVAL'],
+                                app.config['CART_STORE_MAX_CARTS'], app.config['CART_JOURNAL_FSYNC'])
+        # Flush what is still pending on a clean shutdown; anything else is replayed from the journal
+        atexit.register(store.close)
+    else:
+        store = SQLCartStore()
+    app.extensions['cart_store'] = store
+    return store
+
+
+def cart_store():
+    app = current_app._get_current_object()
+    store = app.extensions.get('cart_store')
+    if store is None:
+        with _init_lock:
+            store = app.extensions.get('cart_store') or init_cart_store(app)
+    return store
@@ -0,0 +1,26 @@
+from sqlalchemy import func
+
+from .models import Cart, Product, db
+
+"""
+Cart totals computed by the database (the monolith has the same query in website/cart_summary.py)
+"""
+
+SHIPPING_FEE = 200
+
+
+def cart_summary(customer_id):
+    """
+    Line count, item count and amount of a customer's cart from one joined aggregate query, so the cost
+    doesn't grow with the number of lines.
+
+    :return: {'lines': .., 'items': .., 'amount': .., 'shipping': .., 'total': ..}
+    """
+    lines, items, amount = db.session.query(
+        func.count(Cart.id),
+        func.coalesce(func.sum(Cart.quantity), 0),
+        func.coalesce(func.sum(Product.current_price * Cart.quantity), 0)
+    ).select_from(Cart).join(Product, Cart.product_link == Product.id) \
+        .filter(Cart.customer_link == customer_id).one()
+    return {'lines': lines, 'items': items, 'amount': amount, 'shipping': SHIPPING_FEE,
+            'total': amount + SHIPPING_FEE}
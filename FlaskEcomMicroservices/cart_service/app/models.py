@@ -12,6 +12,9 @@ class Cart(db.Model):
     product = db.relationship('Product', backref=db.backref('cart_items', lazy=True))
     customer = db.relationship('Customer', backref=db.backref('cart_items', lazy=True))
 
+    # One row per product in a customer's cart; also serves the lookups by customer_link alone
+    __table_args__ = (db.Index('uq_cart_customer_product', 'customer_link', 'product_link', unique=True),)
+
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from flask import g
+from prometheus_client import Counter
+
+from .versions import PRODUCT_CATALOG, current_version
+
+"""
+Snapshots of the product fields cart_service needs, so adding to the cart doesn't wait on product_service
+"""
+
+PRODUCT_SERVICE_URL = os.getenv('PRODUCT_SERVICE_URL', 'http://product-service:5001')
+PRODUCT_SERVICE_TIMEOUT = float(os.getenv('PRODUCT_SERVICE_TIMEOUT', '2.0'))
+# Upper bound on a snapshot's age; the catalog version normally invalidates it much sooner
+PRODUCT_CACHE_TTL = float(os.getenv('PRODUCT_CACHE_TTL', '300'))
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', '100000'))
+# How long the first miss waits for concurrent misses to join its batch; at most PRODUCT_BATCH_MAX_IDS ids
+# (product_service's own limit) go in one request
+PRODUCT_BATCH_WINDOW = float(os.getenv('PRODUCT_BATCH_WINDOW', '0.002'))
+PRODUCT_BATCH_MAX_IDS = int(os.getenv('PRODUCT_BATCH_MAX_IDS', '500'))
+
+SNAPSHOT_FIELDS = ('id', 'product_name', 'current_price', 'in_stock')
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by outcome', ['cache', 'result'])
+PRODUCT_BATCHES = Counter('product_batch_requests_total', 'Batched product lookups sent to product_service')
+
+
+class _Batch:
+    def __init__(self):
+        self.ids = set()
+        self.products = {}
+        self.error = None
+        self.done = threading.Event()
+
+
+class ProductSnapshots:
+    """
+    In-process LRU of product snapshots (id -> name, price, stock), looked up by add-to-cart.
+
+    Every product write, in any service, bumps the catalog version in the shared resource_version table.
+    A snapshot is served only while it was taken at the current version (one primary-key lookup) and is
+    younger than PRODUCT_CACHE_TTL. Products product_service doesn't know are cached as missing the same way,
+    so a product created later is picked up with the version bump.
+
+    Misses are resolved through POST /products/batch: the first one opens a batch, waits
+    PRODUCT_BATCH_WINDOW for concurrent misses to add their ids, and sends one request for all of them.
+    """
+
+    def __init__(self, name='product-snapshots'):
+        self.name = name
+        self._entries = OrderedDict()  # product_id -> (version, stored_at, snapshot or None)
+        self._open = None
+        self._lock = threading.Lock()
+
+    def get(self, product_id):
+        """
+        :return: the product's snapshot, or None if product_service doesn't have it
+        """
+        version = current_version(PRODUCT_CATALOG)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry[0] == version and now - entry[1] < PRODUCT_CACHE_TTL:
+                self._entries.move_to_end(product_id)
+                CACHE_REQUESTS.labels(cache=self.name, result='hit').inc()
+                return entry[2]
+
+        CACHE_REQUESTS.labels(cache=self.name, result='miss').inc()
+        return self._load(product_id).get(product_id)
+
+    def _load(self, product_id):
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.ids.add(product_id)
+            if len(batch.ids) >= PRODUCT_BATCH_MAX_IDS:
+                self._open = None
+
+        if not leader:
+            if not batch.done.wait(PRODUCT_BATCH_WINDOW + PRODUCT_SERVICE_TIMEOUT):
+                raise TimeoutError('Timed out waiting for a product batch')
+            if batch.error is not None:
+                raise batch.error
+            return batch.products
+
+        time.sleep(PRODUCT_BATCH_WINDOW)
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+        try:
+            # Read before fetching, so the snapshots are at least as new as the version they are stored under
+            version = current_version(PRODUCT_CATALOG)
+            batch.products = self._fetch(sorted(batch.ids))
+            self._store(version, batch.ids, batch.products)
+        except Exception as e:
+            batch.error = e
+            raise
+        finally:
+            batch.done.set()
+        return batch.products
+
+    def _fetch(self, product_ids):
+        PRODUCT_BATCHES.inc()
+        response = requests.post(f"{PRODUCT_SERVICE_URL}/products/batch", json={'ids': product_ids},
+                                 headers={'X-Request-ID': g.get('trace_id', '-')}, timeout=PRODUCT_SERVICE_TIMEOUT)
+        response.raise_for_status()
+        return {product['id']: {field: product[field] for field in SNAPSHOT_FIELDS}
+                for product in response.json()['products']}
+
+    def _store(self, version, product_ids, products):
+        stored_at = time.time()
+        with self._lock:
+            for product_id in product_ids:
+                self._entries[product_id] = (version, stored_at, products.get(product_id))
+                self._entries.move_to_end(product_id)
+            while len(self._entries) > PRODUCT_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+
+product_snapshots = ProductSnapshots()
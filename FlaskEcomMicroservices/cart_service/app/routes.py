@@ -1,16 +1,15 @@
 import logging
 
-import requests
-from flask import Blueprint, flash, jsonify, request, Response
+from flask import Blueprint, flash, jsonify, request, Response, g
 from prometheus_client import Counter, generate_latest
 
-from .models import Cart
+from .cart_store import cart_store
 from .models import db
+from .product_cache import product_snapshots
+from .versions import PRODUCT_CATALOG, current_version, resource_etag, not_modified
 
 cart_routes = Blueprint('cart_routes', __name__)
 
-PRODUCT_SERVICE_URL = 'http://product-service:5001'
-
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -22,6 +21,22 @@ logger.addHandler(handler)
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP Requests')
 
 
+TRACE_HEADER = 'X-Request-ID'
+
+
+@cart_routes.before_request
+def start_trace():
+    # Correlation id generated by view_service for the page this call belongs to
+    g.trace_id = request.headers.get(TRACE_HEADER, '-')
+    logger.info(f"{request.method} {request.path} trace_id={g.trace_id}")
+
+
+@cart_routes.after_request
+def finish_trace(response):
+    response.headers[TRACE_HEADER] = g.get('trace_id', '-')
+    return response
+
+
 @cart_routes.route('/metrics')
 def metrics():
     return Response(generate_latest(), mimetype='text/plain; version=0.0.4')
@@ -29,90 +44,78 @@ def metrics():
 
 @cart_routes.route('/cart/add-to-cart/<int:item_id>/<int:user_id>', methods=['POST'])
 def add_to_cart(item_id, user_id):
+    """
+    Add an item to the user's cart, or raise its quantity if it's already there.
+
+    Optional body: {"quantity": n} (default 1). Returns the line's resulting quantity.
+    """
     try:
         REQUEST_COUNT.inc()
-        logger.info("Fetching the product details")
-        # Call Product Service to fetch product details
-        product_service_url = f"{PRODUCT_SERVICE_URL}/products/{item_id}"
-        response = requests.get(product_service_url)
-
-        if response.status_code == 200:
-            product = response.json()  # Assuming the product data is returned in JSON format
-
-            # Check if the item already exists in the cart for the given user
-            item_exists = Cart.query.filter_by(product_link=item_id, customer_link=user_id).first()
-
-            if item_exists:
-                # Update quantity if item already exists in the cart
-                item_exists.quantity += 1
-                db.session.commit()
+        quantity = (request.get_json(silent=True) or {}).get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return jsonify({"message": "quantity must be a positive integer"}), 400
+
+        # Local snapshot of the product; product_service is only asked on a miss
+        product = product_snapshots.get(item_id)
+
+        if product is not None:
+            # Insert the line or bump its quantity in one statement: concurrent adds (double clicks) can't
+            # create duplicate lines or lose an increment
+            line_quantity = cart_store().add(user_id, item_id, quantity)
+            if line_quantity > quantity:
                 flash(f'Quantity of {product["product_name"]} has been updated.')
             else:
-                # Add new item to the cart
-                new_cart_item = Cart(product_link=item_id, customer_link=user_id, quantity=1)
-                db.session.add(new_cart_item)
-                db.session.commit()
                 flash(f'{product["product_name"]} added to cart.')
 
-            return jsonify({"message": "Item added to cart successfully."}), 200
+            return jsonify({"message": "Item added to cart successfully.", "quantity": line_quantity}), 200
         else:
-            flash("Error fetching product data.")
-            return jsonify({"message": "Error fetching product data"}), 400
+            flash("Product not found.")
+            return jsonify({"message": "Product not found"}), 400
     except Exception as e:
+        db.session.rollback()
         flash(f"Error adding item to cart: {e}")
         return jsonify({"message": "Error adding item to cart"}), 500
 
 
 @cart_routes.route('/cart/<int:user_id>', methods=['GET'])
 def get_cart_items(user_id):
+    """
+    The user's cart lines with the product fields they display, plus the cart's amount, shipping and total.
+    Lines whose product was deleted are left out.
+
+    :return: {"items": [{"id", "product_link", "quantity", "product": {...}}, ...],
+              "amount": .., "shipping": .., "total": ..}
+    """
     REQUEST_COUNT.inc()
-    cart_items = Cart.query.filter_by(customer_link=user_id).all()
-    result = []
-    for item in cart_items:
-        product = item.product
-        data = {
-            'id': item.id,
-            'product_link': item.product_link,
-            'quantity': item.quantity,
-            'product': {
-                'id': product.id,
-                'product_name': product.product_name,
-                'current_price': product.current_price,
-                'previous_price': product.previous_price,
-                'in_stock': product.in_stock,
-                'flash_sale': product.flash_sale,
-                'product_picture': product.product_picture,
-                'date_added': product.date_added
-            }
-        }
-        result.append(data)
+    # The body embeds product details, so it changes with either the cart or the catalog
+    store = cart_store()
+    etag = f"{store.version(user_id)}.{resource_etag(PRODUCT_CATALOG, current_version(PRODUCT_CATALOG))}"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
-    return jsonify(result), 200
+    response = jsonify(store.read(user_id))
+    response.set_etag(etag)
+    return response, 200
 
 
 @cart_routes.route('/cart/<int:cart_id>/increment', methods=['POST'])
 def increment_cart_item(cart_id):
     try:
         REQUEST_COUNT.inc()
-        # Get the cart item by ID
-        cart_item = Cart.query.get(cart_id)
-        if not cart_item:
+        store = cart_store()
+        user_id = store.owner(cart_id)
+        if user_id is None:
             return jsonify({'error': 'Cart item not found'}), 404
 
-        # Increment the quantity
-        cart_item.quantity += 1
-        db.session.commit()
-
-        # Recalculate the total amount for all cart items for this user
-        user_id = request.json.get('user_id')
-        cart_items = Cart.query.filter_by(customer_link=user_id).all()
-
-        total_amount = sum(item.product.current_price * item.quantity for item in cart_items)
+        quantity = store.change(user_id, {cart_id: 1}, set())[cart_id]
 
+        # Totals for the line's owner
+        summary = store.summary(user_id)
         data = {
-            'quantity': cart_item.quantity,
-            'amount': total_amount,
-            'total': total_amount + 200  # Add shipping or other charges
+            'quantity': quantity,
+            'amount': summary['amount'],
+            'total': summary['total']
         }
 
         return jsonify(data), 200
@@ -124,33 +127,58 @@ def increment_cart_item(cart_id):
 def decrement_cart_item(cart_id):
     try:
         REQUEST_COUNT.inc()
-        # Get the cart item by ID
-        cart_item = Cart.query.get(cart_id)
-        if not cart_item:
+        store = cart_store()
+        user_id = store.owner(cart_id)
+        if user_id is None:
             return jsonify({'error': 'Cart item not found'}), 404
 
-        # Decrement the quantity if it's greater than 1
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            db.session.commit()
-        else:
-            # Optionally, remove the item if quantity reaches zero
-            db.session.delete(cart_item)
-            db.session.commit()
-            return jsonify({'quantity': 0, 'amount': 0, 'total': 200}), 200
-
-        # Recalculate the total amount for all cart items for this user
-        user_id = request.json.get('user_id')
-        cart_items = Cart.query.filter_by(customer_link=user_id).all()
-
-        total_amount = sum(item.product.current_price * item.quantity for item in cart_items)
+        # The line is removed when its quantity reaches zero
+        quantity = store.change(user_id, {cart_id: -1}, set())[cart_id]
 
+        # Totals for the line's owner; the other lines still count once this one is gone
+        summary = store.summary(user_id)
         data = {
-            'quantity': cart_item.quantity,
-            'amount': total_amount,
-            'total': total_amount + 200  # Add shipping or other charges
+            'quantity': quantity,
+            'amount': summary['amount'],
+            'total': summary['total']
         }
 
         return jsonify(data), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@cart_routes.route('/cart/<int:user_id>/mutate', methods=['POST'])
+def mutate_cart(user_id):
+    """
+    Apply quantity deltas to a set of the user's cart lines in one round trip.
+
+    Body: {"lines": [{"cart_id": 3, "delta": 1}, {"cart_id": 7, "remove": true}, ...]}
+    Lines whose quantity drops to zero are removed. Returns the resulting quantity of every requested line
+    (0 once removed) and the cart amount/total.
+    """
+    try:
+        REQUEST_COUNT.inc()
+        body = request.get_json(silent=True) or {}
+        lines = body.get('lines', []) if isinstance(body, dict) else None
+        if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+            return jsonify({'error': 'lines must be a list of objects'}), 400
+        try:
+            deltas = {int(line['cart_id']): int(line.get('delta', 0)) for line in lines if not line.get('remove')}
+            removals = {int(line['cart_id']) for line in lines if line.get('remove')}
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each line needs a cart_id and an integer delta or remove flag'}), 400
+
+        store = cart_store()
+        quantities = store.change(user_id, deltas, removals)
+        summary = store.summary(user_id)
+
+        return jsonify({
+            'lines': [{'cart_id': cart_id, 'quantity': quantity} for cart_id, quantity in sorted(quantities.items())],
+            'amount': summary['amount'],
+            'total': summary['total']
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error mutating cart for user {user_id}: {e}")
+        return jsonify({'error': str(e)}), 500
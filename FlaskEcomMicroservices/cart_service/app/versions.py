@@ -0,0 +1,52 @@
+from flask import Response, request
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .database import db
+
+"""
+Version counters shared by the product, cart and order services (the same module lives in each of them).
+
+Every write bumps the counter of the resource it changes in the same transaction, whichever service makes
+it: 'product' for the whole catalog, 'cart:<user_id>' for one customer's cart. Readers derive strong ETags
+and snapshot validity from the counter with a single primary-key lookup.
+"""
+
+PRODUCT_CATALOG = 'product'
+
+
+def cart_resource(user_id):
+    return f'cart:{user_id}'
+
+
+class ResourceVersion(db.Model):
+    __tablename__ = 'resource_version'
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+def current_version(name):
+    return db.session.execute(select(ResourceVersion.version).where(ResourceVersion.name == name)).scalar() or 0
+
+
+def bump_version(name):
+    # Upsert so the first write to a resource creates its counter; commits with the caller's write
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(ResourceVersion).values(name=name, version=1)
+    db.session.execute(statement.on_conflict_do_update(index_elements=[ResourceVersion.name],
+                                                       set_={'version': ResourceVersion.version + 1}))
+
+
+def resource_etag(name, version):
+    return f'{name}-{version}'
+
+
+def not_modified(etag):
+    """
+    :return: a 304 response if the request's If-None-Match already names etag, else None
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
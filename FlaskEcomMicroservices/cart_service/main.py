@@ -1,8 +1,17 @@
 from prometheus_client import start_http_server
+
 from app import create_app
+from app.cart_store import cart_store
+from flask_migrate import Migrate
+from app.models import db
 
 app = create_app()
+# Services share one database, so each tracks its migrations in its own version table
+migrate = Migrate(app, db, version_table='alembic_version_cart')
 
 if __name__ == '__main__':
+    # Start the cart store (and replay its journal) before taking traffic
+    with app.app_context():
+        cart_store()
     start_http_server(8000)
     app.run(host='0.0.0.0', port=5002)
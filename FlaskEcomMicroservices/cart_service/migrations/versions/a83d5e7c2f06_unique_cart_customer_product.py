@@ -0,0 +1,34 @@
+"""Make (customer_link, product_link) unique on cart
+
+Revision ID: a83d5e7c2f06
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83d5e7c2f06'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Earlier add-to-cart races may have left several rows for one product; fold them into the oldest row
+    op.execute("""
+        UPDATE cart SET quantity = (
+            SELECT SUM(duplicate.quantity) FROM cart AS duplicate
+            WHERE duplicate.customer_link = cart.customer_link AND duplicate.product_link = cart.product_link
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart GROUP BY customer_link, product_link HAVING COUNT(*) > 1)
+    """)
+    op.execute("DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY customer_link, product_link)")
+    # Leading customer_link column also serves the cart reads by customer
+    op.create_index('uq_cart_customer_product', 'cart', ['customer_link', 'product_link'], unique=True,
+                    if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('uq_cart_customer_product', table_name='cart', if_exists=True)
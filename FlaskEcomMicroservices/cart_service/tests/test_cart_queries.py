@@ -0,0 +1,145 @@
+"""
+cart_service's cart reads and writes on both cart stores: the query count must not grow with the number of
+lines in the cart (each test compares a customer with one line against one with fifty), and concurrent adds
+of the same product must add up.
+"""
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.config import Config
+from app.models import Cart, Customer, Product, db
+from app.product_cache import product_snapshots
+
+CART_SIZES = (1, 50)
+THREADS, ADDS = 8, 25
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed():
+    """
+    :return: {cart size: (customer id, [line ids])}
+    """
+    carts = {}
+    product_ids = []
+    for number in range(max(CART_SIZES)):
+        product = Product(product_name=f'Product {number}', current_price=10 + number, previous_price=50,
+                                in_stock=5, product_picture='/media/p.jpg')
+        db.session.add(product)
+        db.session.flush()
+        product_ids.append(product.id)
+    for size in CART_SIZES:
+        customer = Customer(email=f'{size}@example.com', username=f'c{size}', password_hash='x')
+        db.session.add(customer)
+        db.session.flush()
+        lines = [Cart(customer_link=customer.id, product_link=product_id, quantity=2)
+                 for product_id in product_ids[:size]]
+        db.session.add_all(lines)
+        db.session.flush()
+        carts[size] = (customer.id, [line.id for line in lines])
+    db.session.commit()
+    return carts
+
+
+@pytest.fixture(params=['sql', 'memory'])
+def cart_service(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'CART_STORE', request.param)
+    monkeypatch.setattr(Config, 'CART_JOURNAL_DIR', str(tmp_path / 'journal'))
+    monkeypatch.setattr(Config, 'CART_FLUSH_INTERVAL', 3600)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        carts = seed()
+    yield app, carts, db
+    with app.app_context():
+        if request.param == 'memory':
+            app.extensions['cart_store'].close()
+        db.drop_all()
+
+
+@pytest.mark.parametrize('method, endpoint, body', [
+    ('GET', '/cart/{customer}', None),
+    ('POST', '/cart/{line}/increment', None),
+    ('POST', '/cart/{line}/decrement', None),
+    ('POST', '/cart/{customer}/mutate', 'all lines'),
+])
+def test_cart_service_query_count_is_constant(cart_service, method, endpoint, body):
+    app, carts, db = cart_service
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    counts = {}
+    for size, (customer_id, line_ids) in carts.items():
+        # Load the cart first, as a page view would; the memory store reads it from SQL once
+        assert client.get(f'/cart/{customer_id}').status_code == 200
+        json = {'lines': [{'cart_id': line_id, 'delta': 1} for line_id in line_ids]} if body else None
+        with count_queries(engine) as statements:
+            response = client.open(endpoint.format(customer=customer_id, line=line_ids[0]), method=method,
+                                   json=json)
+        assert response.status_code == 200
+        counts[size] = len(statements)
+    assert counts[1] == counts[50]
+
+
+# Concurrent adds
+
+
+def hammer(add):
+    """
+    Call add() ADDS times from each of THREADS threads started together.
+    """
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        for _ in range(ADDS):
+            add()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize('store', ['sql', 'memory'])
+def test_cart_service_concurrent_adds_converge(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'cart.sqlite3'}")
+    monkeypatch.setattr(Config, 'CART_STORE', store)
+    monkeypatch.setattr(Config, 'CART_JOURNAL_DIR', str(tmp_path / 'journal'))
+    monkeypatch.setattr(product_snapshots, 'get', lambda product_id: {'id': product_id, 'product_name': 'Watch'})
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        carts = seed()
+    customer_id, _ = carts[1]
+    product_id = max(CART_SIZES)
+
+    def add():
+        response = app.test_client().post(f'/cart/add-to-cart/{product_id}/{customer_id}')
+        assert response.status_code == 200
+
+    hammer(add)
+    with app.app_context():
+        if store == 'memory':
+            app.extensions['cart_store'].close()
+        lines = db.session.query(Cart.quantity) \
+            .filter_by(customer_link=customer_id, product_link=product_id).all()
+        assert [quantity for quantity, in lines] == [THREADS * ADDS]
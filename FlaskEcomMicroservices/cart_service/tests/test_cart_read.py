@@ -0,0 +1,55 @@
+"""
+GET /cart/<user_id>: the cart lines joined with their products, on both cart stores.
+"""
+import pytest
+
+from app import create_app
+from app.config import Config
+from app.models import Cart, Customer, Product, db
+from app.versions import PRODUCT_CATALOG, bump_version
+
+
+@pytest.fixture(params=['sql', 'memory'])
+def service(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'cart.sqlite3'}")
+    monkeypatch.setattr(Config, 'CART_STORE', request.param)
+    monkeypatch.setattr(Config, 'CART_JOURNAL_DIR', str(tmp_path / 'journal'))
+    monkeypatch.setattr(Config, 'CART_FLUSH_INTERVAL', 3600)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Customer(id=1, email='shopper@example.com', password_hash='x'))
+        for product_id, price in ((1, 10), (2, 25)):
+            db.session.add(Product(id=product_id, product_name=f'Product {product_id}', current_price=price,
+                                   previous_price=30, in_stock=3, product_picture='/media/p.jpg'))
+        db.session.add_all([Cart(id=1, customer_link=1, product_link=1, quantity=2),
+                            Cart(id=2, customer_link=1, product_link=2, quantity=1)])
+        db.session.commit()
+    yield app
+    with app.app_context():
+        if request.param == 'memory' and 'cart_store' in app.extensions:
+            app.extensions['cart_store'].close()
+        db.drop_all()
+
+
+def test_cart_lines_carry_their_products_and_totals(service):
+    body = service.test_client().get('/cart/1').get_json()
+    assert [(line['id'], line['product']['product_name'], line['quantity']) for line in body['items']] == \
+        [(1, 'Product 1', 2), (2, 'Product 2', 1)]
+    assert body['amount'] == 45
+    assert body['total'] == body['amount'] + body['shipping']
+
+
+def test_lines_of_deleted_products_are_left_out(service):
+    client = service.test_client()
+    etag = client.get('/cart/1').headers['ETag']
+    with service.app_context():
+        db.session.query(Product).filter_by(id=2).delete()
+        bump_version(PRODUCT_CATALOG)
+        db.session.commit()
+
+    response = client.get('/cart/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [line['id'] for line in body['items']] == [1]
+    assert body['amount'] == 20
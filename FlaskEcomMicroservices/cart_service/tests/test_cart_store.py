@@ -0,0 +1,62 @@
+"""
+cart_service's endpoints on the in-memory cart store, including changes made to the cart table by other
+services.
+"""
+import pytest
+
+from app import create_app
+from app.config import Config
+from app.models import Cart, Customer, Product, db
+from app.versions import bump_version, cart_resource
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'cart.sqlite3'}")
+    monkeypatch.setattr(Config, 'CART_STORE', 'memory')
+    monkeypatch.setattr(Config, 'CART_JOURNAL_DIR', str(tmp_path / 'journal'))
+    monkeypatch.setattr(Config, 'CART_FLUSH_INTERVAL', 3600)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Customer(id=1, email='shopper@example.com', password_hash='x'))
+        db.session.add(Product(id=1, product_name='Watch', current_price=10, previous_price=12, in_stock=3,
+                               product_picture='/media/w.jpg'))
+        db.session.add(Cart(id=1, customer_link=1, product_link=1, quantity=2))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        if 'cart_store' in app.extensions:
+            app.extensions['cart_store'].close()
+        db.drop_all()
+
+
+def clear_cart_elsewhere(app):
+    # What order_service does at checkout
+    with app.app_context():
+        Cart.query.filter_by(customer_link=1).delete()
+        bump_version(cart_resource(1))
+        db.session.commit()
+
+
+def test_store_is_not_started_by_create_app(service):
+    assert 'cart_store' not in service.extensions
+
+
+def test_changes_after_external_clear_see_the_cleared_cart(service):
+    client = service.test_client()
+    assert client.post('/cart/1/increment').get_json()['quantity'] == 3
+
+    clear_cart_elsewhere(service)
+    assert client.post('/cart/1/increment').status_code == 404
+    response = client.post('/cart/1/mutate', json={'lines': [{'cart_id': 1, 'delta': 1}]})
+    assert response.get_json()['lines'] == [{'cart_id': 1, 'quantity': 0}]
+
+    with service.app_context():
+        service.extensions['cart_store'].flush()
+        assert Cart.query.count() == 0
+
+
+@pytest.mark.parametrize('body', [{'lines': 'all'}, {'lines': [1, 2]}, {'lines': {'cart_id': 1}}, ['lines']])
+def test_mutate_rejects_malformed_lines(service, body):
+    assert service.test_client().post('/cart/1/mutate', json=body).status_code == 400
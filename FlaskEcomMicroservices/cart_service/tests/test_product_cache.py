@@ -0,0 +1,183 @@
+"""
+Product snapshots behind add-to-cart: versioned invalidation, TTL, missing products and batched misses.
+"""
+import threading
+
+import pytest
+import requests
+from flask import g
+
+from app import create_app, product_cache
+from app.config import Config
+from app.models import Customer, db
+from app.product_cache import ProductSnapshots
+from app.versions import PRODUCT_CATALOG, bump_version
+
+CATALOG = {product_id: {'id': product_id, 'product_name': f'Product {product_id}', 'current_price': 10,
+                        'previous_price': 12, 'in_stock': 3} for product_id in range(1, 11)}
+
+
+class ProductService:
+    """
+    Stands in for POST /products/batch, recording the ids of every request.
+    """
+
+    def __init__(self, delay=0, error=None):
+        self.batches = []
+        self.headers = []
+        self.delay = delay
+        self.error = error
+
+    def post(self, url, json, headers, timeout):
+        assert url.endswith('/products/batch')
+        self.batches.append(sorted(json['ids']))
+        self.headers.append(headers)
+        threading.Event().wait(self.delay)
+        return Answer([CATALOG[i] for i in json['ids'] if i in CATALOG], self.error)
+
+
+class Answer:
+    def __init__(self, products, error):
+        self.products = products
+        self.error = error
+
+    def raise_for_status(self):
+        if self.error is not None:
+            raise self.error
+
+    def json(self):
+        return {'products': self.products, 'missing': []}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'cart.sqlite3'}")
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    service = ProductService()
+    monkeypatch.setattr(product_cache.requests, 'post', service.post)
+    return service
+
+
+def test_snapshot_is_served_until_the_catalog_changes(app, upstream):
+    snapshots = ProductSnapshots()
+    with app.app_context():
+        assert snapshots.get(1)['product_name'] == 'Product 1'
+        assert snapshots.get(1)['product_name'] == 'Product 1'
+        assert upstream.batches == [[1]]
+
+        bump_version(PRODUCT_CATALOG)
+        db.session.commit()
+        snapshots.get(1)
+        assert upstream.batches == [[1], [1]]
+
+
+def test_snapshot_expires_after_its_ttl(app, upstream, monkeypatch):
+    snapshots = ProductSnapshots()
+    with app.app_context():
+        snapshots.get(1)
+        monkeypatch.setattr(product_cache, 'PRODUCT_CACHE_TTL', 0)
+        snapshots.get(1)
+    assert upstream.batches == [[1], [1]]
+
+
+def test_unknown_product_is_cached_as_missing(app, upstream):
+    snapshots = ProductSnapshots()
+    with app.app_context():
+        assert snapshots.get(99) is None
+        assert snapshots.get(99) is None
+    assert upstream.batches == [[99]]
+
+
+def test_concurrent_misses_share_one_batch(app, upstream, monkeypatch):
+    monkeypatch.setattr(product_cache, 'PRODUCT_BATCH_WINDOW', 0.2)
+    snapshots = ProductSnapshots()
+    results = {}
+
+    def add(product_id):
+        with app.app_context():
+            results[product_id] = snapshots.get(product_id)
+
+    threads = [threading.Thread(target=add, args=(product_id,)) for product_id in (1, 2, 3, 99)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert upstream.batches == [[1, 2, 3, 99]]
+    assert {product_id: product and product['product_name'] for product_id, product in results.items()} == \
+        {1: 'Product 1', 2: 'Product 2', 3: 'Product 3', 99: None}
+
+
+def test_full_batch_is_sent_without_waiting_for_more(app, upstream, monkeypatch):
+    monkeypatch.setattr(product_cache, 'PRODUCT_BATCH_WINDOW', 0.2)
+    monkeypatch.setattr(product_cache, 'PRODUCT_BATCH_MAX_IDS', 2)
+    snapshots = ProductSnapshots()
+    start = threading.Barrier(4)
+
+    def add(product_id):
+        with app.app_context():
+            start.wait()
+            snapshots.get(product_id)
+
+    threads = [threading.Thread(target=add, args=(product_id,)) for product_id in (1, 2, 3, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(len(batch) for batch in upstream.batches) == [2, 2]
+    assert sorted(sum(upstream.batches, [])) == [1, 2, 3, 4]
+
+
+def test_batch_errors_reach_every_waiter_and_are_not_cached(app, monkeypatch):
+    monkeypatch.setattr(product_cache, 'PRODUCT_BATCH_WINDOW', 0.2)
+    failing = ProductService(error=requests.HTTPError('503'))
+    monkeypatch.setattr(product_cache.requests, 'post', failing.post)
+    snapshots = ProductSnapshots()
+    errors = []
+
+    def add(product_id):
+        with app.app_context():
+            try:
+                snapshots.get(product_id)
+            except requests.HTTPError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=add, args=(product_id,)) for product_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(failing.batches) == 1 and len(errors) == 2
+
+    healthy = ProductService()
+    monkeypatch.setattr(product_cache.requests, 'post', healthy.post)
+    with app.app_context():
+        assert snapshots.get(1)['product_name'] == 'Product 1'
+
+
+def test_batch_request_carries_the_trace_id(app, upstream):
+    with app.test_request_context():
+        g.trace_id = 'abc123'
+        ProductSnapshots().get(1)
+    assert upstream.headers == [{'X-Request-ID': 'abc123'}]
+
+
+def test_add_to_cart_uses_the_snapshots(app, upstream, monkeypatch):
+    monkeypatch.setattr(product_cache, 'product_snapshots', ProductSnapshots())
+    monkeypatch.setattr('app.routes.product_snapshots', product_cache.product_snapshots)
+    with app.app_context():
+        db.session.add(Customer(id=1, email='shopper@example.com', password_hash='x'))
+        db.session.commit()
+    client = app.test_client()
+    assert client.post('/cart/add-to-cart/1/1').get_json()['quantity'] == 1
+    assert client.post('/cart/add-to-cart/1/1').get_json()['quantity'] == 2
+    assert client.post('/cart/add-to-cart/99/1').status_code == 400
+    assert upstream.batches == [[1], [99]]
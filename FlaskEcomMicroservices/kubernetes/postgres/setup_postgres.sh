@@ -76,6 +76,11 @@ CREATE TABLE IF NOT EXISTS orders (
     CONSTRAINT fk_product FOREIGN KEY (product_link) REFERENCES product(id) ON DELETE CASCADE,
     CONSTRAINT fk_customer FOREIGN KEY (customer_link) REFERENCES customer(id) ON DELETE CASCADE
 );
+
+CREATE TABLE IF NOT EXISTS resource_version (
+    name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
 EOF
 )
 
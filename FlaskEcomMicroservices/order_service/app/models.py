@@ -47,5 +47,10 @@ class Order(db.Model):
     product = db.relationship('Product', backref=db.backref('orders', lazy=True))
     customer = db.relationship('Customer', backref=db.backref('orders', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_orders_customer_link', 'customer_link'),
+        db.Index('ix_orders_payment_id', 'payment_id'),
+    )
+
     def __repr__(self):
         return f"<Order(product_link={self.product_link}, customer_link={self.customer_link}, quantity={self.quantity}, status={self.status})>"
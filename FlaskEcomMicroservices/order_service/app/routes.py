@@ -1,10 +1,14 @@
 import logging
 
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, g
 from prometheus_client import Counter, generate_latest
 
+from sqlalchemy.orm import joinedload
+
 from .models import Order, Cart, Product
 from .models import db
+from .streaming import STREAM_BATCH_SIZE, stream_rows
+from .versions import PRODUCT_CATALOG, cart_resource, bump_version
 import uuid
 
 order_routes = Blueprint('order_routes', __name__)
@@ -19,6 +23,22 @@ logger.addHandler(handler)
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP Requests')
 
 
+TRACE_HEADER = 'X-Request-ID'
+
+
+@order_routes.before_request
+def start_trace():
+    # Correlation id generated by view_service for the page this call belongs to
+    g.trace_id = request.headers.get(TRACE_HEADER, '-')
+    logger.info(f"{request.method} {request.path} trace_id={g.trace_id}")
+
+
+@order_routes.after_request
+def finish_trace(response):
+    response.headers[TRACE_HEADER] = g.get('trace_id', '-')
+    return response
+
+
 @order_routes.route('/metrics')
 def metrics():
     return Response(generate_latest(), mimetype='text/plain; version=0.0.4')
@@ -51,6 +71,8 @@ def place_order(user_id):
                 if product:
                     product.in_stock -= item['quantity']
                     logger.info("Reducing product quantity: %s, New stock: %d", product.product_name, product.in_stock)
+                    # Stock is part of the catalog product-service serves and caches
+                    bump_version(PRODUCT_CATALOG)
 
                 db.session.commit()
                 logger.info("Order placed successfully: %s", new_order)
@@ -62,6 +84,7 @@ def place_order(user_id):
                         db.session.delete(cart_item)
 
                 # Commit the deletion of cart items
+                bump_version(cart_resource(user_id))
                 db.session.commit()
                 logger.info("Cart items deleted successfully after placing the order")
         except Exception as e:
@@ -112,40 +135,43 @@ def get_orders(user_id):
         return jsonify({'error': str(e)}), 500
 
 
+def order_to_dict(order):
+    product = order.product  # Access the related product
+    return {
+        'id': order.id,
+        'quantity': order.quantity,
+        'price': order.price,
+        'status': order.status,
+        'payment_id': order.payment_id,
+        'product_link': order.product_link,
+        'product': {
+            'id': product.id,
+            'product_name': product.product_name,
+            'current_price': product.current_price,
+            'previous_price': product.previous_price,
+            'in_stock': product.in_stock,
+            'flash_sale': product.flash_sale,
+            'product_picture': product.product_picture,
+            'date_added': product.date_added
+        },
+        'customer': {
+            'id': order.customer.id,
+            'email': order.customer.email,
+            'username': order.customer.username,
+            'date_joined': order.customer.date_joined,
+        }
+    }
+
+
 @order_routes.route('/orders', methods=['GET'])
 def get_all_orders():
     try:
         REQUEST_COUNT.inc()
-        orders = Order.query.all()
-        result = []
-        for order in orders:
-            product = order.product  # Access the related product
-            order_data = {
-                'id': order.id,
-                'quantity': order.quantity,
-                'price': order.price,
-                'status': order.status,
-                'payment_id': order.payment_id,
-                'product_link': order.product_link,
-                'product': {
-                    'id': product.id,
-                    'product_name': product.product_name,
-                    'current_price': product.current_price,
-                    'previous_price': product.previous_price,
-                    'in_stock': product.in_stock,
-                    'flash_sale': product.flash_sale,
-                    'product_picture': product.product_picture,
-                    'date_added': product.date_added
-                },
-                'customer': {
-                    'id': order.customer.id,
-                    'email': order.customer.email,
-                    'username': order.customer.username,
-                    'date_joined': order.customer.date_joined,
-                }
-            }
-            result.append(order_data)
-        return jsonify(result), 200
+        # Streamed from a server-side cursor with product and customer joined in, rather than building the
+        # whole list in memory (and loading each order's product and customer separately)
+        orders = Order.query.options(joinedload(Order.product), joinedload(Order.customer)) \
+            .order_by(Order.id).yield_per(STREAM_BATCH_SIZE)
+        return stream_rows(iter(orders), order_to_dict), 200
     except Exception as e:
         logger.error(f"Unexpected error occurred: {e}")
         return jsonify({'error': str(e)}), 500
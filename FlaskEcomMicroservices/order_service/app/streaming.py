@@ -0,0 +1,44 @@
+from flask import Response, current_app, request, stream_with_context
+
+"""
+Streamed list responses (the same module lives in the product, order and auth services)
+"""
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 1000  # rows fetched per round trip from the server-side cursor
+FLUSH_BYTES = 64 * 1024
+
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_rows(rows, serialize):
+    """
+    Respond with rows as a JSON array, or as NDJSON when the client asks for it (?format=ndjson or
+    Accept: application/x-ndjson). Rows are encoded one at a time and sent in ~64KB chunks, so memory stays
+    flat whatever the row count. Pass an already-executed iterator (e.g. iter(query.yield_per(...))) so
+    query errors surface before the response starts.
+    """
+    dumps = current_app.json.dumps
+    ndjson = wants_ndjson()
+
+    def generate():
+        chunk, size, first = [] if ndjson else ['['], 0, True
+        for row in rows:
+            encoded = dumps(serialize(row))
+            if ndjson:
+                chunk.append(encoded + '\n')
+            else:
+                chunk.append(encoded if first else ',' + encoded)
+                first = False
+            size += len(encoded)
+            if size >= FLUSH_BYTES:
+                yield ''.join(chunk)
+                chunk, size = [], 0
+        if not ndjson:
+            chunk.append(']')
+        yield ''.join(chunk)
+
+    return Response(stream_with_context(generate()),
+                    mimetype=NDJSON_MIMETYPE if ndjson else current_app.json.mimetype)
@@ -1,7 +1,12 @@
 from prometheus_client import start_http_server
+
 from app import create_app
+from flask_migrate import Migrate
+from app.models import db
 
 app = create_app()
+# Services share one database, so each tracks its migrations in its own version table
+migrate = Migrate(app, db, version_table='alembic_version_order')
 
 if __name__ == '__main__':
     start_http_server(8000)
@@ -0,0 +1,25 @@
+"""Index orders by customer and payment id
+
+Revision ID: d2b7490e5a18
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7490e5a18'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_orders_customer_link', 'orders', ['customer_link'], if_not_exists=True)
+    op.create_index('ix_orders_payment_id', 'orders', ['payment_id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_orders_payment_id', table_name='orders', if_exists=True)
+    op.drop_index('ix_orders_customer_link', table_name='orders', if_exists=True)
@@ -0,0 +1,76 @@
+"""
+GET /orders, streamed with each order's product and customer joined in.
+"""
+import json
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.config import Config
+from app.models import Customer, Order, Product, db
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'order.sqlite3'}")
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def add_orders(app, count, start=0):
+    with app.app_context():
+        for number in range(start, start + count):
+            customer = Customer(email=f'{number}@example.com', username=f'c{number}', password_hash='x')
+            product = Product(product_name=f'Product {number}', current_price=10, previous_price=12, in_stock=1,
+                              product_picture='/media/p.jpg')
+            db.session.add_all([customer, product])
+            db.session.flush()
+            db.session.add(Order(product_link=product.id, customer_link=customer.id, quantity=2, price=20,
+                                 status='Pending', payment_id=f'pay-{number}'))
+        db.session.commit()
+
+
+def test_orders_are_a_json_array_with_product_and_customer(service):
+    add_orders(service, 3)
+    response = service.test_client().get('/orders')
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    orders = response.get_json()
+    assert [order['payment_id'] for order in orders] == ['pay-0', 'pay-1', 'pay-2']
+    assert orders[1]['product']['product_name'] == 'Product 1'
+    assert orders[1]['customer']['email'] == '1@example.com'
+
+
+def test_orders_as_ndjson(service):
+    add_orders(service, 3)
+    for kwargs in ({'query_string': {'format': 'ndjson'}}, {'headers': {'Accept': 'application/x-ndjson'}}):
+        response = service.test_client().get('/orders', **kwargs)
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line)['payment_id'] for line in lines] == ['pay-0', 'pay-1', 'pay-2']
+
+
+def test_orders_are_read_in_one_query(service):
+    counts = {}
+    add_orders(service, 1)
+    for total in (1, 20):
+        if counts:
+            add_orders(service, total - 1, start=1)
+        with service.app_context():
+            engine = db.engine
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert len(service.test_client().get('/orders').get_json()) == total
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        counts[total] = len(statements)
+    assert counts[1] == counts[20] == 1
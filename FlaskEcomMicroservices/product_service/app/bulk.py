@@ -0,0 +1,203 @@
+import csv
+import io
+import json
+
+from sqlalchemy import insert, text, update
+
+from .models import Product, db
+from .versions import PRODUCT_CATALOG, bump_version
+
+"""
+Bulk product import/export helpers
+"""
+
+IMPORT_FIELDS = ('id', 'product_name', 'current_price', 'previous_price', 'in_stock', 'flash_sale',
+                 'product_picture')
+EXPORT_FIELDS = IMPORT_FIELDS + ('date_added',)
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f', ''}
+
+
+def read_rows(stream, content_type):
+    """
+    Yield (line_number, raw_row) from an NDJSON or CSV request body without buffering it. Lines that can't be
+    decoded are yielded as (line_number, ValueError) so they end up in the error report.
+    """
+    lines = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+    if content_type == 'text/csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('expected a JSON object')
+            yield line_number, row
+        except ValueError as e:
+            yield line_number, ValueError(f'invalid JSON: {e}')
+
+
+def parse_bool(value):
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    normalized = str(value).strip().lower()
+    if normalized in TRUE_VALUES:
+        return True
+    if normalized in FALSE_VALUES:
+        return False
+    raise ValueError(f'flash_sale: not a boolean: {value!r}')
+
+
+def validate_row(row):
+    """
+    Convert a raw NDJSON/CSV row to Product column values.
+
+    :raises ValueError: describing the first invalid or missing field
+    """
+    values = {}
+    for field in ('product_name', 'product_picture'):
+        value = row.get(field)
+        if value is None or not str(value).strip():
+            raise ValueError(f'{field}: required')
+        values[field] = str(value).strip()
+    if len(values['product_name']) > 100 or len(values['product_picture']) > 100:
+        raise ValueError('product_name and product_picture are limited to 100 characters')
+
+    for field, convert in (('current_price', float), ('previous_price', float), ('in_stock', int)):
+        value = row.get(field)
+        if value is None or value == '':
+            raise ValueError(f'{field}: required')
+        try:
+            values[field] = convert(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{field}: not a valid {convert.__name__}: {value!r}')
+        if values[field] < 0:
+            raise ValueError(f'{field}: must not be negative')
+
+    values['flash_sale'] = parse_bool(row.get('flash_sale', False))
+
+    if row.get('id') not in (None, ''):
+        try:
+            values['id'] = int(row['id'])
+        except (TypeError, ValueError):
+            raise ValueError(f'id: not a valid int: {row["id"]!r}')
+    return values
+
+
+def write_chunk(chunk):
+    """
+    Upsert one chunk of validated rows in a single transaction: rows whose id already exists are updated,
+    the rest inserted. Ids are looked up with one IN query and both writes are executemany statements.
+    An id repeated within the chunk is written once, with its last row, as if the rows were applied in order.
+
+    :return: (inserted, updated)
+    """
+    latest = {}
+    without_id = []
+    for _, values in chunk:
+        if 'id' in values:
+            latest[values['id']] = values
+        else:
+            without_id.append(values)
+    # The rows a later one with the same id replaced count as updates of it
+    repeated = len(chunk) - len(without_id) - len(latest)
+
+    existing = {product_id for (product_id,) in
+                db.session.query(Product.id).filter(Product.id.in_(list(latest)))} if latest else set()
+    updates = [values for product_id, values in latest.items() if product_id in existing]
+    # executemany needs every row to have the same keys
+    with_id = [values for product_id, values in latest.items() if product_id not in existing]
+
+    if updates:
+        db.session.execute(update(Product), updates)
+    for rows in (with_id, without_id):
+        if rows:
+            db.session.execute(insert(Product), rows)
+    bump_version(PRODUCT_CATALOG)
+    if with_id and db.session.get_bind().dialect.name == 'postgresql':
+        # Explicit ids don't advance the serial sequence; move it past them so later inserts don't collide
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('product', 'id'), "
+                                "(SELECT MAX(id) FROM product))"))
+    db.session.commit()
+    return len(with_id) + len(without_id), len(updates) + repeated
+
+
+def import_products(rows, chunk_size, max_errors):
+    """
+    Validate rows as they are read and upsert them chunk_size at a time, committing per chunk so memory use
+    stays flat and a failing chunk doesn't undo the ones before it.
+
+    :return: report with inserted/updated/failed counts and up to max_errors per-row errors
+    """
+    report = {'inserted': 0, 'updated': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_number, error):
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'line': line_number, 'error': str(error)})
+
+    def flush(chunk):
+        try:
+            inserted, updated = write_chunk(chunk)
+            report['inserted'] += inserted
+            report['updated'] += updated
+        except Exception as e:
+            db.session.rollback()
+            for line_number, _ in chunk:
+                fail(line_number, f'chunk rejected by the database: {e.__class__.__name__}: {e}')
+
+    chunk = []
+    for line_number, row in rows:
+        if isinstance(row, Exception):
+            fail(line_number, row)
+            continue
+        try:
+            chunk.append((line_number, validate_row(row)))
+        except ValueError as e:
+            fail(line_number, e)
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    report['errors_truncated'] = report['failed'] > len(report['errors'])
+    return report
+
+
+def export_rows(batch_size):
+    """
+    Yield every product as a dict, reading batch_size rows at a time (a server-side cursor on PostgreSQL).
+    """
+    columns = [getattr(Product, field) for field in EXPORT_FIELDS]
+    query = db.session.query(*columns).order_by(Product.id).execution_options(yield_per=batch_size)
+    for row in query:
+        values = dict(row._mapping)
+        if values['date_added'] is not None:
+            values['date_added'] = values['date_added'].isoformat()
+        yield values
+
+
+def export_ndjson(rows):
+    for values in rows:
+        yield json.dumps(values) + '\n'
+
+
+def export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for values in rows:
+        writer.writerow(values)
+        # Flush roughly every 64KB instead of yielding tiny chunks
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+from .singleflight import SingleFlight
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by outcome', ['cache', 'result'])
+CACHE_AGE = Gauge('cache_age_seconds', 'Age of the cached payload at the last lookup', ['cache'])
+CATALOG_VERSION = Gauge('catalog_version', 'Current product catalog version')
+
+
+class CatalogSnapshots:
+    """
+    Versioned in-process snapshots of derived catalog data (e.g. the flash-sale feed).
+
+    Every product write bumps the catalog version (see versions.py); a snapshot is served only while it was
+    built against the current version, so there is no TTL to tune and no stale window after an admin edit.
+    Concurrent misses for the same snapshot run a single rebuild query.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._singleflight = SingleFlight('catalog-snapshots')
+
+    def get(self, name, version, build):
+        CATALOG_VERSION.set(version)
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+
+        if snapshot is not None and snapshot['version'] == version:
+            CACHE_REQUESTS.labels(cache=name, result='hit').inc()
+            CACHE_AGE.labels(cache=name).set(time.time() - snapshot['built_at'])
+            return snapshot['payload']
+
+        CACHE_REQUESTS.labels(cache=name, result='miss').inc()
+        payload = self._singleflight.do((name, version), build)
+        with self._lock:
+            # A build can only see writes at or after `version`, so never replace a newer snapshot with it
+            current = self._snapshots.get(name)
+            if current is None or current['version'] < version:
+                self._snapshots[name] = {'version': version, 'built_at': time.time(), 'payload': payload}
+        CACHE_AGE.labels(cache=name).set(0)
+        return payload
+
+
+catalog_snapshots = CatalogSnapshots()
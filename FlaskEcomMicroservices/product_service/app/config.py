@@ -6,3 +6,13 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = './media'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # GET /products pagination (cursor-based on date_added, id)
+    PRODUCTS_PAGE_SIZE = int(os.getenv('PRODUCTS_PAGE_SIZE', '100'))
+    PRODUCTS_MAX_PAGE_SIZE = int(os.getenv('PRODUCTS_MAX_PAGE_SIZE', '1000'))
+    # Most ids resolved by one /products/batch call
+    PRODUCTS_BATCH_MAX_IDS = int(os.getenv('PRODUCTS_BATCH_MAX_IDS', '500'))
+    # Bulk import/export: rows upserted per transaction, per-row errors reported, rows read per export batch
+    PRODUCTS_IMPORT_CHUNK_SIZE = int(os.getenv('PRODUCTS_IMPORT_CHUNK_SIZE', '1000'))
+    PRODUCTS_IMPORT_MAX_BYTES = int(os.getenv('PRODUCTS_IMPORT_MAX_BYTES', str(1024 * 1024 * 1024)))
+    PRODUCTS_IMPORT_MAX_ERRORS = int(os.getenv('PRODUCTS_IMPORT_MAX_ERRORS', '1000'))
+    PRODUCTS_EXPORT_BATCH_SIZE = int(os.getenv('PRODUCTS_EXPORT_BATCH_SIZE', '1000'))
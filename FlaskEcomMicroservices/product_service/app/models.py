@@ -13,5 +13,12 @@ class Product(db.Model):
     product_picture = db.Column(db.String(100), nullable=False)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Backs the keyset pagination of GET /products
+        db.Index('ix_product_date_added_id', 'date_added', 'id'),
+        # Partial index: the flash-sale feed only ever reads the few flash_sale rows
+        db.Index('ix_product_flash_sale', 'id', postgresql_where=db.text('flash_sale')),
+    )
+
     def __repr__(self):
         return f"<Product {self.product_name}>"
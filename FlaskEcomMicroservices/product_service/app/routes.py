@@ -1,9 +1,18 @@
+import base64
+import json
 import logging
+from datetime import datetime
 
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, g, current_app, stream_with_context
 from prometheus_client import Counter, generate_latest
+from sqlalchemy import tuple_
+from werkzeug.wsgi import get_input_stream
 
+from .bulk import read_rows, import_products, export_rows, export_ndjson, export_csv
+from .cache import catalog_snapshots
+from .streaming import STREAM_BATCH_SIZE, stream_rows, wants_ndjson
 from .models import Product, db
+from .versions import PRODUCT_CATALOG, current_version, bump_version, resource_etag, not_modified
 
 product_routes = Blueprint('product_routes', __name__)
 
@@ -18,6 +27,22 @@ logger.addHandler(handler)
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP Requests')
 
 
+TRACE_HEADER = 'X-Request-ID'
+
+
+@product_routes.before_request
+def start_trace():
+    # Correlation id generated by view_service for the page this call belongs to
+    g.trace_id = request.headers.get(TRACE_HEADER, '-')
+    logger.info(f"{request.method} {request.path} trace_id={g.trace_id}")
+
+
+@product_routes.after_request
+def finish_trace(response):
+    response.headers[TRACE_HEADER] = g.get('trace_id', '-')
+    return response
+
+
 @product_routes.route('/metrics')
 def metrics():
     return Response(generate_latest(), mimetype='text/plain; version=0.0.4')
@@ -51,6 +76,7 @@ def add_product():
 
     try:
         db.session.add(new_product)
+        bump_version(PRODUCT_CATALOG)
         db.session.commit()
         return jsonify({'message': f'Product {product_name} added successfully'}), 200
     except Exception as e:
@@ -58,39 +84,105 @@ def add_product():
         return jsonify({'message': f'Error adding product: {str(e)}'}), 500
 
 
+IMPORT_CONTENT_TYPES = ('application/x-ndjson', 'text/csv')
+
+
+@product_routes.route('/products/import', methods=['POST'])
+def bulk_import_products():
+    """
+    Bulk upsert products from an NDJSON (application/x-ndjson) or CSV (text/csv, with a header row) body.
+
+    The body is read as a stream and rows are validated as they arrive, then written chunk_size rows per
+    transaction (?chunk_size= overrides PRODUCTS_IMPORT_CHUNK_SIZE). Rows with an existing `id` update that
+    product, others are inserted.
+
+    :return: {"inserted", "updated", "failed", "errors": [{"line", "error"}], "errors_truncated"}
+    """
+    REQUEST_COUNT.inc()
+    content_type = request.mimetype
+    if content_type not in IMPORT_CONTENT_TYPES:
+        return jsonify({'message': f'Content-Type must be one of {", ".join(IMPORT_CONTENT_TYPES)}'}), 415
+    try:
+        chunk_size = int(request.args.get('chunk_size', current_app.config['PRODUCTS_IMPORT_CHUNK_SIZE']))
+    except ValueError:
+        return jsonify({'message': 'chunk_size must be an integer'}), 400
+    if chunk_size < 1:
+        return jsonify({'message': 'chunk_size must be positive'}), 400
+
+    # Feeds are far larger than MAX_CONTENT_LENGTH, so this endpoint gets its own limit
+    stream = get_input_stream(request.environ, max_content_length=current_app.config['PRODUCTS_IMPORT_MAX_BYTES'])
+    report = import_products(read_rows(stream, content_type), chunk_size,
+                             current_app.config['PRODUCTS_IMPORT_MAX_ERRORS'])
+
+    logger.info(f"Bulk import: {report['inserted']} inserted, {report['updated']} updated, "
+                f"{report['failed']} failed")
+    return jsonify(report), 200
+
+
+@product_routes.route('/products/export', methods=['GET'])
+def bulk_export_products():
+    """
+    Stream the whole catalog as NDJSON (default) or CSV (?format=csv) without loading it into memory.
+    """
+    REQUEST_COUNT.inc()
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+
+    rows = export_rows(current_app.config['PRODUCTS_EXPORT_BATCH_SIZE'])
+    if export_format == 'csv':
+        return Response(stream_with_context(export_csv(rows)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=products.csv'})
+    return Response(stream_with_context(export_ndjson(rows)), mimetype='application/x-ndjson')
+
+
+def build_flash_sale_items():
+    # Query products that are on flash sale
+    flash_sale_items = Product.query.filter_by(flash_sale=True).all()
+
+    if not flash_sale_items:
+        logger.warning("No flash sale products found.")
+
+    # Prepare a list of product data to return, including all the columns
+    items = []
+    for item in flash_sale_items:
+        try:
+            # Check each field and handle missing or invalid values
+            product_data = {
+                'id': item.id if item.id is not None else 'N/A',
+                'product_name': item.product_name if item.product_name else 'Unknown',
+                'current_price': item.current_price if item.current_price else 0.0,
+                'previous_price': item.previous_price if item.previous_price else 0.0,
+                'in_stock': item.in_stock if item.in_stock is not None else 0,
+                'flash_sale': item.flash_sale if item.flash_sale is not None else False,
+                'product_picture': item.product_picture if item.product_picture else 'default.jpg'
+            }
+            items.append(product_data)
+        except Exception as e:
+            logger.error(f"Error processing product with ID {item.id}: {e}")
+
+    logger.info(f"Found {len(items)} flash sale products.")
+    logger.debug(f"Items data: {items}")  # Use debug level to log data
+    return items
+
+
 @product_routes.route('/products/flash-sale', methods=['GET'])
 def flash_sale_products():
     REQUEST_COUNT.inc()
     try:
-        # Query products that are on flash sale
-        flash_sale_items = Product.query.filter_by(flash_sale=True).all()
+        version = current_version(PRODUCT_CATALOG)
+        etag = resource_etag(PRODUCT_CATALOG, version)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
 
-        if not flash_sale_items:
-            logger.warning("No flash sale products found.")
+        # Served from the catalog snapshot; rebuilt only after a product write
+        items = catalog_snapshots.get('flash-sale', version, build_flash_sale_items)
 
-        # Prepare a list of product data to return, including all the columns
-        items = []
-        logger.info("========>>>>>>>>")
-        for item in flash_sale_items:
-            try:
-                # Check each field and handle missing or invalid values
-                product_data = {
-                    'id': item.id if item.id is not None else 'N/A',
-                    'product_name': item.product_name if item.product_name else 'Unknown',
-                    'current_price': item.current_price if item.current_price else 0.0,
-                    'previous_price': item.previous_price if item.previous_price else 0.0,
-                    'in_stock': item.in_stock if item.in_stock is not None else 0,
-                    'flash_sale': item.flash_sale if item.flash_sale is not None else False,
-                    'product_picture': item.product_picture if item.product_picture else 'default.jpg'
-                }
-                items.append(product_data)
-            except Exception as e:
-                logger.error(f"Error processing product with ID {item.id}: {e}")
-
-        logger.info(f"Found {len(items)} flash sale products.")
-        logger.debug(f"Items data: {items}")  # Use debug level to log data
-
-        return jsonify(items)
+        response = jsonify(items)
+        response.headers['X-Catalog-Version'] = str(version)
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         # Return error message if something goes wrong
@@ -117,6 +209,7 @@ def update_product(item_id):
         product.product_picture = data['product_picture']
 
         # Commit changes to the database
+        bump_version(PRODUCT_CATALOG)
         db.session.commit()
 
         return jsonify({'message': 'Product updated successfully'}), 200
@@ -124,26 +217,91 @@ def update_product(item_id):
         return jsonify({'message': f'Error updating product: {str(e)}'}), 500
 
 
+# Columns a client may ask for with ?fields=
+PRODUCT_COLUMNS = {column.name: column for column in Product.__table__.columns}
+
+
+def encode_cursor(date_added, product_id):
+    raw = json.dumps([date_added.isoformat(), product_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    date_added, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(date_added), int(product_id)
+
+
 @product_routes.route('/products', methods=['GET'])
 def get_all_products():
+    """
+    List products ordered by (date_added, id).
+
+    `fields=a,b` selects only those columns (`id` is always included). Passing `limit` and/or `cursor`
+    returns one page as {"items": [...], "next_cursor": ...}; without them the whole catalog is streamed as
+    a plain array, as before (or NDJSON, see streaming.py).
+    """
     REQUEST_COUNT.inc()
+
+    names = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    if not names:
+        names = list(PRODUCT_COLUMNS)
+    unknown = [name for name in names if name not in PRODUCT_COLUMNS]
+    if unknown:
+        return jsonify({'message': f'Unknown fields: {", ".join(unknown)}'}), 400
+    if 'id' not in names:
+        names.insert(0, 'id')
+
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    if paginated:
+        try:
+            limit = int(request.args.get('limit', current_app.config['PRODUCTS_PAGE_SIZE']))
+        except ValueError:
+            return jsonify({'message': 'limit must be an integer'}), 400
+        if not 1 <= limit <= current_app.config['PRODUCTS_MAX_PAGE_SIZE']:
+            return jsonify({'message': f'limit must be between 1 and '
+                                       f'{current_app.config["PRODUCTS_MAX_PAGE_SIZE"]}'}), 400
+
     try:
-        # Fetch all products from the database
-        products = Product.query.all()
-
-        # Prepare the product data to return
-        product_list = [{
-            'id': product.id,
-            'product_name': product.product_name,
-            'current_price': product.current_price,
-            'previous_price': product.previous_price,
-            'in_stock': product.in_stock,
-            'flash_sale': product.flash_sale,
-            'product_picture': product.product_picture,
-            'date_added': product.date_added
-        } for product in products]
-
-        return jsonify(product_list), 200
+        # Read the version before the rows: a write racing this request can then only make the ETag older
+        # than the body (costing one extra fetch later), never newer
+        etag = resource_etag(PRODUCT_CATALOG, current_version(PRODUCT_CATALOG))
+        if not paginated and wants_ndjson():
+            etag += '.ndjson'
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
+        # The sort key is always selected so the next cursor can be built from the last row
+        selected = names + [name for name in ('date_added',) if name not in names]
+        query = db.session.query(*(PRODUCT_COLUMNS[name] for name in selected)) \
+            .order_by(Product.date_added, Product.id)
+
+        if not paginated:
+            rows = iter(query.yield_per(STREAM_BATCH_SIZE))
+            response = stream_rows(rows, lambda row: {name: row._mapping[name] for name in names})
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            return response, 200
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({'message': 'Invalid cursor'}), 400
+            query = query.filter(tuple_(Product.date_added, Product.id) > after)
+
+        # One extra row tells whether there is a next page without a COUNT query
+        rows = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].date_added, rows[-1].id)
+
+        response = jsonify({'items': [{name: row._mapping[name] for name in names} for row in rows],
+                            'next_cursor': next_cursor})
+        response.set_etag(etag)
+        return response, 200
     except Exception as e:
         return jsonify({'message': f'Error fetching products: {str(e)}'}), 500
 
@@ -156,6 +314,7 @@ def delete_product(item_id):
         item_to_delete = Product.query.get(item_id)
         if item_to_delete:
             db.session.delete(item_to_delete)
+            bump_version(PRODUCT_CATALOG)
             db.session.commit()
             return jsonify({'message': 'Product deleted successfully'}), 200
         else:
@@ -165,27 +324,69 @@ def delete_product(item_id):
         return jsonify({'message': f'Error deleting product: {str(e)}'}), 500
 
 
+def product_to_dict(product):
+    return {
+        'id': product.id,
+        'product_name': product.product_name,
+        'current_price': product.current_price,
+        'previous_price': product.previous_price,
+        'in_stock': product.in_stock,
+        'flash_sale': product.flash_sale,
+        'product_picture': product.product_picture,
+        'date_added': product.date_added
+    }
+
+
+@product_routes.route('/products/batch', methods=['GET', 'POST'])
+def get_products_batch():
+    """
+    Resolve many products in one query: GET /products/batch?ids=1,2,3 or POST {"ids": [1, 2, 3]} for long lists.
+
+    :return: {"products": [...], "missing": [ids not found]}
+    """
+    REQUEST_COUNT.inc()
+    try:
+        if request.method == 'POST':
+            raw_ids = (request.get_json(silent=True) or {}).get('ids', [])
+        else:
+            raw_ids = [value for value in request.args.get('ids', '').split(',') if value.strip()]
+        ids = list(dict.fromkeys(int(value) for value in raw_ids))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'ids must be a list of integers'}), 400
+
+    max_ids = current_app.config['PRODUCTS_BATCH_MAX_IDS']
+    if len(ids) > max_ids:
+        return jsonify({'message': f'At most {max_ids} ids per batch'}), 400
+
+    try:
+        products = Product.query.filter(Product.id.in_(ids)).all() if ids else []
+        found = {product.id for product in products}
+        return jsonify({'products': [product_to_dict(product) for product in products],
+                        'missing': [product_id for product_id in ids if product_id not in found]}), 200
+    except Exception as e:
+        logger.error(f"Error fetching product batch: {str(e)}")
+        return jsonify({'message': f'Error fetching products: {str(e)}'}), 500
+
+
 @product_routes.route('/products/<int:item_id>', methods=['GET'])
 def get_product_by_id(item_id):
     REQUEST_COUNT.inc()
     try:
+        etag = resource_etag(PRODUCT_CATALOG, current_version(PRODUCT_CATALOG))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
         product = Product.query.get(item_id)  # Fetch product from the database using the product ID
         if not product:
             return jsonify({"message": "Product not found"}), 404
 
-        product_data = {
-            'id': product.id,
-            'product_name': product.product_name,
-            'current_price': product.current_price,
-            'previous_price': product.previous_price,
-            'in_stock': product.in_stock,
-            'flash_sale': product.flash_sale,
-            'product_picture': product.product_picture,
-            'date_added': product.date_added
-        }
+        product_data = product_to_dict(product)
 
         logger.info(f"Product data for ID {item_id} fetched successfully")
-        return jsonify(product_data)
+        response = jsonify(product_data)
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         logger.error(f"Error fetching product with ID {item_id}: {str(e)}")
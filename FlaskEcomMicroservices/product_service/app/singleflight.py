@@ -0,0 +1,51 @@
+import threading
+
+from prometheus_client import Counter
+
+SINGLEFLIGHT_COLLAPSED = Counter('singleflight_collapsed_total',
+                                 'Calls that waited on an identical in-flight call instead of issuing their own',
+                                 ['group'])
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution. The first caller runs the function;
+    callers arriving while it is in flight wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SINGLEFLIGHT_COLLAPSED.labels(group=self.group).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,31 @@
+"""Create the resource_version counters table
+
+Revision ID: 1ebbee3322b7
+Revises: 6c1f0e2a9b41
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1ebbee3322b7'
+down_revision = '6c1f0e2a9b41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Shared by the product, cart and order services (see app/versions.py): whichever migrates first creates it
+    op.create_table(
+        'resource_version',
+        sa.Column('name', sa.String(length=100), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    # The other services still read and bump the counters, so the table is left in place
+    pass
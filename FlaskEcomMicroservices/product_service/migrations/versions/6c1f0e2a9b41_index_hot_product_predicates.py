@@ -0,0 +1,29 @@
+"""Index the hot product predicates
+
+Revision ID: 6c1f0e2a9b41
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c1f0e2a9b41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The flash-sale feed filters on flash_sale = true, which only a handful of rows match
+    op.create_index('ix_product_flash_sale', 'product', ['id'], postgresql_where=sa.text('flash_sale'),
+                    if_not_exists=True)
+    # Keyset pagination of GET /products on (date_added, id)
+    op.create_index('ix_product_date_added_id', 'product', ['date_added', 'id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_product_date_added_id', table_name='product', if_exists=True)
+    op.drop_index('ix_product_flash_sale', table_name='product', if_exists=True)
@@ -0,0 +1,25 @@
+import pytest
+
+from app import create_app
+from app.cache import catalog_snapshots
+from app.config import Config
+from app.models import Product, db
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """
+    product_service on a scratch SQLite database holding product 1, "Watch".
+    """
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'product.sqlite3'}")
+    # Versions start over with every database, so snapshots from another test could look current
+    monkeypatch.setattr(catalog_snapshots, '_snapshots', {})
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(Product(id=1, product_name='Watch', current_price=20, previous_price=25, in_stock=3,
+                               product_picture='/media/lamp.jpg'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
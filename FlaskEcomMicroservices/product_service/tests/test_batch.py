@@ -0,0 +1,46 @@
+"""
+Batch product lookups: GET /products/batch?ids= and POST {"ids": [...]}.
+"""
+import pytest
+
+from app.models import Product, db
+
+
+@pytest.fixture
+def client(service):
+    with service.app_context():
+        db.session.add(Product(id=2, product_name='Lamp', current_price=5, previous_price=6, in_stock=1,
+                               product_picture='/media/lamp.jpg'))
+        db.session.commit()
+    return service.test_client()
+
+
+def test_get_resolves_products_and_reports_missing_ids(client):
+    body = client.get('/products/batch?ids=2,9,1,2').get_json()
+    assert sorted(product['product_name'] for product in body['products']) == ['Lamp', 'Watch']
+    assert body['missing'] == [9]
+
+
+def test_post_takes_the_ids_in_the_body(client):
+    body = client.post('/products/batch', json={'ids': [1, '2', 7]}).get_json()
+    assert sorted(product['id'] for product in body['products']) == [1, 2]
+    assert body['missing'] == [7]
+
+
+def test_no_ids_is_an_empty_answer(client):
+    assert client.get('/products/batch').get_json() == {'products': [], 'missing': []}
+
+
+@pytest.mark.parametrize('request_kwargs', [{'query_string': {'ids': '1,x'}},
+                                            {'method': 'POST', 'json': {'ids': [1, None]}},
+                                            {'method': 'POST', 'json': {'ids': 5}}])
+def test_ids_must_be_integers(client, request_kwargs):
+    assert client.open('/products/batch', **request_kwargs).status_code == 400
+
+
+def test_batch_size_is_capped(client, service):
+    service.config['PRODUCTS_BATCH_MAX_IDS'] = 3
+    assert client.post('/products/batch', json={'ids': [1, 2, 3]}).status_code == 200
+    # Repeated ids count once
+    assert client.post('/products/batch', json={'ids': [1, 1, 2, 2, 3]}).status_code == 200
+    assert client.post('/products/batch', json={'ids': [1, 2, 3, 4]}).status_code == 400
@@ -0,0 +1,108 @@
+"""
+Bulk product import and export.
+"""
+import csv
+import io
+import json
+
+from app.models import Product, db
+from app.versions import PRODUCT_CATALOG, current_version
+
+NDJSON = 'application/x-ndjson'
+
+
+def product(**values):
+    row = {'product_name': 'Lamp', 'current_price': 20, 'previous_price': 25, 'in_stock': 3,
+           'product_picture': '/media/lamp.jpg'}
+    row.update(values)
+    return row
+
+
+def ndjson(*rows):
+    return ''.join((row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows)
+
+
+def import_body(app, body, content_type=NDJSON, chunk_size=100):
+    response = app.test_client().post(f'/products/import?chunk_size={chunk_size}', data=body,
+                                      content_type=content_type)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def names(app):
+    with app.app_context():
+        return dict(db.session.query(Product.id, Product.product_name).order_by(Product.id))
+
+
+def test_valid_rows_are_inserted_and_updated(service):
+    with service.app_context():
+        version = current_version(PRODUCT_CATALOG)
+    report = import_body(service, ndjson(product(id=1, product_name='Watch 2'), product(product_name='Clock'),
+                                         product(id=7, product_name='Radio')))
+    assert report == {'inserted': 2, 'updated': 1, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    assert names(service) == {1: 'Watch 2', 7: 'Radio', 8: 'Clock'}
+    with service.app_context():
+        assert current_version(PRODUCT_CATALOG) > version
+
+
+def test_invalid_rows_are_reported_without_failing_the_rest(service):
+    report = import_body(service, ndjson(product(product_name='Clock'), product(current_price='cheap'),
+                                         '{not json', product(in_stock=-1), '[1, 2]', product(id='x')),
+                         chunk_size=2)
+    assert (report['inserted'], report['updated'], report['failed']) == (1, 0, 5)
+    assert [error['line'] for error in report['errors']] == [2, 3, 4, 5, 6]
+    assert report['errors'][0]['error'] == "current_price: not a valid float: 'cheap'"
+    assert names(service) == {1: 'Watch', 2: 'Clock'}
+
+
+def test_errors_are_truncated(service, monkeypatch):
+    service.config['PRODUCTS_IMPORT_MAX_ERRORS'] = 2
+    report = import_body(service, ndjson(*[product(product_name='')] * 3))
+    assert report['failed'] == 3 and len(report['errors']) == 2 and report['errors_truncated']
+
+
+def test_duplicate_ids_in_a_chunk_keep_the_last_row(service):
+    report = import_body(service, ndjson(product(id=1, product_name='Watch 2'), product(id=5, product_name='A'),
+                                         product(id=1, product_name='Watch 3'), product(id=5, product_name='B'),
+                                         product(product_name='Clock')))
+    assert report == {'inserted': 2, 'updated': 3, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    assert names(service) == {1: 'Watch 3', 5: 'B', 6: 'Clock'}
+
+
+def test_csv_import(service):
+    body = 'id,product_name,current_price,previous_price,in_stock,flash_sale,product_picture\n' \
+           ',Clock,10,12,1,yes,/media/clock.jpg\n1,Watch 2,10,12,1,no,/media/watch.jpg\n'
+    report = import_body(service, body, content_type='text/csv')
+    assert (report['inserted'], report['updated'], report['failed']) == (1, 1, 0)
+    with service.app_context():
+        assert db.session.get(Product, 2).flash_sale is True
+
+
+def test_import_rejects_other_content_types(service):
+    response = service.test_client().post('/products/import', data='{}', content_type='application/json')
+    assert response.status_code == 415
+
+
+def test_export_streams_ndjson_and_csv(service):
+    import_body(service, ndjson(product(product_name='Clock', flash_sale=True)))
+    client = service.test_client()
+
+    response = client.get('/products/export')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['id'], row['product_name'], row['flash_sale']) for row in rows] == \
+        [(1, 'Watch', False), (2, 'Clock', True)]
+    assert set(rows[0]) == {'id', 'product_name', 'current_price', 'previous_price', 'in_stock', 'flash_sale',
+                            'product_picture', 'date_added'}
+
+    response = client.get('/products/export?format=csv')
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=products.csv'
+    exported = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['product_name'] for row in exported] == ['Watch', 'Clock']
+
+    # What the export writes, the import reads back
+    report = import_body(service, response.get_data(as_text=True), content_type='text/csv')
+    assert (report['updated'], report['failed']) == (2, 0)
+
+    assert client.get('/products/export?format=xml').status_code == 400
@@ -0,0 +1,95 @@
+"""
+The flash-sale feed, served from a snapshot that product writes invalidate.
+"""
+import threading
+
+import pytest
+
+from app import routes
+from app.cache import CatalogSnapshots
+
+ITEM = {'product_name': 'Lamp', 'current_price': 20, 'previous_price': 25, 'in_stock': 3, 'flash_sale': True,
+        'product_picture': '/media/lamp.jpg'}
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    build = routes.build_flash_sale_items
+
+    def counted():
+        calls.append(1)
+        return build()
+
+    monkeypatch.setattr(routes, 'build_flash_sale_items', counted)
+    return calls
+
+
+def names(response):
+    return [item['product_name'] for item in response.get_json()]
+
+
+def test_feed_is_built_once_per_catalog_version(service, builds):
+    client = service.test_client()
+    assert client.post('/products/add', json=ITEM).status_code == 200
+
+    first = client.get('/products/flash-sale')
+    second = client.get('/products/flash-sale')
+    assert names(first) == names(second) == ['Lamp']
+    assert first.headers['X-Catalog-Version'] == second.headers['X-Catalog-Version']
+    assert len(builds) == 1
+
+
+@pytest.mark.parametrize('write', ['add', 'update', 'delete'])
+def test_product_writes_invalidate_the_feed(service, builds, write):
+    client = service.test_client()
+    client.post('/products/add', json=ITEM)
+    before = client.get('/products/flash-sale')
+
+    if write == 'add':
+        response = client.post('/products/add', json=dict(ITEM, product_name='Fan'))
+        expected = ['Lamp', 'Fan']
+    elif write == 'update':
+        response = client.put('/products/1/update', json=dict(ITEM, product_name='Watch'))
+        expected = ['Watch', 'Lamp']
+    else:
+        response = client.delete('/products/2')
+        expected = []
+    assert response.status_code == 200
+
+    after = client.get('/products/flash-sale')
+    assert sorted(names(after)) == sorted(expected)
+    assert int(after.headers['X-Catalog-Version']) > int(before.headers['X-Catalog-Version'])
+    assert len(builds) == 2
+
+
+def test_concurrent_misses_build_once():
+    snapshots = CatalogSnapshots()
+    start, builds = threading.Barrier(8), []
+
+    def build():
+        builds.append(1)
+        threading.Event().wait(0.1)
+        return ['Lamp']
+
+    def worker():
+        start.wait()
+        assert snapshots.get('flash-sale', 3, build) == ['Lamp']
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    # An older version's build never replaces the newer snapshot
+    assert snapshots.get('flash-sale', 2, lambda: ['Old']) == ['Old']
+    assert snapshots.get('flash-sale', 3, build) == ['Lamp'] and len(builds) == 1
+
+
+def test_unchanged_feed_is_not_modified(service):
+    client = service.test_client()
+    etag = client.get('/products/flash-sale').headers['ETag']
+    assert client.get('/products/flash-sale', headers={'If-None-Match': etag}).status_code == 304
+    client.post('/products/add', json=ITEM)
+    assert client.get('/products/flash-sale', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,59 @@
+"""
+GET /products: field projection and keyset pagination.
+"""
+from datetime import datetime
+
+import pytest
+
+from app.models import Product, db
+
+
+@pytest.fixture
+def catalog(service):
+    # Three products share a date_added, so pages must break the tie on id
+    with service.app_context():
+        db.session.query(Product).delete()
+        for product_id, day in ((1, 3), (2, 1), (3, 2), (4, 2), (5, 2), (6, 4)):
+            db.session.add(Product(id=product_id, product_name=f'Product {product_id}', current_price=10,
+                                   previous_price=12, in_stock=1, product_picture='/media/p.jpg',
+                                   date_added=datetime(2024, 1, day)))
+        db.session.commit()
+    return service.test_client()
+
+
+ORDER = [2, 3, 4, 5, 1, 6]
+
+
+def test_pages_walk_the_catalog_in_order(catalog):
+    seen, cursor = [], None
+    while True:
+        query = '/products?limit=4&fields=id' + (f'&cursor={cursor}' if cursor else '')
+        page = catalog.get(query).get_json()
+        seen.append([item['id'] for item in page['items']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == [ORDER[:4], ORDER[4:]]
+
+
+def test_last_full_page_has_no_next_cursor(catalog):
+    page = catalog.get('/products?limit=6').get_json()
+    assert [item['id'] for item in page['items']] == ORDER
+    assert page['next_cursor'] is None
+
+
+def test_fields_select_columns_and_always_include_id(catalog):
+    page = catalog.get('/products?limit=1&fields=product_name,current_price').get_json()
+    assert page['items'] == [{'id': 2, 'product_name': 'Product 2', 'current_price': 10.0}]
+    assert [set(item) for item in catalog.get('/products?fields=in_stock').get_json()] == [{'id', 'in_stock'}] * 6
+
+
+def test_unpaginated_listing_is_a_plain_array(catalog):
+    items = catalog.get('/products').get_json()
+    assert [item['id'] for item in items] == ORDER
+    assert set(items[0]) == {column.name for column in Product.__table__.columns}
+
+
+@pytest.mark.parametrize('query', ['fields=id,secret', 'limit=0', 'limit=1001', 'limit=ten', 'cursor=bogus'])
+def test_bad_arguments_are_rejected(catalog, query):
+    assert catalog.get(f'/products?{query}').status_code == 400
@@ -0,0 +1,48 @@
+"""
+The unpaginated product listing, streamed as a JSON array or NDJSON.
+"""
+import json
+
+from app import streaming
+from app.models import Product, db
+
+
+def add_products(app, count):
+    with app.app_context():
+        db.session.add_all(Product(product_name=f'Product {number}', current_price=10, previous_price=12,
+                                   in_stock=1, product_picture='/media/p.jpg') for number in range(count))
+        db.session.commit()
+
+
+def test_listing_is_sent_in_chunks(service, monkeypatch):
+    monkeypatch.setattr(streaming, 'FLUSH_BYTES', 512)
+    add_products(service, 30)
+    response = service.test_client().get('/products?fields=product_name')
+    chunks = list(response.response)
+    assert len(chunks) > 2
+    items = json.loads(''.join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks))
+    assert len(items) == 31 and items[0] == {'id': 1, 'product_name': 'Watch'}
+
+
+def test_listing_as_ndjson_has_its_own_etag(service):
+    add_products(service, 2)
+    client = service.test_client()
+    array = client.get('/products')
+    ndjson = client.get('/products', headers={'Accept': 'application/x-ndjson'})
+
+    assert ndjson.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in ndjson.get_data(as_text=True).splitlines()] == array.get_json()
+    assert ndjson.headers['ETag'] != array.headers['ETag']
+    assert 'Accept' in array.headers['Vary'] and 'Accept' in ndjson.headers['Vary']
+    assert client.get('/products?format=ndjson', headers={'If-None-Match': ndjson.headers['ETag']}) \
+        .status_code == 304
+    assert client.get('/products', headers={'If-None-Match': ndjson.headers['ETag']}).status_code == 200
+
+
+def test_empty_listing_is_an_empty_array(service):
+    with service.app_context():
+        db.session.query(Product).delete()
+        db.session.commit()
+    client = service.test_client()
+    assert client.get('/products').get_json() == []
+    assert client.get('/products?format=ndjson').get_data() == b''
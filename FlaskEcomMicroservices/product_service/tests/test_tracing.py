@@ -0,0 +1,4 @@
+def test_trace_id_is_echoed(service):
+    client = service.test_client()
+    assert client.get('/products/1', headers={'X-Request-ID': 'abc123'}).headers['X-Request-ID'] == 'abc123'
+    assert client.get('/products/1').headers['X-Request-ID'] == '-'
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from markupsafe import Markup
+from prometheus_client import Counter, Gauge
+
+FLASH_SALE_CACHE_TTL = float(os.getenv('FLASH_SALE_CACHE_TTL', '30'))
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by outcome', ['cache', 'result'])
+CACHE_AGE = Gauge('cache_age_seconds', 'Age of the cached payload at the last lookup', ['cache'])
+CACHE_BYTES = Gauge('cache_size_bytes', 'Memory held by a size-bounded cache', ['cache'])
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Entries evicted to stay within the cache bound', ['cache'])
+
+
+class TTLCache:
+    """
+    Small in-process cache of downstream responses. Entries live for `ttl` seconds or until invalidated.
+    """
+
+    def __init__(self, name, ttl):
+        self.name = name
+        self.ttl = ttl
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, load):
+        """
+        Return the cached value for `key`, calling `load()` on a miss. Errors raised by `load` are not cached.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None and now - entry['stored_at'] < self.ttl:
+            CACHE_REQUESTS.labels(cache=self.name, result='hit').inc()
+            CACHE_AGE.labels(cache=self.name).set(now - entry['stored_at'])
+            return entry['value']
+
+        CACHE_REQUESTS.labels(cache=self.name, result='miss').inc()
+        generation = self._generation
+        value = load()
+        with self._lock:
+            # Drop the value if the cache was invalidated while it was being loaded
+            if self._generation == generation:
+                self._entries[key] = {'value': value, 'stored_at': time.time()}
+        CACHE_AGE.labels(cache=self.name).set(0)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered template fragments, bounded by the total size of the cached HTML.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+        if fragment is not None:
+            CACHE_REQUESTS.labels(cache=self.name, result='hit').inc()
+            return fragment[0]
+
+        CACHE_REQUESTS.labels(cache=self.name, result='miss').inc()
+        html = Markup(render())
+        size = len(html.encode())
+        with self._lock:
+            if size <= self.max_bytes and key not in self._fragments:
+                self._fragments[key] = (html, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    _, (_, evicted_size) = self._fragments.popitem(last=False)
+                    self.size -= evicted_size
+                    CACHE_EVICTIONS.labels(cache=self.name).inc()
+            CACHE_BYTES.labels(cache=self.name).set(self.size)
+        return html
+
+
+flash_sale_cache = TTLCache('flash-sale', FLASH_SALE_CACHE_TTL)
+fragment_cache = FragmentCache('fragments', FRAGMENT_CACHE_MAX_BYTES)
@@ -0,0 +1,276 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from prometheus_client import Counter, Gauge
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .singleflight import SingleFlight
+from .tracing import TRACE_HEADER, trace_id_var, observe_downstream
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_SERVICE_URL = os.getenv('PRODUCT_SERVICE_URL', 'http://product-service:5001')
+CART_SERVICE_URL = os.getenv('CART_SERVICE_URL', 'http://cart-service:5002')
+AUTH_SERVICE_URL = os.getenv('AUTH_SERVICE_URL', 'http://auth-service:5003')
+ORDER_SERVICE_URL = os.getenv('ORDER_SERVICE_URL', 'http://order-service:5004')
+
+# Connection pool and timeout settings shared by every downstream client
+POOL_MAXSIZE = int(os.getenv('DOWNSTREAM_POOL_MAXSIZE', '20'))
+POOL_BLOCK = os.getenv('DOWNSTREAM_POOL_BLOCK', 'false').lower() == 'true'
+CONNECT_TIMEOUT = float(os.getenv('DOWNSTREAM_CONNECT_TIMEOUT', '1.0'))
+READ_TIMEOUT = float(os.getenv('DOWNSTREAM_READ_TIMEOUT', '5.0'))
+MAX_RETRIES = int(os.getenv('DOWNSTREAM_MAX_RETRIES', '2'))
+RETRY_BACKOFF = float(os.getenv('DOWNSTREAM_RETRY_BACKOFF', '0.1'))
+RETRY_JITTER = float(os.getenv('DOWNSTREAM_RETRY_JITTER', '0.1'))
+
+# Resilience settings: concurrent calls allowed per service, consecutive failures that open its breaker,
+# how long the breaker stays open before a trial call, and how many last-good GET payloads are kept
+MAX_CONCURRENCY = int(os.getenv('DOWNSTREAM_MAX_CONCURRENCY', str(POOL_MAXSIZE)))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+STALE_CACHE_SIZE = int(os.getenv('STALE_CACHE_SIZE', '1000'))
+
+DOWNSTREAM_IN_FLIGHT = Gauge('downstream_in_flight_requests', 'In-flight requests per downstream service',
+                             ['service'])
+DOWNSTREAM_POOL_MAXSIZE = Gauge('downstream_pool_maxsize', 'Keep-alive connections kept per downstream service',
+                                ['service'])
+DOWNSTREAM_POOL_SATURATED = Counter('downstream_pool_saturated_total',
+                                    'Requests issued while every pooled connection was already in use',
+                                    ['service'])
+DOWNSTREAM_RETRIES = Counter('downstream_retries_total', 'Retries performed against a downstream service',
+                             ['service'])
+BREAKER_STATE = Gauge('circuit_breaker_state', 'Circuit breaker state per downstream service '
+                                               '(0 = closed, 1 = open, 2 = half-open)', ['service'])
+BREAKER_REJECTIONS = Counter('circuit_breaker_rejections_total',
+                             'Calls failed fast by the circuit breaker or bulkhead', ['service', 'reason'])
+STALE_RESPONSES = Counter('stale_responses_served_total',
+                          'Last-good GET payloads served in place of a failed downstream call', ['service'])
+CONDITIONAL_REQUESTS = Counter('conditional_requests_total',
+                               'GETs revalidated with If-None-Match, by whether the body changed',
+                               ['service', 'result'])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+class BulkheadFullError(requests.exceptions.ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After `failure_threshold` failures in a row the breaker opens and
+    calls fail fast; once `reset_timeout` has passed a single trial call is let through (half-open) and its
+    outcome closes or re-opens the breaker.
+    """
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+    STATE_NAMES = {CLOSED: 'closed', OPEN: 'open', HALF_OPEN: 'half-open'}
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(service=name).set(self.state)
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning(f"Circuit breaker for {self.name} moved from {self.STATE_NAMES[self.state]} "
+                           f"to {self.STATE_NAMES[state]}.")
+        self.state = state
+        BREAKER_STATE.labels(service=self.name).set(state)
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+                self._set_state(self.OPEN)
+
+
+class ServiceClient:
+    """
+    Keep-alive HTTP client for one downstream service.
+
+    Each client owns a requests.Session with its own connection pool, so sockets are reused across
+    calls instead of opening a new TCP connection per request. Idempotent verbs (GET, PUT, DELETE, ...)
+    are retried a bounded number of times with jittered backoff; POST is never retried.
+
+    Calls go through a per-service circuit breaker and a bulkhead capping concurrent in-flight calls. When
+    either rejects a call, or the call fails, GETs fall back to the last good response for the same URL.
+    Concurrent identical GETs are coalesced into one upstream call, and a GET whose last good response
+    carried an ETag is sent with If-None-Match so an unchanged body comes back as an empty 304.
+    """
+
+    def __init__(self, name, base_url, pool_maxsize=POOL_MAXSIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES, max_concurrency=MAX_CONCURRENCY):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(name)
+        self._bulkhead = threading.BoundedSemaphore(max_concurrency)
+        self._last_good = OrderedDict()
+        self._singleflight = SingleFlight(name)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=RETRY_BACKOFF,
+            backoff_jitter=RETRY_JITTER,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=POOL_BLOCK,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        DOWNSTREAM_POOL_MAXSIZE.labels(service=name).set(pool_maxsize)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, allow_stale=True, **kwargs):
+        # allow_stale=False: a GET whose answer must be live (e.g. prices at checkout) is never shared,
+        # revalidated against or replaced by a last good response
+        if method != 'GET' or not allow_stale:
+            return self._request(method, path, None, **kwargs)
+
+        # Identical concurrent GETs to the same URL share a single upstream call
+        key = self.url(path) + repr(sorted((kwargs.get('params') or {}).items()))
+        return self._singleflight.do(key, lambda: self._request(method, path, key, **kwargs))
+
+    def _request(self, method, path, stale_key, **kwargs):
+        if not self._bulkhead.acquire(blocking=False):
+            return self._fallback(stale_key, BulkheadFullError(f"Too many in-flight calls to {self.name}"),
+                                  'bulkhead')
+        try:
+            # Asked only once the call holds a bulkhead slot, so a half-open trial call is always sent and
+            # every way out of it closes or re-opens the breaker
+            if not self.breaker.allow_request():
+                return self._fallback(stale_key, CircuitOpenError(f"Circuit breaker for {self.name} is open"),
+                                      'open')
+
+            with self._lock:
+                last_good = self._last_good.get(stale_key) if stale_key is not None else None
+            etag = last_good.headers.get('ETag') if last_good is not None else None
+            if etag:
+                kwargs['headers'] = {'If-None-Match': etag, **(kwargs.get('headers') or {})}
+
+            try:
+                response = self._send(method, path, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                return self._fallback(stale_key, e)
+            except BaseException:
+                self.breaker.record_failure()
+                raise
+        finally:
+            self._bulkhead.release()
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            if stale_key is not None and stale_key in self._last_good:
+                return self._fallback(stale_key, None)
+            return response
+
+        self.breaker.record_success()
+        if etag:
+            if response.status_code == 304:
+                CONDITIONAL_REQUESTS.labels(service=self.name, result='not_modified').inc()
+                response = last_good
+            else:
+                CONDITIONAL_REQUESTS.labels(service=self.name, result='modified').inc()
+        if stale_key is not None and response.status_code == 200:
+            with self._lock:
+                self._last_good[stale_key] = response
+                self._last_good.move_to_end(stale_key)
+                while len(self._last_good) > STALE_CACHE_SIZE:
+                    self._last_good.popitem(last=False)
+        return response
+
+    def _fallback(self, stale_key, error, reason=None):
+        if reason is not None:
+            BREAKER_REJECTIONS.labels(service=self.name, reason=reason).inc()
+        with self._lock:
+            stale = self._last_good.get(stale_key) if stale_key is not None else None
+        if stale is not None:
+            STALE_RESPONSES.labels(service=self.name).inc()
+            logger.warning(f"Serving last good response for {stale_key} from {self.name}: {error}")
+            return stale
+        raise error
+
+    def _send(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs['headers'] = {TRACE_HEADER: trace_id_var.get(), **(kwargs.get('headers') or {})}
+
+        with self._lock:
+            if self._in_flight >= self.pool_maxsize:
+                DOWNSTREAM_POOL_SATURATED.labels(service=self.name).inc()
+            self._in_flight += 1
+        DOWNSTREAM_IN_FLIGHT.labels(service=self.name).inc()
+
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except requests.exceptions.RequestException:
+            observe_downstream(self.name, path, method, 'error', started)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            DOWNSTREAM_IN_FLIGHT.labels(service=self.name).dec()
+
+        observe_downstream(self.name, path, method, response.status_code, started)
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            DOWNSTREAM_RETRIES.labels(service=self.name).inc(len(retries.history))
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+
+product_service = ServiceClient('product', PRODUCT_SERVICE_URL)
+cart_service = ServiceClient('cart', CART_SERVICE_URL)
+auth_service = ServiceClient('auth', AUTH_SERVICE_URL)
+order_service = ServiceClient('order', ORDER_SERVICE_URL)
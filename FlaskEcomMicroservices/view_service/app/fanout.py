@@ -0,0 +1,66 @@
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '32'))
+PAGE_DEADLINE = float(os.getenv('PAGE_DEADLINE', '3.0'))
+
+FANOUT_DEADLINE_EXCEEDED = Counter('fanout_deadline_exceeded_total',
+                                   'Downstream fetches abandoned because the page deadline passed', ['call'])
+FANOUT_ERRORS = Counter('fanout_errors_total', 'Downstream fetches that raised during fan-out', ['call'])
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fanout')
+
+
+def fetch_all(calls, defaults=None, deadline=PAGE_DEADLINE):
+    """
+    Run independent downstream calls concurrently and join them within a single page deadline.
+
+    Each call runs in a copy of the caller's context, so the Flask request and session stay readable
+    from the worker threads.
+
+    :param calls: mapping of name -> zero-argument callable
+    :param defaults: mapping of name -> value used when a call raises or misses the deadline (None otherwise)
+    :param deadline: seconds to wait for all calls, measured from submission
+    :return: mapping of name -> result
+    """
+    return join_all(submit_all(calls), defaults, deadline)
+
+
+def submit_all(calls):
+    """
+    Start calls on the fan-out pool without waiting for them, so the caller can do work of its own in the
+    meantime; collect them with join_all.
+    """
+    return {name: _executor.submit(contextvars.copy_context().run, call) for name, call in calls.items()}, \
+        time.monotonic()
+
+
+def join_all(submitted, defaults=None, deadline=PAGE_DEADLINE):
+    """
+    Wait for calls started by submit_all, up to `deadline` seconds after they were submitted.
+    """
+    futures, submitted_at = submitted
+    defaults = defaults or {}
+    _, not_done = wait(futures.values(), timeout=max(deadline - (time.monotonic() - submitted_at), 0))
+
+    results = {}
+    for name, future in futures.items():
+        if future in not_done:
+            future.cancel()
+            FANOUT_DEADLINE_EXCEEDED.labels(call=name).inc()
+            logger.warning(f"Fan-out call '{name}' missed the {deadline}s page deadline.")
+            results[name] = defaults.get(name)
+        elif future.exception() is not None:
+            FANOUT_ERRORS.labels(call=name).inc()
+            logger.error(f"Fan-out call '{name}' failed: {future.exception()}")
+            results[name] = defaults.get(name)
+        else:
+            results[name] = future.result()
+    return results
@@ -1,22 +1,30 @@
+import functools
 import logging
 import os
 
 import requests
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, jsonify, session, \
-    Response
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response
 from flask_login import LoginManager, login_required, current_user
 from flask_sqlalchemy import SQLAlchemy
+from markupsafe import Markup
 from prometheus_client import generate_latest, Counter
-from werkzeug.utils import secure_filename
 
+from .cache import flash_sale_cache, fragment_cache
+from .clients import product_service, cart_service, auth_service, order_service
+from .fanout import fetch_all, join_all, submit_all
+from .media import init_media, save_upload, send_media
 from .froms import PasswordChangeForm, ShopItemsForm, OrderForm
 from .models import LoginForm, SignUpForm
+from . import tracing
+from .tokens import validate_token, revoke_token
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(trace_id)s] - %(message)s')
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+tracing.init_app(app)
+init_media(app)
 
 # Configuring the database URL for PostgreSQL
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL',
@@ -76,13 +84,13 @@ def load_user(user_id):
     return user if user else None
 
 
-PRODUCT_SERVICE_URL = 'http://product-service:5001'
-CART_SERVICE_URL = 'http://cart-service:5002'
-AUTH_SERVICE_URL = 'http://auth-service:5003'
-ORDER_SERVICE_URL = 'http://order-service:5004'
-
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP Requests')
 
+EMPTY_FEED = {'version': None, 'items': []}
+
+SHOP_ITEMS_PAGE_SIZE = int(os.getenv('SHOP_ITEMS_PAGE_SIZE', '48'))
+SHOP_ITEMS_FIELDS = 'product_name,current_price,previous_price,in_stock,flash_sale,product_picture,date_added'
+
 
 @app.route('/metrics')
 def metrics():
@@ -99,66 +107,47 @@ def home():
     token = session.get('jwt_token')
     user_data = None
 
+    # Page dependencies: the flash-sale feed does not depend on the user, so it is fetched
+    # concurrently with token validation and the user's cart
     if token:
-        try:
-            # Decode the token to retrieve user information
-            auth_service_url = f"{AUTH_SERVICE_URL}/auth/validate-token"
-            response = requests.post(auth_service_url, json={"token": token})
-            if response.status_code == 200:
-                user_data = response.json().get('user')  # Extract user info from response
-                logging.info(f"Token validated. User info: {user_data}")
-                session['user_id'] = user_data['id']
-                session['user_email'] = user_data['email']
-            else:
-                logging.warning("Invalid or expired token.")
-                flash('Invalid or expired token. Please login again.', 'error')
-                return redirect(url_for('login'))
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error validating token with auth service: {e}")
-            flash('Error during token validation. Please try again later.', 'error')
+        user_data, results = fetch_with_user(token, calls={'feed': fetch_flash_sale_feed},
+                                             user_calls={'cart': fetch_cart},
+                                             defaults={'feed': EMPTY_FEED, 'cart': []})
+        if not user_data:
+            logging.warning("Invalid or expired token.")
+            flash('Invalid or expired token. Please login again.', 'error')
             return redirect(url_for('login'))
+        logging.info(f"Token validated. User info: {user_data}")
+        session['user_email'] = user_data['email']
+        feed, cart = results['feed'], results['cart']
+    else:
+        logging.info("User not authenticated. Skipping cart retrieval.")
+        feed, cart = fetch_flash_sale_feed(), []
 
     # Admin redirect if authenticated and is admin
     if user_data and user_data.get('id') == 1:
         logging.info("Admin user detected. Redirecting to admin page.")
         return redirect('/admin-page')
 
-    # Fetch flash-sale products
-    try:
-        logging.info(f"Fetching flash-sale products from {PRODUCT_SERVICE_URL}/products/flash-sale.")
-        response = requests.get(f"{PRODUCT_SERVICE_URL}/products/flash-sale")
-        response.raise_for_status()  # Raises an error for non-2xx responses
-        items = response.json()  # Assuming the response is in JSON format
-        logging.info("Successfully fetched flash-sale products.")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching products from product service: {e}")
-        items = []
-
-    # Fetch user's cart
-    try:
-        if user_data:
-            cart_service_url = f"{CART_SERVICE_URL}/cart/{user_data['id']}"
-            logging.info(f"Fetching cart for user ID {user_data['id']} from {cart_service_url}.")
-            cart_response = requests.get(cart_service_url)
-            cart_response.raise_for_status()
-            cart = cart_response.json()
-            logging.info("Successfully fetched user's cart.")
-        else:
-            logging.info("User not authenticated. Skipping cart retrieval.")
-            cart = []
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching cart from cart service: {e}")
-        cart = []
+    # The product grid is the same for every visitor, so it is rendered once per catalog version and
+    # stitched into the per-user page shell
+    render_grid = lambda: render_template('_product_grid.html', items=feed['items'])
+    if feed['version'] is None:
+        product_grid = Markup(render_grid())
+    else:
+        product_grid = fragment_cache.get_or_render(
+            ('_product_grid.html', 'flash-sale', feed['version'], 'authenticated' if user_data else 'anonymous'),
+            render_grid)
 
     # Render the home page
     logging.info("Rendering the home page.")
-    return render_template('home.html', items=items, cart=cart)
+    return render_template('home.html', product_grid=product_grid, cart=cart)
 
 
 @app.route('/media/<filename>')
 def media(filename):
     REQUEST_COUNT.inc()
-    return send_from_directory(os.path.join(app.root_path, 'media'), filename)
+    return send_media(filename)
 
 
 @app.route('/cart')
@@ -171,40 +160,24 @@ def show_cart():
             flash("You need to login to access the cart.", "error")
             return redirect(url_for('login'))
 
-        user_data = None
-        # Validate the token with Auth-Service
-        try:
-            auth_service_url = f"{AUTH_SERVICE_URL}/auth/validate-token"
-            response = requests.post(auth_service_url, json={"token": token})
-            if response.status_code == 200:
-                user_data = response.json().get('user')  # Extract user info from Auth-Service
-                session['user_id'] = user_data['id']
-                session['user_email'] = user_data['email']
-                logging.info(f"Token validated. User info: {user_data}")
-            else:
-                logging.warning("Invalid or expired token.")
-                flash("Invalid or expired token. Please login again.", "error")
-                return redirect(url_for('login'))
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error validating token with auth service: {e}")
-            flash("Error during token validation. Please try again later.", "error")
+        # Validate the token while the cart is being fetched
+        user_data, results = fetch_with_user(token, user_calls={'cart': fetch_cart_response})
+        if not user_data:
+            logging.warning("Invalid or expired token.")
+            flash("Invalid or expired token. Please login again.", "error")
             return redirect(url_for('login'))
+        session['user_email'] = user_data['email']
+        logging.info(f"Token validated. User info: {user_data}")
 
-        # Call Cart Service to fetch cart items for the user
-        cart_service_url = f"{CART_SERVICE_URL}/cart/{user_data['id']}"
-        response = requests.get(cart_service_url)
-
-        if response.status_code == 200:
-            cart_items = response.json()
+        response = results['cart']
+        if response is not None and response.status_code == 200:
+            cart = response.json()
         else:
             flash("Failed to fetch cart data", "error")
             return redirect(url_for('home'))
 
-        # Calculate total amount
-        amount = sum(item['product']['current_price'] * item['quantity'] for item in cart_items)
-        total = amount + 200  # Assuming a fixed shipping cost of 200
-
-        return render_template('cart.html', cart=cart_items, amount=amount, total=total)
+        # Amount and total come precomputed by Cart Service
+        return render_template('cart.html', cart=cart['items'], amount=cart['amount'], total=cart['total'])
 
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
@@ -215,100 +188,53 @@ def show_cart():
 @app.route('/pluscart')
 def plus_cart():
     REQUEST_COUNT.inc()
-    try:
-        # Validate the token and get user data
-        token = session.get('jwt_token')
-        if not token:
-            return jsonify({'error': 'You need to login to update the cart.'}), 401
-
-        user_data = validate_token_with_auth_service(token)
-        if not user_data:
-            return jsonify({'error': 'Invalid or expired token. Please login again.'}), 401
-
-        cart_id = request.args.get('cart_id')
-
-        # Make a request to Cart Service to increment the quantity
-        response = requests.post(f"{CART_SERVICE_URL}/cart/{cart_id}/increment", json={'user_id': user_data['id']})
-
-        if response.status_code == 200:
-            response_data = response.json()
-
-            # Structure the data to be sent to the frontend
-            data = {
-                'quantity': response_data.get('quantity'),
-                'amount': response_data.get('amount'),
-                'total': response_data.get('total')
-            }
-            return jsonify(data)
-        else:
-            return jsonify({'error': 'Failed to update cart item quantity'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return mutate_cart_line({'cart_id': request.args.get('cart_id'), 'delta': 1},
+                            'You need to login to update the cart.', 'Failed to update cart item quantity')
 
 
 @app.route('/minuscart')
 def minus_cart():
     REQUEST_COUNT.inc()
-    try:
-        # Validate the token and get user data
-        token = session.get('jwt_token')
-        if not token:
-            return jsonify({'error': 'You need to login to update the cart.'}), 401
-
-        user_data = validate_token_with_auth_service(token)
-        if not user_data:
-            return jsonify({'error': 'Invalid or expired token. Please login again.'}), 401
-
-        cart_id = request.args.get('cart_id')
-
-        # Make a request to Cart Service to decrement the quantity
-        response = requests.post(f"{CART_SERVICE_URL}/cart/{cart_id}/decrement", json={'user_id': user_data['id']})
-
-        if response.status_code == 200:
-            response_data = response.json()
-
-            # Structure the data to be sent to the frontend
-            data = {
-                'quantity': response_data.get('quantity'),
-                'amount': response_data.get('amount'),
-                'total': response_data.get('total')
-            }
-            return jsonify(data)
-        else:
-            return jsonify({'error': 'Failed to update cart item quantity'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return mutate_cart_line({'cart_id': request.args.get('cart_id'), 'delta': -1},
+                            'You need to login to update the cart.', 'Failed to update cart item quantity')
 
 
 @app.route('/removecart')
 def remove_cart():
     REQUEST_COUNT.inc()
+    return mutate_cart_line({'cart_id': request.args.get('cart_id'), 'remove': True},
+                            'You need to login to remove cart items.', 'Failed to remove cart item')
+
+
+def mutate_cart_line(line, login_message, error_message):
+    """
+    Proxy a single cart line change to Cart Service's combined mutation endpoint and return the fields
+    the cart page's AJAX handlers expect.
+    """
     try:
         # Validate the token and get user data
         token = session.get('jwt_token')
         if not token:
-            return jsonify({'error': 'You need to login to remove cart items.'}), 401
+            return jsonify({'error': login_message}), 401
 
-        user_data = validate_token_with_auth_service(token)
+        user_data = validate_token(token)
         if not user_data:
             return jsonify({'error': 'Invalid or expired token. Please login again.'}), 401
 
-        cart_id = request.args.get('cart_id')
-
-        # Make a request to Cart Service to remove the cart item
-        response = requests.delete(f"{CART_SERVICE_URL}/cart/{cart_id}", json={'user_id': user_data['id']})
+        response = cart_service.post(f"/cart/{user_data['id']}/mutate", json={'lines': [line]})
 
         if response.status_code == 200:
             response_data = response.json()
 
             # Structure the data to be sent to the frontend
             data = {
+                'quantity': response_data['lines'][0]['quantity'],
                 'amount': response_data.get('amount'),
                 'total': response_data.get('total')
             }
             return jsonify(data)
         else:
-            return jsonify({'error': 'Failed to remove cart item'}), 500
+            return jsonify({'error': error_message}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -328,7 +254,7 @@ def login():
 
             try:
                 # Call the auth-service for authentication
-                response = requests.post(f"{AUTH_SERVICE_URL}/auth/login", json={"email": email, "password": password})
+                response = auth_service.post('/auth/login', json={"email": email, "password": password})
                 logging.info(f"Auth-service response status: {response.status_code}")
 
                 if response.status_code == 200:
@@ -371,8 +297,8 @@ def sign_up():
         password1 = form.password1.data
 
         # Send the sign-up data to the auth-service
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/auth/sign-up",
+        response = auth_service.post(
+            '/auth/sign-up',
             json={
                 "email": email,
                 "username": username,
@@ -396,6 +322,9 @@ def sign_up():
 @app.route('/logout', methods=['GET', 'POST'])
 def log_out():
     REQUEST_COUNT.inc()
+    token = session.get('jwt_token')
+    if token:
+        revoke_token(token)
     session.clear()
     flash('You have been logged out.', 'info')
     return redirect('/')
@@ -409,16 +338,16 @@ def profile(customer_id):
         flash("You need to login to view your profile.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch the customer data from the auth-service while the token is validated
+    user_data, results = fetch_with_user(token, calls={
+        'customer': lambda: auth_service.get(f"/auth/customer/{customer_id}")})
     if not user_data:
         flash("Invalid or expired token. Please login again.", "error")
         return redirect(url_for('login'))
 
-    # Make a request to the auth-service to get the customer data
-    response = requests.get(f"{AUTH_SERVICE_URL}/auth/customer/{customer_id}")
-
     # Check if the response is successful
-    if response.status_code == 200:
+    response = results['customer']
+    if response is not None and response.status_code == 200:
         customer = response.json()  # The customer data returned by the auth-service
         return render_template('profile.html', customer=customer)
     else:
@@ -434,17 +363,17 @@ def change_password(customer_id):
         flash("You need to login to change your password.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch the customer data from the auth-service while the token is validated
+    user_data, results = fetch_with_user(token, calls={
+        'customer': lambda: auth_service.get(f"/auth/customer/{customer_id}")})
     if not user_data or user_data['id'] != customer_id:
         flash("You do not have permission to change this password.", "danger")
         return redirect(url_for('login'))
 
     form = PasswordChangeForm()
 
-    # Make a request to the auth-service to fetch the customer data
-    response = requests.get(f"{AUTH_SERVICE_URL}/auth/customer/{customer_id}")
-
-    if response.status_code != 200:
+    response = results['customer']
+    if response is None or response.status_code != 200:
         flash("Customer not found or error in fetching data", 'error')
         return redirect(url_for('home'))
 
@@ -456,16 +385,16 @@ def change_password(customer_id):
         confirm_new_password = form.confirm_new_password.data
 
         # Send the current password to the auth-service for validation
-        auth_response = requests.post(
-            f"{AUTH_SERVICE_URL}/auth/verify-password",
+        auth_response = auth_service.post(
+            '/auth/verify-password',
             json={"email": customer['email'], "password": current_password}
         )
 
         if auth_response.status_code == 200:
             if new_password == confirm_new_password:
                 # Send the new password to the auth-service for updating
-                update_response = requests.put(
-                    f"{AUTH_SERVICE_URL}/auth/update-password",
+                update_response = auth_service.put(
+                    '/auth/update-password',
                     json={
                         "customer_id": customer_id,
                         "new_password": new_password
@@ -495,7 +424,7 @@ def admin_page():
             flash("You need to login to access this page.", "error")
             return redirect(url_for('login'))
 
-        user_data = validate_token_with_auth_service(token)
+        user_data = validate_token(token)
         if not user_data:
             flash("Invalid or expired token. Please login again.", "error")
             return redirect(url_for('login'))
@@ -521,7 +450,7 @@ def add_shop_items():
             flash("You need to login to access this page.", "error")
             return redirect(url_for('login'))
 
-        user_data = validate_token_with_auth_service(token)
+        user_data = validate_token(token)
         if not user_data:
             flash("Invalid or expired token. Please login again.", "error")
             return redirect(url_for('login'))
@@ -540,9 +469,7 @@ def add_shop_items():
             flash_sale = form.flash_sale.data
 
             file = form.product_picture.data
-            file_name = secure_filename(file.filename)
-            file_path = f'./media/{file_name}'
-            file.save(file_path)
+            file_path = save_upload(file)
 
             # Create the product data to be sent to the product-service
             product_data = {
@@ -556,9 +483,10 @@ def add_shop_items():
 
             # Send data to the product-service API
             try:
-                response = requests.post(PRODUCT_SERVICE_URL + '/products/add', json=product_data)
+                response = product_service.post('/products/add', json=product_data)
 
                 if response.status_code in (200, 201):  # Successful product creation
+                    flash_sale_cache.invalidate()
                     flash(f'{product_name} added successfully.', "success")
                     return render_template('add_shop_items.html', form=form)
                 else:
@@ -581,27 +509,26 @@ def shop_items():
         flash("You need to login to view the items.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch one page of products from the product-service while the token is validated
+    params = {'limit': SHOP_ITEMS_PAGE_SIZE, 'fields': SHOP_ITEMS_FIELDS}
+    if request.args.get('cursor'):
+        params['cursor'] = request.args['cursor']
+    user_data, results = fetch_with_user(
+        token, calls={'products': lambda: product_service.get('/products', params=params)})
     if not user_data or user_data['id'] != 1:
         flash("You do not have permission to view these items.", "danger")
         return redirect(url_for('login'))
 
-    try:
-        # Fetch the list of products from the product-service
-        product_service_url = f"{PRODUCT_SERVICE_URL}/products"
-        response = requests.get(product_service_url)
-
-        if response.status_code == 200:
-            items = response.json()  # Assuming the response is a list of product data
-        else:
-            flash("Error fetching products from product service!")
-            items = []
-
-    except Exception as e:
-        flash(f"Error: {str(e)}")
-        items = []
+    response = results['products']
+    if response is not None and response.status_code == 200:
+        page = response.json()
+        items, next_cursor = page['items'], page['next_cursor']
+    else:
+        flash("Error fetching products from product service!")
+        items, next_cursor = [], None
 
-    return render_template('shop_items.html', items=items)
+    return render_template('shop_items.html', items=items, next_cursor=next_cursor,
+                           first_page='cursor' not in params)
 
 
 @app.route('/update-item/<int:item_id>', methods=['GET', 'POST'])
@@ -612,18 +539,17 @@ def update_item(item_id):
         flash("You need to login to update the item.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch the current item details from the product-service while the token is validated
+    product_path = f"/products/{item_id}"
+    user_data, results = fetch_with_user(token, calls={'product': lambda: product_service.get(product_path)})
     if not user_data or user_data['id'] != 1:
         flash("You do not have permission to update this item.", "danger")
         return redirect(url_for('login'))
 
     form = ShopItemsForm()
 
-    # Fetch the current item details from the product-service
-    product_service_url = f"{PRODUCT_SERVICE_URL}/products/{item_id}"
-    response = requests.get(product_service_url)
-
-    if response.status_code == 200:
+    response = results['product']
+    if response is not None and response.status_code == 200:
         item_to_update = response.json()
     else:
         flash("Item not found in product service!")
@@ -644,10 +570,7 @@ def update_item(item_id):
         flash_sale = form.flash_sale.data
 
         file = form.product_picture.data
-        file_name = secure_filename(file.filename)
-        file_path = f'./media/{file_name}'
-
-        file.save(file_path)
+        file_path = save_upload(file)
 
         try:
             # Prepare the data to send in the PUT request
@@ -661,9 +584,10 @@ def update_item(item_id):
             }
 
             # Send a PUT request to the product-service to update the product details
-            update_response = requests.put(f"{product_service_url}/update", json=update_data)
+            update_response = product_service.put(f"{product_path}/update", json=update_data)
 
             if update_response.status_code == 200:
+                flash_sale_cache.invalidate()
                 flash(f'{product_name} updated Successfully')
                 return redirect('/shop-items')
             else:
@@ -683,16 +607,16 @@ def delete_item(item_id):
         flash("You need to login to delete an item.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    user_data = validate_token(token)
     if not user_data or user_data['id'] != 1:
         flash("You do not have permission to delete this item.", "danger")
         return redirect(url_for('login'))
 
     try:
-        product_service_url = f"{PRODUCT_SERVICE_URL}/products/{item_id}"
-        response = requests.delete(product_service_url)
+        response = product_service.delete(f"/products/{item_id}")
 
         if response.status_code == 200:
+            flash_sale_cache.invalidate()
             flash('One item deleted successfully')
         else:
             flash('Error deleting item from product service!')
@@ -711,24 +635,17 @@ def display_customers():
         flash("You need to login to view customers.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch customers from the auth-service while the token is validated
+    user_data, results = fetch_with_user(token, calls={'customers': lambda: auth_service.get('/customers')})
     if not user_data or user_data['id'] != 1:
         flash("You do not have permission to view customers.", "danger")
         return redirect(url_for('login'))
 
-    try:
-        # Send a GET request to the auth-service to fetch customers
-        auth_service_url = f"{AUTH_SERVICE_URL}/customers"
-        response = requests.get(auth_service_url)
-
-        if response.status_code == 200:
-            customers = response.json()
-        else:
-            flash('Error fetching customers from auth service!')
-            customers = []
-
-    except Exception as e:
-        flash(f'Error: {str(e)}')
+    response = results['customers']
+    if response is not None and response.status_code == 200:
+        customers = response.json()
+    else:
+        flash('Error fetching customers from auth service!')
         customers = []
 
     return render_template('customers.html', customers=customers)
@@ -744,14 +661,13 @@ def add_to_cart(item_id):
             flash("You need to login to add items to the cart.", "error")
             return redirect(url_for('login'))
 
-        user_data = validate_token_with_auth_service(token)
+        user_data = validate_token(token)
         if not user_data:
             flash("Invalid or expired token. Please login again.", "error")
             return redirect(url_for('login'))
 
         # Make a request to the cart service to add the item to the cart
-        cart_service_url = f"{CART_SERVICE_URL}/cart/add-to-cart/{item_id}/{user_data['id']}"
-        response = requests.post(cart_service_url)
+        response = cart_service.post(f"/cart/add-to-cart/{item_id}/{user_data['id']}")
 
         if response.status_code == 200:
             flash("Item successfully added to cart or quantity updated.")
@@ -773,38 +689,37 @@ def place_order():
             flash("You need to login to place an order.", "error")
             return redirect(url_for('login'))
 
-        user_data = validate_token_with_auth_service(token)
+        # Fetch the customer's cart from Cart Service while the token is validated
+        user_data, results = fetch_with_user(token, user_calls={'cart': fetch_live_cart_response})
         if not user_data:
             flash("Invalid or expired token. Please login again.", "error")
             return redirect(url_for('login'))
 
-        logging.info("Fetching data from cart service for user: %s", user_data['id'])
-        # Fetch the customer's cart from Cart Service
-        cart_response = requests.get(f"{CART_SERVICE_URL}/cart/{user_data['id']}")
+        logging.info("Fetched data from cart service for user: %s", user_data['id'])
+        cart_response = results['cart']
 
-        if cart_response.status_code != 200:
+        if cart_response is None or cart_response.status_code != 200:
             flash("Failed to fetch cart items.")
             return redirect('/')
 
-        cart_items = cart_response.json()
-        logging.info("Cart data len: %s", cart_items)
+        cart = cart_response.json()
+        cart_items = cart['items']
+        logging.info("Cart data len: %s", len(cart_items))
         if not cart_items:
             flash("Your cart is empty.")
             return redirect('/')
 
-        # Calculate the total amount
-        total_amount = sum(item['product']['current_price'] * item['quantity'] for item in cart_items)
-
-        # Create the order payload
+        # Cart Service joins the lines with the live product rows, so prices and the amount are current and
+        # lines of deleted products are already left out
         order_payload = {
             "cart_items": cart_items,
-            "total_amount": total_amount,
+            "total_amount": cart['amount'],
             "customer_id": user_data['id']
         }
 
         logging.info("Order payload : %s", order_payload)
         # Send the order request to Order Service
-        order_response = requests.post(f"{ORDER_SERVICE_URL}/place-order/{user_data['id']}", json=order_payload)
+        order_response = order_service.post(f"/place-order/{user_data['id']}", json=order_payload)
         logging.info("Order placed successfully")
         if order_response.status_code in (201, 200):
             flash("Order placed successfully!")
@@ -830,15 +745,15 @@ def order():
             flash("You need to login to view your orders.", "error")
             return redirect(url_for('login'))
 
-        user_data = validate_token_with_auth_service(token)
+        # Call the Order Service to get the orders for the user while the token is validated
+        user_data, results = fetch_with_user(token, user_calls={
+            'orders': lambda user_id: order_service.get(f"/orders/{user_id}")})
         if not user_data:
             flash("Invalid or expired token. Please login again.", "error")
             return redirect(url_for('login'))
 
-        # Call the Order Service to get the orders for the user
-        response = requests.get(f"{ORDER_SERVICE_URL}/orders/{user_data['id']}")
-
-        if response.status_code == 200:
+        response = results['orders']
+        if response is not None and response.status_code == 200:
             orders = response.json()
         else:
             orders = []
@@ -857,22 +772,21 @@ def order_view():
         flash("You need to login to view orders.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch all orders from the order-service while the token is validated
+    user_data, results = fetch_with_user(token, calls={'orders': lambda: order_service.get('/orders')})
     if not user_data or user_data['id'] != 1:
         flash("You do not have permission to view these orders.", "danger")
         return redirect(url_for('login'))
 
-    try:
-        response = requests.get(f"{ORDER_SERVICE_URL}/orders")
-
-        if response.status_code == 200:
-            orders = response.json()
-            return render_template('view_orders.html', orders=orders)
-        else:
-            flash('Failed to retrieve orders from the order service.', 'danger')
-            return render_template('404.html')
-    except requests.RequestException as e:
-        flash(f'Error connecting to order service: {str(e)}', 'danger')
+    response = results['orders']
+    if response is None:
+        flash('Error connecting to order service.', 'danger')
+        return render_template('404.html')
+    if response.status_code == 200:
+        orders = response.json()
+        return render_template('view_orders.html', orders=orders)
+    else:
+        flash('Failed to retrieve orders from the order service.', 'danger')
         return render_template('404.html')
 
 
@@ -884,30 +798,30 @@ def update_order(order_id):
         flash("You need to login to update the order.", "error")
         return redirect(url_for('login'))
 
-    user_data = validate_token_with_auth_service(token)
+    # Fetch the order details from the order-service while the token is validated
+    order_path = f'/orders/order/{order_id}'
+    user_data, results = fetch_with_user(token, calls={'order': lambda: order_service.get(order_path)})
     if not user_data or user_data['id'] != 1:
         flash("You do not have permission to update this order.", "danger")
         return redirect(url_for('login'))
 
     form = OrderForm()
-    order_service_url = f'{ORDER_SERVICE_URL}/orders/order/{order_id}'
 
-    try:
-        response = requests.get(order_service_url)
-        order = response.json() if response.status_code == 200 else None
-
-        if not order:
-            flash(f'Order {order_id} not found')
-            return redirect('/view-orders')
-    except Exception as e:
+    response = results['order']
+    if response is None:
         flash('Error fetching order details')
         return redirect('/view-orders')
 
+    order = response.json() if response.status_code == 200 else None
+    if not order:
+        flash(f'Order {order_id} not found')
+        return redirect('/view-orders')
+
     if form.validate_on_submit():
         status = form.order_status.data
         try:
             update_data = {'status': status}
-            update_response = requests.put(f'{ORDER_SERVICE_URL}/orders/order/{order_id}', json=update_data)
+            update_response = order_service.put(order_path, json=update_data)
 
             if update_response.status_code == 200:
                 flash(f'Order {order_id} updated successfully')
@@ -922,14 +836,77 @@ def update_order(order_id):
     return render_template('order_update.html', form=form, order=order)
 
 
-def validate_token_with_auth_service(token):
+def fetch_with_user(token, calls=None, user_calls=None, defaults=None):
+    """
+    Validate the session token concurrently with the other downstream calls a page depends on.
+
+    The token is validated in the request's own thread while the other calls run on the fan-out pool, so a
+    saturated pool or the page deadline never turns a valid session into a logout. An error raised while
+    validating propagates instead of reading as an invalid token.
+
+    :param token: JWT token from the session
+    :param calls: name -> callable for fetches that do not depend on who the user is
+    :param user_calls: name -> callable(user_id) for fetches keyed by the user. These start with the user id
+        validated on a previous request and are re-issued once the token resolves to a different user.
+    :param defaults: name -> value used when a fetch fails or misses the page deadline
+    :return: (user_data or None, results by name)
+    """
+    calls = dict(calls or {})
+    user_calls = user_calls or {}
+    known_user_id = session.get('user_id')
+
+    if known_user_id is not None:
+        calls.update({name: functools.partial(call, known_user_id) for name, call in user_calls.items()})
+
+    submitted = submit_all(calls)
+    # Verified locally; auth-service is only asked for the periodic revocation check
+    user_data = validate_token(token)
+    results = join_all(submitted, defaults)
+    if not user_data:
+        return None, results
+
+    session['user_id'] = user_data['id']
+    if user_calls and known_user_id != user_data['id']:
+        results.update(fetch_all({name: functools.partial(call, user_data['id'])
+                                  for name, call in user_calls.items()}, defaults))
+    return user_data, results
+
+
+def load_flash_sale_feed():
+    logging.info(f"Fetching flash-sale products from {product_service.url('/products/flash-sale')}.")
+    response = product_service.get('/products/flash-sale')
+    response.raise_for_status()  # Raises an error for non-2xx responses
+    logging.info("Successfully fetched flash-sale products.")
+    return {'version': response.headers.get('X-Catalog-Version'), 'items': response.json()}
+
+
+def fetch_flash_sale_feed():
+    """
+    :return: {'version': catalog version the items were built from (None if unknown), 'items': [...]}
+    """
     try:
-        auth_service_url = f"{AUTH_SERVICE_URL}/auth/validate-token"
-        response = requests.post(auth_service_url, json={"token": token})
-        if response.status_code == 200:
-            return response.json().get('user')  # Extract user info from Auth-Service
-        else:
-            return None
+        return flash_sale_cache.get_or_load('flash-sale', load_flash_sale_feed)
     except requests.exceptions.RequestException as e:
-        logging.error(f"Error validating token with Auth-Service: {e}")
-        return None
+        logging.error(f"Error fetching products from product service: {e}")
+        return EMPTY_FEED
+
+
+def fetch_cart_response(user_id):
+    return cart_service.get(f"/cart/{user_id}")
+
+
+def fetch_live_cart_response(user_id):
+    # Orders are priced from this response, so never from a stale copy
+    return cart_service.get(f"/cart/{user_id}", allow_stale=False)
+
+
+def fetch_cart(user_id):
+    try:
+        logging.info(f"Fetching cart for user ID {user_id} from {cart_service.url(f'/cart/{user_id}')}.")
+        cart_response = fetch_cart_response(user_id)
+        cart_response.raise_for_status()
+        logging.info("Successfully fetched user's cart.")
+        return cart_response.json()['items']
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching cart from cart service: {e}")
+        return []
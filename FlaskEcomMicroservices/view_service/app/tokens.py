@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+import requests
+from prometheus_client import Counter
+
+from .clients import auth_service
+
+logger = logging.getLogger(__name__)
+
+# Signing material shared with auth_service/app/jwtutils.py
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'F5DB977622D67F7B78647F828D385')
+JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+# How long a locally verified token is trusted before auth-service is asked whether it was revoked
+REVOCATION_CHECK_INTERVAL = float(os.getenv('TOKEN_REVOCATION_CHECK_INTERVAL', '60'))
+
+TOKEN_CACHE_HITS = Counter('token_cache_hits_total', 'Session tokens resolved from the validated-token cache')
+TOKEN_CACHE_MISSES = Counter('token_cache_misses_total', 'Session tokens that had to be verified from scratch')
+TOKEN_REVOCATION_CHECKS = Counter('token_revocation_checks_total', 'Revocation checks sent to auth-service',
+                                  ['result'])
+
+
+class TokenCache:
+    """
+    Bounded LRU of validated tokens keyed by token digest. Entries expire at the token's own `exp`.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest, now):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry['exp'] <= now:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry
+
+    def put(self, digest, user, exp, checked_at):
+        entry = {'user': user, 'exp': exp, 'checked_at': checked_at}
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+
+token_cache = TokenCache()
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_token(token):
+    """
+    Verify the token signature and expiry locally, mirroring auth_service's jwtutils.decode_token.
+
+    :return: the claims with `sub` deserialized, or None if the token is invalid or expired
+    """
+    try:
+        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        claims['sub'] = json.loads(claims['sub'])
+        return claims
+    except jwt.ExpiredSignatureError:
+        logger.info("Token expired")
+        return None
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Invalid token: {e}")
+        return None
+
+
+def is_revoked(token):
+    """
+    Ask auth-service whether a token that verifies locally has since been revoked. Only a 401 means revoked:
+    if auth-service cannot be reached or answers with an error the local verification stands.
+    """
+    try:
+        response = auth_service.post('/auth/validate-token', json={"token": token})
+    except requests.exceptions.RequestException as e:
+        TOKEN_REVOCATION_CHECKS.labels(result='error').inc()
+        logger.warning(f"Revocation check with auth-service failed, trusting local verification: {e}")
+        return False
+
+    if response.status_code == 401:
+        TOKEN_REVOCATION_CHECKS.labels(result='revoked').inc()
+        return True
+    if response.status_code != 200:
+        TOKEN_REVOCATION_CHECKS.labels(result='error').inc()
+        logger.warning(f"Revocation check with auth-service answered {response.status_code}, "
+                       f"trusting local verification")
+        return False
+    TOKEN_REVOCATION_CHECKS.labels(result='valid').inc()
+    return False
+
+
+def validate_token(token):
+    """
+    Resolve a session token to the user it was issued for.
+
+    Tokens are verified locally and cached until they expire; auth-service is only consulted for a revocation
+    check when a token is first seen and then at most once per REVOCATION_CHECK_INTERVAL.
+
+    :return: user info ({'id': ..., 'email': ...}) or None if the token is invalid, expired or revoked
+    """
+    digest = token_digest(token)
+    now = time.time()
+
+    entry = token_cache.get(digest, now)
+    if entry is not None:
+        TOKEN_CACHE_HITS.inc()
+    else:
+        TOKEN_CACHE_MISSES.inc()
+        claims = decode_token(token)
+        if claims is None:
+            return None
+        entry = {'user': claims['sub'], 'exp': claims['exp'], 'checked_at': None}
+
+    if entry['checked_at'] is None or now - entry['checked_at'] >= REVOCATION_CHECK_INTERVAL:
+        if is_revoked(token):
+            token_cache.discard(digest)
+            return None
+        entry = token_cache.put(digest, entry['user'], entry['exp'], checked_at=now)
+
+    return entry['user']
+
+
+def revoke_token(token):
+    """
+    Drop a token from the local cache and ask auth-service to revoke it for every other consumer.
+    """
+    token_cache.discard(token_digest(token))
+    try:
+        auth_service.post('/auth/revoke-token', json={"token": token})
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error revoking token with auth-service: {e}")
@@ -0,0 +1,64 @@
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+from flask import g, request
+from prometheus_client import Histogram
+
+TRACE_HEADER = 'X-Request-ID'
+
+# Correlation id of the page being assembled. Fan-out workers run in a copy of the request context,
+# so downstream calls made from them carry the same id.
+trace_id_var = ContextVar('trace_id', default='-')
+
+INBOUND_LATENCY = Histogram('http_request_duration_seconds', 'Latency of requests served by view_service',
+                            ['route', 'method', 'status'])
+DOWNSTREAM_LATENCY = Histogram('downstream_request_duration_seconds', 'Latency of calls to downstream services',
+                               ['service', 'endpoint', 'method', 'status'])
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def endpoint_template(path):
+    # /cart/42/mutate -> /cart/<id>/mutate, so the label set stays bounded
+    return re.sub(r'/\d+(?=/|$)', '/<id>', path.split('?', 1)[0])
+
+
+def observe_downstream(service, path, method, status, started):
+    DOWNSTREAM_LATENCY.labels(service=service, endpoint=endpoint_template(path), method=method,
+                              status=status).observe(time.perf_counter() - started)
+
+
+def init_app(app):
+    """
+    Assign every inbound request a trace id (reusing one sent by the caller), echo it in the response and
+    record the request latency by route and status.
+    """
+
+    @app.before_request
+    def start_trace():
+        g.trace_started = time.perf_counter()
+        g.trace_token = trace_id_var.set(request.headers.get(TRACE_HEADER) or uuid.uuid4().hex)
+
+    @app.after_request
+    def finish_trace(response):
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        INBOUND_LATENCY.labels(route=route, method=request.method, status=response.status_code) \
+            .observe(time.perf_counter() - g.trace_started)
+        response.headers[TRACE_HEADER] = trace_id_var.get()
+        return response
+
+    @app.teardown_request
+    def end_trace(exc):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            trace_id_var.reset(token)
+
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceIdFilter())
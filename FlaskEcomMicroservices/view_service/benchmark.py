@@ -0,0 +1,171 @@
+"""
+Compare view_service throughput in the sync (threaded) and async (gevent) serving modes.
+
+Starts stub product/cart/auth/order backends that answer after a fixed latency, runs view_service against
+them in each mode and drives the home page with many concurrent logged-in clients, so every page waits
+on the flash-sale feed and a per-user cart.
+
+    python benchmark.py --concurrency 200 --duration 15 --backend-latency 0.05
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FLASK_SECRET_KEY = 'hfdksldkslghskdghsdkgh'
+JWT_SECRET_KEY = 'F5DB977622D67F7B78647F828D385'
+
+
+def serve_stubs(port, latency):
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    from flask import Flask, jsonify
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    stub = Flask('stub-backends')
+    product = {'id': 1, 'product_name': 'Stub product', 'current_price': 100.0, 'previous_price': 120.0,
+               'in_stock': 10, 'product_picture': 'stub.jpg', 'flash_sale': True}
+
+    @stub.get('/products/flash-sale')
+    def flash_sale():
+        time.sleep(latency)
+        return jsonify([product] * 12), 200, {'X-Catalog-Version': '1'}
+
+    @stub.get('/cart/<int:user_id>')
+    def cart(user_id):
+        time.sleep(latency)
+        return jsonify({'items': [{'id': user_id, 'product_link': product['id'], 'quantity': 1, 'product': product}],
+                        'amount': product['current_price'], 'shipping': 200, 'total': product['current_price'] + 200})
+
+    @stub.post('/auth/validate-token')
+    def validate_token():
+        time.sleep(latency)
+        return jsonify({'valid': True})
+
+    WSGIServer(('127.0.0.1', port), stub, spawn=Pool(10000), log=None).serve_forever()
+
+
+def session_cookies(users):
+    import jwt
+    from flask import Flask
+
+    app = Flask('benchmark')
+    app.secret_key = FLASK_SECRET_KEY
+    serializer = app.session_interface.get_signing_serializer(app)
+    expires = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    cookies = []
+    for user_id in range(2, users + 2):
+        identity = {'id': user_id, 'email': f'user{user_id}@example.com'}
+        token = jwt.encode({'sub': json.dumps(identity), 'exp': expires}, JWT_SECRET_KEY, algorithm='HS256')
+        cookies.append(serializer.dumps({'jwt_token': token, 'user_id': user_id}))
+    return cookies
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up')
+
+
+def drive(url, cookies, concurrency, duration):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(index):
+        nonlocal errors
+        http = requests.Session()
+        http.cookies.set('session', cookies[index % len(cookies)])
+        while time.time() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = http.get(url, allow_redirects=False, timeout=30).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run_mode(mode, args, cookies):
+    backend = f'http://127.0.0.1:{args.stub_port}'
+    env = dict(os.environ, VIEW_SERVICE_MODE=mode, PORT=str(args.port), METRICS_PORT=str(args.metrics_port),
+               DATABASE_URL='sqlite://', FLASH_SALE_CACHE_TTL='0', PRODUCT_SERVICE_URL=backend,
+               CART_SERVICE_URL=backend, AUTH_SERVICE_URL=backend, ORDER_SERVICE_URL=backend)
+    server = subprocess.Popen([sys.executable, 'main.py'], cwd=HERE, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f'http://127.0.0.1:{args.port}/'
+        wait_until_up(url)
+        drive(url, cookies, min(args.concurrency, len(cookies)), 2)  # warm pools and the token cache
+        latencies, errors = drive(url, cookies, args.concurrency, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    print(f'{mode:>5}: {len(latencies) / args.duration:8.1f} req/s  '
+          f'p50 {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms  '
+          f'p99 {p99 * 1000:7.1f} ms  errors {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--backend-latency', type=float, default=0.05)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--metrics-port', type=int, default=8050)
+    parser.add_argument('--stub-port', type=int, default=5999)
+    parser.add_argument('--modes', default='sync,async')
+    parser.add_argument('--serve-stubs', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stubs:
+        serve_stubs(args.stub_port, args.backend_latency)
+        return
+
+    stubs = subprocess.Popen([sys.executable, __file__, '--serve-stubs', '--stub-port', str(args.stub_port),
+                              '--backend-latency', str(args.backend_latency)])
+    try:
+        wait_until_up(f'http://127.0.0.1:{args.stub_port}/products/flash-sale')
+        cookies = session_cookies(args.users)
+        print(f'{args.concurrency} clients, {args.duration:g}s per mode, '
+              f'{args.backend_latency * 1000:g} ms backend latency')
+        for mode in args.modes.split(','):
+            run_mode(mode, args, cookies)
+    finally:
+        stubs.terminate()
+        stubs.wait()
+
+
+if __name__ == '__main__':
+    main()
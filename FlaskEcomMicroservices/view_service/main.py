@@ -1,7 +1,32 @@
+import os
+
+# 'sync' serves with the threaded Flask server; 'async' serves the same app on gevent, where sockets, threads
+# and locks are cooperative, so a page waiting on backends costs a greenlet instead of a worker thread
+SERVING_MODE = os.getenv('VIEW_SERVICE_MODE', 'sync')
+PORT = int(os.getenv('PORT', '5000'))
+METRICS_PORT = int(os.getenv('METRICS_PORT', '8000'))
+ASYNC_MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', '5000'))
+
+if SERVING_MODE == 'async':
+    # Must run before requests/urllib3/threading are imported anywhere
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    # Greenlets are cheap, so let many more page assemblies and downstream calls overlap
+    os.environ.setdefault('FANOUT_WORKERS', '1000')
+    os.environ.setdefault('DOWNSTREAM_POOL_MAXSIZE', '200')
+
 from prometheus_client import start_http_server
 
 from app.routes import app
 
 if __name__ == "__main__":
-    start_http_server(8000)
-    app.run(host="0.0.0.0", port=5000)
+    start_http_server(METRICS_PORT)
+    if SERVING_MODE == 'async':
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+
+        WSGIServer(("0.0.0.0", PORT), app, spawn=Pool(ASYNC_MAX_CONNECTIONS)).serve_forever()
+    else:
+        app.run(host="0.0.0.0", port=PORT)
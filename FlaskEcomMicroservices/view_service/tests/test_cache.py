@@ -0,0 +1,71 @@
+import pytest
+
+from app import cache
+from app.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'time', clock.time)
+    return clock
+
+
+def loader(*values):
+    calls = []
+    values = list(values)
+
+    def load():
+        calls.append(1)
+        return values.pop(0)
+
+    return load, calls
+
+
+def test_value_is_cached_for_its_ttl(clock):
+    feed = TTLCache('test', ttl=30)
+    load, calls = loader('first', 'second')
+    assert feed.get_or_load('flash-sale', load) == 'first'
+    clock.now += 29
+    assert feed.get_or_load('flash-sale', load) == 'first'
+    clock.now += 1
+    assert feed.get_or_load('flash-sale', load) == 'second'
+    assert len(calls) == 2
+
+
+def test_invalidate_drops_the_cached_value(clock):
+    feed = TTLCache('test', ttl=30)
+    load, calls = loader('first', 'second')
+    feed.get_or_load('flash-sale', load)
+    feed.invalidate()
+    assert feed.get_or_load('flash-sale', load) == 'second'
+
+
+def test_value_loaded_across_an_invalidation_is_not_kept(clock):
+    feed = TTLCache('test', ttl=30)
+
+    def load_while_an_admin_edits():
+        feed.invalidate()
+        return 'stale'
+
+    assert feed.get_or_load('flash-sale', load_while_an_admin_edits) == 'stale'
+    assert feed.get_or_load('flash-sale', lambda: 'fresh') == 'fresh'
+
+
+def test_errors_are_not_cached(clock):
+    feed = TTLCache('test', ttl=30)
+
+    def broken():
+        raise ConnectionError('product-service is down')
+
+    with pytest.raises(ConnectionError):
+        feed.get_or_load('flash-sale', broken)
+    assert feed.get_or_load('flash-sale', lambda: 'recovered') == 'recovered'
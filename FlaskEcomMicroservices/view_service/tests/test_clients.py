@@ -0,0 +1,62 @@
+import time
+
+import pytest
+import requests
+
+from app.clients import BulkheadFullError, CircuitBreaker, CircuitOpenError, ServiceClient
+
+
+class Healthy:
+    status_code = 200
+    headers = {}
+
+
+@pytest.fixture
+def client():
+    client = ServiceClient('breaker-test', 'http://upstream.invalid', max_concurrency=1)
+    client.breaker = CircuitBreaker('breaker-test', failure_threshold=1, reset_timeout=0.1)
+    return client
+
+
+def open_breaker(client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise requests.exceptions.ConnectionError('down')
+
+    monkeypatch.setattr(client, '_send', fail)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post('/x')
+    assert client.breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.15)
+
+
+def test_trial_call_rejected_by_bulkhead_does_not_stick_half_open(client, monkeypatch):
+    open_breaker(client, monkeypatch)
+
+    # Another call holds the only slot when the reset timeout has passed
+    client._bulkhead.acquire()
+    with pytest.raises(BulkheadFullError):
+        client.post('/x')
+    client._bulkhead.release()
+
+    monkeypatch.setattr(client, '_send', lambda *args, **kwargs: Healthy())
+    assert client.post('/x').status_code == 200
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_error_in_trial_call_reopens_breaker(client, monkeypatch):
+    open_breaker(client, monkeypatch)
+
+    def broken(*args, **kwargs):
+        raise ValueError('bug')
+
+    monkeypatch.setattr(client, '_send', broken)
+    with pytest.raises(ValueError):
+        client.post('/x')
+    assert client.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        client.post('/x')
+
+    time.sleep(0.15)
+    monkeypatch.setattr(client, '_send', lambda *args, **kwargs: Healthy())
+    assert client.post('/x').status_code == 200
+    assert client.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,36 @@
+import functools
+import os
+import threading
+
+import pytest
+
+# routes creates the app and its database engine on import
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import fanout, routes  # noqa: E402
+
+USER = {'id': 7, 'email': 'shopper@example.com'}
+
+
+def test_valid_session_survives_a_missed_page_deadline(monkeypatch):
+    monkeypatch.setattr(routes, 'validate_token', lambda token: USER)
+    monkeypatch.setattr(routes, 'join_all', functools.partial(fanout.join_all, deadline=0.05))
+    release = threading.Event()
+    try:
+        with routes.app.test_request_context():
+            user_data, results = routes.fetch_with_user('token', calls={'slow': lambda: release.wait(5)},
+                                                        defaults={'slow': 'default'})
+    finally:
+        release.set()
+    assert user_data == USER
+    assert results == {'slow': 'default'}
+
+
+def test_validation_error_is_not_an_invalid_token(monkeypatch):
+    def broken(token):
+        raise RuntimeError('validation failed')
+
+    monkeypatch.setattr(routes, 'validate_token', broken)
+    with routes.app.test_request_context():
+        with pytest.raises(RuntimeError):
+            routes.fetch_with_user('token')
@@ -0,0 +1,42 @@
+import io
+import os
+
+# routes creates the app and its database engine on import
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import render_template  # noqa: E402
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+from app import media, routes  # noqa: E402
+
+PRODUCT = {'id': 3, 'product_name': 'Lamp', 'in_stock': 4, 'current_price': 20, 'previous_price': 30}
+
+
+def test_upload_is_stored_once_under_its_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, 'MEDIA_FOLDER', str(tmp_path))
+    first = media.save_upload(FileStorage(io.BytesIO(b'picture'), filename='lamp.JPG'))
+    second = media.save_upload(FileStorage(io.BytesIO(b'picture'), filename='other.jpg'))
+    assert first == second
+    assert media.HASHED_NAME.match(first.split('/')[-1]) and first.endswith('.jpg')
+    assert [path.name for path in tmp_path.iterdir()] == [first.split('/')[-1]]
+
+
+def test_product_pictures_link_to_the_media_route(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, 'MEDIA_FOLDER', str(tmp_path))
+    picture = media.save_upload(FileStorage(io.BytesIO(b'picture'), filename='lamp.jpg'))
+    with routes.app.test_request_context():
+        grid = render_template('_product_grid.html', items=[dict(PRODUCT, product_picture=picture)])
+    assert f'src="{picture}"' in grid
+
+    response = routes.app.test_client().get(picture)
+    assert response.status_code == 200
+    assert response.data == b'picture'
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == media.IMMUTABLE_MAX_AGE
+    assert response.get_etag()[0] == picture.split('/')[-1].split('.')[0]
+
+
+def test_media_outside_the_folder_is_not_found(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, 'MEDIA_FOLDER', str(tmp_path / 'media'))
+    (tmp_path / 'secret.txt').write_text('secret')
+    assert routes.app.test_client().get('/media/..%2Fsecret.txt').status_code == 404
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from app.clients import ServiceClient
+from app.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+class Healthy:
+    status_code = 200
+    headers = {}
+
+
+def together(call):
+    """
+    Run call() from CALLERS threads at once and return what each got (or raised).
+    """
+    start = threading.Barrier(CALLERS)
+    results = [None] * CALLERS
+
+    def worker(number):
+        start.wait()
+        try:
+            results[number] = call()
+        except Exception as e:
+            results[number] = e
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def blocking(result):
+    """
+    A function that counts its calls and returns (or raises) result once released.
+    """
+    calls, release = [], threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fn, calls, release
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight('test')
+    fn, calls, release = blocking('feed')
+    threading.Timer(0.1, release.set).start()
+    assert together(lambda: flight.do('flash-sale', fn)) == ['feed'] * CALLERS
+    assert len(calls) == 1
+
+
+def test_waiters_get_the_leaders_error():
+    flight = SingleFlight('test')
+    error = ConnectionError('down')
+    fn, calls, release = blocking(error)
+    threading.Timer(0.1, release.set).start()
+    assert together(lambda: flight.do('flash-sale', fn)) == [error] * CALLERS
+    assert len(calls) == 1
+
+
+def test_calls_after_completion_run_again():
+    flight = SingleFlight('test')
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight.do('key', lambda: 3) == 3
+
+
+def sends(client, monkeypatch):
+    calls, release = [], threading.Event()
+
+    def send(method, path, **kwargs):
+        calls.append((method, path, kwargs.get('params')))
+        release.wait(5)
+        return Healthy()
+
+    monkeypatch.setattr(client, '_send', send)
+    threading.Timer(0.1, release.set).start()
+    return calls
+
+
+def test_identical_gets_are_sent_once(monkeypatch):
+    client = ServiceClient('singleflight-test', 'http://upstream.invalid', max_concurrency=CALLERS)
+    calls = sends(client, monkeypatch)
+    together(lambda: client.get('/products/flash-sale', params={'a': 1}))
+    assert calls == [('GET', '/products/flash-sale', {'a': 1})]
+
+
+def test_different_params_and_posts_are_not_shared(monkeypatch):
+    client = ServiceClient('singleflight-test', 'http://upstream.invalid', max_concurrency=CALLERS)
+    calls = sends(client, monkeypatch)
+    counter = iter(range(CALLERS))
+    together(lambda: client.get('/products', params={'page': next(counter) % 2}))
+    assert sorted(params['page'] for _, _, params in calls) == [0, 1]
+
+    calls = sends(client, monkeypatch)
+    together(lambda: client.post('/cart/add'))
+    assert len(calls) == CALLERS
@@ -0,0 +1,15 @@
+import pytest
+
+from app import tokens
+
+
+class Answer:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize('status_code, revoked', [(200, False), (401, True), (400, False), (500, False),
+                                                  (502, False), (503, False)])
+def test_only_401_means_revoked(monkeypatch, status_code, revoked):
+    monkeypatch.setattr(tokens.auth_service, 'post', lambda *args, **kwargs: Answer(status_code))
+    assert tokens.is_revoked('token') is revoked
@@ -0,0 +1,68 @@
+from flask import Flask
+from prometheus_client import REGISTRY
+
+from app import fanout, tracing
+from app.clients import ServiceClient
+from app.tracing import TRACE_HEADER, endpoint_template, trace_id_var
+
+
+class Healthy:
+    status_code = 200
+    headers = {}
+    raw = None
+
+
+def traced_app():
+    app = Flask(__name__)
+    tracing.init_app(app)
+
+    @app.route('/page/<int:number>')
+    def page(number):
+        # What the fan-out workers see while this page is assembled
+        return fanout.fetch_all({'trace': trace_id_var.get})['trace']
+
+    return app
+
+
+def test_incoming_request_id_is_reused_and_echoed():
+    response = traced_app().test_client().get('/page/1', headers={TRACE_HEADER: 'abc123'})
+    assert response.get_data(as_text=True) == 'abc123'
+    assert response.headers[TRACE_HEADER] == 'abc123'
+    assert trace_id_var.get() == '-'
+
+
+def test_request_without_id_gets_a_new_one():
+    client = traced_app().test_client()
+    first, second = client.get('/page/1'), client.get('/page/1')
+    assert len(first.headers[TRACE_HEADER]) == 32
+    assert first.headers[TRACE_HEADER] == first.get_data(as_text=True)
+    assert first.headers[TRACE_HEADER] != second.headers[TRACE_HEADER]
+
+
+def test_inbound_latency_is_recorded_by_route():
+    labels = {'route': '/page/<int:number>', 'method': 'GET', 'status': '200'}
+    before = REGISTRY.get_sample_value('http_request_duration_seconds_count', labels) or 0
+    traced_app().test_client().get('/page/7')
+    assert REGISTRY.get_sample_value('http_request_duration_seconds_count', labels) == before + 1
+
+
+def test_downstream_calls_carry_the_trace_id(monkeypatch):
+    client = ServiceClient('tracing-test', 'http://upstream.invalid')
+    sent = []
+    monkeypatch.setattr(client.session, 'request',
+                        lambda method, url, **kwargs: sent.append(kwargs['headers']) or Healthy())
+    labels = {'service': 'tracing-test', 'endpoint': '/cart/<id>/mutate', 'method': 'POST', 'status': '200'}
+
+    token = trace_id_var.set('abc123')
+    try:
+        client.post('/cart/42/mutate')
+    finally:
+        trace_id_var.reset(token)
+    assert sent == [{TRACE_HEADER: 'abc123'}]
+    assert REGISTRY.get_sample_value('downstream_request_duration_seconds_count', labels) == 1
+
+
+def test_endpoint_template_collapses_ids():
+    assert endpoint_template('/cart/42/mutate') == '/cart/<id>/mutate'
+    assert endpoint_template('/products/7?fields=id') == '/products/<id>'
+    assert endpoint_template('/products/flash-sale') == '/products/flash-sale'
@@ -0,0 +1,115 @@
+"""
+Compare product search latency: the old ILIKE scan against the FTS5 index (website/search.py).
+
+Builds a throwaway SQLite database with --products synthetic products, then times the same mix of
+word, prefix and two-word queries through each path.
+
+    python search_benchmark.py --products 1000000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, text
+
+from website.models import Product
+from website.search import SEARCH_QUERY, create_search_index, match_expression
+
+PAGE_SIZE = 24
+
+
+def make_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+def load_products(engine, count, vocabulary, rng, batch_size=50000):
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        for start in range(0, count, batch_size):
+            rows = [{'product_name': ' '.join(rng.choices(vocabulary, k=3)), 'current_price': 100.0,
+                     'previous_price': 120.0, 'in_stock': 10, 'product_picture': 'media/p.jpg',
+                     'flash_sale': False, 'date_added': now}
+                    for _ in range(start, min(start + batch_size, count))]
+            connection.execute(Product.__table__.insert(), rows)
+
+
+def make_queries(count, vocabulary, rng):
+    queries = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            queries.append(rng.choice(vocabulary))
+        elif kind == 1:
+            queries.append(rng.choice(vocabulary)[:3])
+        else:
+            queries.append(' '.join(rng.sample(vocabulary, 2)))
+    return queries
+
+
+def time_queries(connection, queries, run):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        run(connection, query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def ilike_all(connection, query):
+    # What website/views.py: search used to run
+    connection.execute(select(Product.id).where(Product.product_name.ilike(f'%{query}%'))).all()
+
+
+def ilike_page(connection, query):
+    connection.execute(select(Product.id).where(Product.product_name.ilike(f'%{query}%')).limit(PAGE_SIZE)).all()
+
+
+def fts_page(connection, query):
+    connection.execute(text(SEARCH_QUERY), {'match': match_expression(query), 'limit': PAGE_SIZE + 1,
+                                            'offset': 0}).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    queries = make_queries(args.queries, vocabulary, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'search.sqlite3')}")
+        Product.__table__.create(engine)
+
+        started = time.perf_counter()
+        load_products(engine, args.products, vocabulary, rng)
+        print(f'Loaded {args.products} products in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            create_search_index(connection)
+        print(f'Built the FTS5 index in {time.perf_counter() - started:.1f}s')
+
+        with engine.connect() as connection:
+            for name, run in (('ILIKE, all rows (old path)', ilike_all), ('ILIKE, first page', ilike_page),
+                              ('FTS5, first page by rank', fts_page)):
+                p50, p95 = time_queries(connection, queries, run)
+                print(f'{name:<28} p50 {p50 * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms')
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
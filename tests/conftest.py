@@ -0,0 +1,10 @@
+import pytest
+
+from website.cache import bump_catalog_version
+
+
+@pytest.fixture(autouse=True)
+def new_catalog_version():
+    # Tests seed their databases directly rather than through the admin pages, which bump the version;
+    # start each on a new one so it is never served fragments another test rendered
+    bump_catalog_version()
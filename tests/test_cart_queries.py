@@ -0,0 +1,139 @@
+"""
+Cart reads and writes in the monolith: the query count must not grow with the number of lines in the cart
+(each test compares a customer with one line against one with fifty), and concurrent adds of the same product
+must add up.
+"""
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import website
+from website.cart_summary import cart_summary
+from website.models import Cart, Customer, Product
+
+CART_SIZES = (1, 50)
+THREADS, ADDS = 8, 25
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def seed():
+    """
+    :return: {cart size: (customer id, [line ids])}
+    """
+    carts = {}
+    product_ids = []
+    for number in range(max(CART_SIZES)):
+        product = Product(product_name=f'Product {number}', current_price=10 + number, previous_price=50,
+                                in_stock=5, product_picture='/media/p.jpg')
+        website.db.session.add(product)
+        website.db.session.flush()
+        product_ids.append(product.id)
+    for size in CART_SIZES:
+        customer = Customer(email=f'{size}@example.com', username=f'c{size}', password_hash='x')
+        website.db.session.add(customer)
+        website.db.session.flush()
+        lines = [Cart(customer_link=customer.id, product_link=product_id, quantity=2)
+                 for product_id in product_ids[:size]]
+        website.db.session.add_all(lines)
+        website.db.session.flush()
+        carts[size] = (customer.id, [line.id for line in lines])
+    website.db.session.commit()
+    return carts
+
+
+@pytest.fixture
+def shop():
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        carts = seed()
+    yield app, carts
+    with app.app_context():
+        website.db.drop_all()
+
+
+def logged_in(app, customer_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(customer_id)
+    return client
+
+
+def test_cart_summary_is_one_query(shop):
+    app, carts = shop
+    with app.app_context():
+        for size, (customer_id, _) in carts.items():
+            with count_queries(website.db.engine) as statements:
+                summary = cart_summary(customer_id)
+            assert len(statements) == 1
+            assert summary['lines'] == size
+            assert summary['amount'] == sum(2 * (10 + number) for number in range(size))
+
+
+@pytest.mark.parametrize('endpoint', ['/cart', '/pluscart?cart_id={line}', '/minuscart?cart_id={line}',
+                                      '/removecart?cart_id={line}'])
+def test_cart_pages_query_count_is_constant(shop, endpoint):
+    app, carts = shop
+    counts = {}
+    for size, (customer_id, line_ids) in carts.items():
+        client = logged_in(app, customer_id)
+        with app.app_context():
+            engine = website.db.engine
+        with count_queries(engine) as statements:
+            response = client.get(endpoint.format(line=line_ids[0]))
+        assert response.status_code == 200
+        counts[size] = len(statements)
+    assert counts[1] == counts[50]
+
+
+# Concurrent adds
+
+
+def hammer(add):
+    """
+    Call add() ADDS times from each of THREADS threads started together.
+    """
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        start.wait()
+        for _ in range(ADDS):
+            add()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_adds_converge(tmp_path):
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'shop.sqlite3'}",
+                              'TESTING': True})
+    with app.app_context():
+        carts = seed()
+    customer_id, _ = carts[1]
+    product_id = max(CART_SIZES)  # not in this customer's cart yet
+
+    def add():
+        client = logged_in(app, customer_id)
+        assert client.get(f'/add-to-cart/{product_id}', headers={'Referer': '/'}).status_code == 302
+
+    hammer(add)
+    with app.app_context():
+        lines = Cart.query.filter_by(customer_link=customer_id, product_link=product_id).all()
+        assert [line.quantity for line in lines] == [THREADS * ADDS]
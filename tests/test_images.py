@@ -0,0 +1,80 @@
+"""
+Product image derivatives in the monolith.
+"""
+import pytest
+from PIL import Image
+from sqlalchemy import event
+
+import website
+from website import images
+from website.models import Customer, Product
+
+
+@pytest.fixture
+def shop():
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        website.db.session.add(Customer(id=1, email='admin@example.com', username='admin', password_hash='x'))
+        website.db.session.commit()
+    yield app
+    with app.app_context():
+        website.db.drop_all()
+
+
+def add_products(count):
+    derivatives = {'card': {'width': 400, 'height': 300, 'webp': '/media/derived/p-card.webp',
+                            'jpeg': '/media/derived/p-card.jpg'}}
+    website.db.session.add_all(Product(product_name=f'Product {number}', current_price=10, previous_price=20,
+                                       in_stock=1, product_picture='/media/p.jpg', product_images=derivatives)
+                               for number in range(count))
+    website.db.session.commit()
+
+
+def test_shop_items_renders_derivatives_in_one_query(shop):
+    client = shop.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    counts = {}
+    for total in (1, 20):
+        with shop.app_context():
+            website.db.session.query(Product).delete()
+            add_products(total)
+            engine = website.db.engine
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            page = client.get('/shop-items').get_data(as_text=True)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        assert page.count('/media/derived/p-card.webp 400w') == total
+        counts[total] = len(statements)
+    assert counts[1] == counts[20]
+
+
+def test_build_derivatives_fits_each_box(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'DERIVED_FOLDER', str(tmp_path / 'derived'))
+    source = tmp_path / 'wide.png'
+    Image.new('RGBA', (2000, 1000), (255, 0, 0, 128)).save(source)
+
+    derivatives = images.build_derivatives(str(source))
+
+    assert {size: (d['width'], d['height']) for size, d in derivatives.items()} == \
+        {'thumb': (160, 80), 'card': (400, 200), 'detail': (1000, 500)}
+    with Image.open(tmp_path / 'derived' / 'wide-thumb.jpeg') as jpeg:
+        assert jpeg.mode == 'RGB' and jpeg.size == (160, 80)
+    assert (tmp_path / 'derived' / 'wide-detail.webp').exists()
+
+
+def test_small_images_are_not_upscaled(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'DERIVED_FOLDER', str(tmp_path / 'derived'))
+    source = tmp_path / 'small.jpg'
+    Image.new('RGB', (120, 90)).save(source)
+
+    derivatives = images.build_derivatives(str(source))
+
+    assert derivatives['thumb'] is derivatives['card'] is derivatives['detail']
+    assert (derivatives['detail']['width'], derivatives['detail']['height']) == (120, 90)
@@ -0,0 +1,77 @@
+"""
+Full-text product search in the monolith.
+"""
+import pytest
+
+import website
+from website import search
+from website.models import Product
+from website.search import match_expression, search_products
+
+NAMES = ('Smart Watch', 'Smartphone Case', 'Desk Lamp', 'Watch Strap', 'Café Table')
+
+
+@pytest.fixture
+def shop():
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        assert search.fts_enabled
+        website.db.session.add_all(Product(product_name=name, current_price=10, previous_price=20, in_stock=1,
+                                           product_picture='/media/p.jpg') for name in NAMES)
+        website.db.session.commit()
+        yield app
+        website.db.drop_all()
+
+
+def found(query, page=1, per_page=10):
+    products, has_next = search_products(query, page, per_page)
+    return [product.product_name for product in products], has_next
+
+
+def test_match_expression_quotes_every_word_as_a_prefix():
+    assert match_expression('Smart  WAT') == '"smart"* "wat"*'
+    assert match_expression('watch OR "lamp" NEAR(') == '"watch"* "or"* "lamp"* "near"*'
+    assert match_expression('  !? ') is None
+
+
+def test_every_word_matches_as_a_prefix(shop):
+    assert sorted(found('wat')[0]) == ['Smart Watch', 'Watch Strap']
+    assert found('sma wat')[0] == ['Smart Watch']
+    assert found('cafe')[0] == ['Café Table']
+    assert found('phone')[0] == []
+
+
+def test_fts_syntax_is_searched_literally(shop):
+    assert found('lamp OR')[0] == []
+    assert found('"desk')[0] == ['Desk Lamp']
+
+
+def test_results_are_paginated(shop):
+    first, has_next = found('s', per_page=2)
+    second, has_more = found('s', page=2, per_page=2)
+    assert has_next and not has_more
+    assert len(first) == 2 and not set(first) & set(second)
+    assert sorted(first + second) == ['Smart Watch', 'Smartphone Case', 'Watch Strap']
+
+
+def test_index_follows_product_writes(shop):
+    lamp = Product.query.filter_by(product_name='Desk Lamp').one()
+    lamp.product_name = 'Floor Light'
+    website.db.session.add(Product(product_name='Night Lamp', current_price=1, previous_price=2, in_stock=1,
+                                   product_picture='/media/p.jpg'))
+    website.db.session.delete(Product.query.filter_by(product_name='Watch Strap').one())
+    website.db.session.commit()
+    assert found('lamp')[0] == ['Night Lamp']
+    assert found('light')[0] == ['Floor Light']
+    assert found('strap')[0] == []
+
+
+def test_substring_fallback_without_fts(shop, monkeypatch):
+    monkeypatch.setattr(search, 'fts_enabled', False)
+    assert found('phone')[0] == ['Smartphone Case']
+
+
+def test_search_page_links_to_the_next_page(shop, monkeypatch):
+    monkeypatch.setattr(website.views, 'SEARCH_PAGE_SIZE', 1)
+    page = shop.test_client().get('/search?q=watch').get_data(as_text=True)
+    assert 'page=2' in page
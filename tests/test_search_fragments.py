@@ -0,0 +1,36 @@
+"""
+Cached search result fragments in the monolith.
+"""
+import pytest
+
+import website
+from website.cache import fragment_cache
+from website.models import Customer
+
+
+@pytest.fixture
+def shop():
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        website.db.session.add(Customer(id=1, email='admin@example.com', username='admin', password_hash='x'))
+        website.db.session.commit()
+    yield app
+    with app.app_context():
+        website.db.drop_all()
+
+
+def test_search_fragment_echoes_the_exact_query(shop):
+    client = shop.test_client()
+    assert 'No products match "watch"' in client.get('/search?q=watch').get_data(as_text=True)
+    assert 'No products match "Watch"' in client.get('/search?q=Watch').get_data(as_text=True)
+
+
+def test_cache_stats_are_exposed_to_the_admin(shop):
+    client = shop.test_client()
+    client.get('/search?q=lamp')
+    client.get('/search?q=lamp')
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    stats = client.get('/cache-stats').get_json()['fragment_cache']
+    assert stats == fragment_cache.stats()
+    assert stats['hits'] >= 1 and stats['entries'] >= 1
@@ -0,0 +1,53 @@
+"""
+Keyset pagination of the monolith's admin shop items page.
+"""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import website
+from website.admin import SHOP_ITEMS_PAGE_SIZE
+from website.models import Customer, Product
+
+TOTAL = SHOP_ITEMS_PAGE_SIZE + 2
+
+
+@pytest.fixture
+def admin():
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        website.db.session.add(Customer(id=1, email='admin@example.com', username='admin', password_hash='x'))
+        # Pairs of products share a date_added, so pages must break the tie on id
+        start = datetime(2024, 1, 1)
+        website.db.session.add_all(Product(product_name=f'Item-{number:03}', current_price=10, previous_price=12,
+                                           in_stock=1, product_picture='/media/p.jpg',
+                                           date_added=start + timedelta(minutes=number // 2))
+                                   for number in range(TOTAL))
+        website.db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    yield client
+    with app.app_context():
+        website.db.drop_all()
+
+
+def items(page):
+    return re.findall(r'Item-\d{3}', page)
+
+
+def test_pages_cover_every_product_once(admin):
+    first = admin.get('/shop-items').get_data(as_text=True)
+    assert items(first) == [f'Item-{number:03}' for number in range(SHOP_ITEMS_PAGE_SIZE)]
+    next_link = re.search(r'href="(/shop-items\?cursor=[^"]+)"', first).group(1)
+
+    second = admin.get(next_link.replace('&amp;', '&')).get_data(as_text=True)
+    assert items(second) == [f'Item-{number:03}' for number in range(SHOP_ITEMS_PAGE_SIZE, TOTAL)]
+    assert 'Next page' not in second
+
+
+def test_invalid_cursor_shows_the_first_page(admin):
+    page = admin.get('/shop-items?cursor=bogus').get_data(as_text=True)
+    assert 'Invalid page link' in page
+    assert items(page)[0] == 'Item-000'
@@ -0,0 +1,91 @@
+"""
+Search box autocomplete in the monolith.
+"""
+import threading
+
+import pytest
+
+import website
+from website import suggest
+from website.models import Product
+from website.suggest import POPULAR_QUERY_MIN_COUNT, SuggestionIndex
+
+
+@pytest.fixture
+def shop():
+    app = website.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        website.db.session.add_all(Product(product_name=name, current_price=10, previous_price=20, in_stock=1,
+                                           product_picture='/media/p.jpg')
+                                   for name in ('Smart Watch', 'Desk Lamp'))
+        website.db.session.commit()
+        yield app
+        website.db.drop_all()
+
+
+def search(index, query, times=POPULAR_QUERY_MIN_COUNT):
+    for _ in range(times):
+        index.record_query(query)
+
+
+def test_product_names_match_any_word(shop):
+    index = SuggestionIndex()
+    assert index.suggest('wat') == ['Smart Watch']
+    assert index.suggest('SMA') == ['Smart Watch']
+    assert index.suggest('chair') == []
+
+
+def test_popular_queries_matching_the_catalog_are_suggested(shop):
+    index = SuggestionIndex()
+    index.load()
+    search(index, 'desk', POPULAR_QUERY_MIN_COUNT - 1)
+    assert index.suggest('de') == ['Desk Lamp']
+    search(index, 'desk', 1)
+    assert index.suggest('de') == ['desk', 'Desk Lamp']
+
+
+def test_queries_without_products_are_never_suggested(shop):
+    index = SuggestionIndex()
+    search(index, 'free money')
+    index.load()
+    search(index, 'cheap pills')
+    assert index.suggest('free') == [] and index.suggest('cheap') == []
+
+
+def test_long_queries_are_not_tracked(shop):
+    index = SuggestionIndex()
+    index.load()
+    search(index, 'smart ' + 'x' * suggest.MAX_POPULAR_QUERY_LENGTH)
+    assert index.suggest('smart') == ['Smart Watch']
+
+
+def test_queries_searched_before_loading_are_promoted_by_load(shop):
+    index = SuggestionIndex()
+    search(index, 'lamp')
+    assert index.suggest('la') == ['lamp', 'Desk Lamp']
+
+
+def test_product_added_during_load_is_kept(shop, monkeypatch):
+    index = SuggestionIndex()
+    reading, added = threading.Event(), threading.Event()
+    load_products = index._product_entries
+
+    def slow_product_entries(name):
+        reading.set()
+        added.wait(0.2)
+        return load_products(name)
+
+    monkeypatch.setattr(index, '_product_entries', slow_product_entries)
+    def load():
+        with shop.app_context():
+            index.load()
+
+    loader = threading.Thread(target=load)
+    loader.start()
+    reading.wait(1)
+    adder = threading.Thread(target=index.add_product, args=('Ceiling Fan',))
+    adder.start()
+    added.set()
+    loader.join()
+    adder.join()
+    assert index.suggest('fan') == ['Ceiling Fan']
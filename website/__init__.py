@@ -11,15 +11,25 @@ DB_NAME = 'database.sqlite3'
 
 
 def create_database():
+    from .cart_lines import init_cart_lines
+    from .images import init_images
+    from .search import init_search
+
     db.create_all()
+    init_cart_lines()
+    init_images()
+    init_search()
     print('Database Created')
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     # use for encrypting our session data
     app.config['SECRET_KEY'] = 'f8c3de3d-1fea-4d7c-a8b0-29f63c4c3454'
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_NAME}'
+    # Tests point the app at their own database
+    if test_config:
+        app.config.update(test_config)
 
     # Initialize database with app
     db.init_app(app)
@@ -45,6 +55,11 @@ def create_app():
     app.register_blueprint(auth, url_prefix='/')  # localhost:5000/auth/login
     app.register_blueprint(admin, url_prefix='/')
 
+    from .images import product_image
+    from .media import init_media
+    app.add_template_global(product_image)
+    init_media(app)
+
     # Code is commented as we've already created the DB
     with app.app_context():
         create_database()
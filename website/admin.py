@@ -1,17 +1,41 @@
-from flask import Blueprint, render_template, flash, send_from_directory, redirect
+import base64
+import json
+from datetime import datetime
+
+from flask import Blueprint, render_template, flash, redirect, request, jsonify
+from sqlalchemy import tuple_
+from sqlalchemy.orm import load_only
 from flask_login import login_required, current_user
 from .forms import ShopItemsForm, OrderForm
-from werkzeug.utils import secure_filename
 from .models import Product, Order, Customer
 from . import db
+from .cache import bump_catalog_version, fragment_cache
+from .suggest import suggestion_index
+from .images import schedule_derivatives
+from .media import save_upload, send_media
 
 
 admin = Blueprint('admin', __name__)
 
+SHOP_ITEMS_PAGE_SIZE = 48
+SHOP_ITEMS_COLUMNS = (Product.id, Product.product_name, Product.current_price, Product.previous_price,
+                      Product.in_stock, Product.flash_sale, Product.product_picture, Product.product_images,
+                      Product.date_added)
+
+
+def encode_cursor(date_added, product_id):
+    raw = json.dumps([date_added.isoformat(), product_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    date_added, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(date_added), int(product_id)
+
 
 @admin.route('/media/<path:filename>')
 def get_image(filename):
-    return send_from_directory('../media', filename)
+    return send_media(filename)
 
 
 @admin.route('/add-shop-items', methods=['GET', 'POST'])
@@ -29,11 +53,7 @@ def add_shop_items():
 
             file = form.product_picture.data
 
-            file_name = secure_filename(file.filename)
-
-            file_path = f'./media/{file_name}'
-
-            file.save(file_path)
+            file_path = save_upload(file)
 
             new_shop_item = Product()
             new_shop_item.product_name = product_name
@@ -47,6 +67,9 @@ def add_shop_items():
             try:
                 db.session.add(new_shop_item)
                 db.session.commit()
+                bump_catalog_version()
+                suggestion_index.add_product(product_name)
+                schedule_derivatives(new_shop_item.id, file_path)
                 flash(f'{product_name} added Successfully')
                 print('Product Added')
                 return render_template('add_shop_items.html', form=form)
@@ -63,8 +86,23 @@ def add_shop_items():
 @login_required
 def shop_items():
     if current_user.id == 1:
-        items = Product.query.order_by(Product.date_added).all()
-        return render_template('shop_items.html', items=items)
+        # Keyset pagination on (date_added, id): each page is an index range scan, however deep it is
+        query = Product.query.options(load_only(*SHOP_ITEMS_COLUMNS)) \
+            .order_by(Product.date_added, Product.id)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                query = query.filter(tuple_(Product.date_added, Product.id) > decode_cursor(cursor))
+            except (ValueError, TypeError):
+                flash('Invalid page link, showing the first page')
+                cursor = None
+
+        items = query.limit(SHOP_ITEMS_PAGE_SIZE + 1).all()
+        next_cursor = None
+        if len(items) > SHOP_ITEMS_PAGE_SIZE:
+            items = items[:SHOP_ITEMS_PAGE_SIZE]
+            next_cursor = encode_cursor(items[-1].date_added, items[-1].id)
+        return render_template('shop_items.html', items=items, next_cursor=next_cursor, first_page=not cursor)
     return render_template('404.html')
 
 
@@ -91,20 +129,23 @@ def update_item(item_id):
 
             file = form.product_picture.data
 
-            file_name = secure_filename(file.filename)
-            file_path = f'./media/{file_name}'
-
-            file.save(file_path)
+            file_path = save_upload(file)
 
             try:
+                old_name = item_to_update.product_name
                 Product.query.filter_by(id=item_id).update(dict(product_name=product_name,
                                                                 current_price=current_price,
                                                                 previous_price=previous_price,
                                                                 in_stock=in_stock,
                                                                 flash_sale=flash_sale,
-                                                                product_picture=file_path))
+                                                                product_picture=file_path,
+                                                                product_images=None))
 
                 db.session.commit()
+                bump_catalog_version()
+                suggestion_index.remove_product(old_name)
+                suggestion_index.add_product(product_name)
+                schedule_derivatives(item_id, file_path)
                 flash(f'{product_name} updated Successfully')
                 print('Product Upadted')
                 return redirect('/shop-items')
@@ -124,6 +165,8 @@ def delete_item(item_id):
             item_to_delete = Product.query.get(item_id)
             db.session.delete(item_to_delete)
             db.session.commit()
+            bump_catalog_version()
+            suggestion_index.remove_product(item_to_delete.product_name)
             flash('One Item deleted')
             return redirect('/shop-items')
         except Exception as e:
@@ -186,9 +229,10 @@ def admin_page():
     return render_template('404.html')
 
 
-
-
-
-
-
-
+@admin.route('/cache-stats')
+@login_required
+def cache_stats():
+    # Size and hit rate of the rendered-fragment cache
+    if current_user.id == 1:
+        return jsonify(fragment_cache=fragment_cache.stats())
+    return render_template('404.html')
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+"""
+In-process caches for the storefront pages
+"""
+
+FRAGMENT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+_catalog_version = 0
+_catalog_lock = threading.Lock()
+
+
+def catalog_version():
+    return _catalog_version
+
+
+def bump_catalog_version():
+    # Called after every write that changes what the product grid shows (products added, edited,
+    # deleted or stock sold), so fragments rendered against the old catalog are never served again
+    global _catalog_version
+    with _catalog_lock:
+        _catalog_version += 1
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered template fragments, bounded by the total size of the cached HTML.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment[0]
+            self.misses += 1
+
+        html = Markup(render())
+        size = len(html.encode())
+        with self._lock:
+            if size <= self.max_bytes and key not in self._fragments:
+                self._fragments[key] = (html, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    _, (_, evicted_size) = self._fragments.popitem(last=False)
+                    self.size -= evicted_size
+                    self.evictions += 1
+        return html
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._fragments), 'bytes': self.size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_MAX_BYTES)
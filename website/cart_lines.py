@@ -0,0 +1,47 @@
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import Cart
+
+"""
+Cart line writes as single atomic statements (cart_service has the same upsert in app/cart_lines.py)
+"""
+
+# Databases created before the unique index may hold duplicate lines from racing adds: fold them into
+# the oldest line first, or the index can't be built
+MERGE_DUPLICATE_LINES = (
+    """
+    UPDATE cart SET quantity = (
+        SELECT SUM(duplicate.quantity) FROM cart AS duplicate
+        WHERE duplicate.customer_link = cart.customer_link AND duplicate.product_link = cart.product_link
+    )
+    WHERE id IN (SELECT MIN(id) FROM cart GROUP BY customer_link, product_link HAVING COUNT(*) > 1)
+    """,
+    "DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY customer_link, product_link)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_customer_product ON cart (customer_link, product_link)",
+)
+
+
+def init_cart_lines():
+    # create_all doesn't add indexes to a table that already exists
+    with db.engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_cart_customer_product'")).first()
+        if not exists:
+            for statement in MERGE_DUPLICATE_LINES:
+                connection.execute(text(statement))
+
+
+def add_cart_line(customer_id, product_id, quantity=1):
+    """
+    Add quantity of a product to a customer's cart with one INSERT ... ON CONFLICT DO UPDATE, so concurrent
+    adds of the same product land on a single line and none of them is lost. Commits with the caller.
+
+    :return: the line's quantity after the add
+    """
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(Cart).values(customer_link=customer_id, product_link=product_id, quantity=quantity)
+    statement = statement.on_conflict_do_update(index_elements=[Cart.customer_link, Cart.product_link],
+                                                set_={'quantity': Cart.quantity + statement.excluded.quantity})
+    return db.session.execute(statement.returning(Cart.quantity)).scalar_one()
@@ -0,0 +1,123 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from markupsafe import Markup, escape
+from PIL import Image, ImageOps
+from sqlalchemy import inspect, text
+
+from . import db
+from .cache import bump_catalog_version
+from .models import Product
+
+"""
+Product image derivatives: fixed-size WebP and JPEG renditions of every upload, generated off the request
+"""
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'media')
+DERIVED_FOLDER = os.path.join(MEDIA_FOLDER, 'derived')
+
+# name -> bounding box; images are scaled down to fit, never up, keeping their aspect ratio
+DERIVATIVE_SIZES = {'thumb': (160, 160), 'card': (400, 400), 'detail': (1000, 1000)}
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+           'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+_executor = None
+
+
+def init_images():
+    # create_all doesn't add columns to an existing table, so older databases get product_images here
+    columns = {column['name'] for column in inspect(db.engine).get_columns('product')}
+    if 'product_images' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE product ADD COLUMN product_images JSON'))
+
+
+def build_derivatives(source_path):
+    """
+    Write every size in every format for the image at source_path.
+
+    :return: {size: {'width': .., 'height': .., 'webp': url, 'jpeg': url}}
+    """
+    os.makedirs(DERIVED_FOLDER, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    derivatives, previous = {}, None
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size, box in DERIVATIVE_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+            if previous and (previous['width'], previous['height']) == resized.size:
+                # The original is smaller than this box: the previous rendition already is full size
+                derivatives[size] = previous
+                continue
+            derivative = {'width': resized.width, 'height': resized.height}
+            for extension, (image_format, options) in FORMATS.items():
+                file_name = f'{stem}-{size}.{extension}'
+                output = resized
+                if image_format == 'JPEG' and resized.mode != 'RGB':
+                    # JPEG has no alpha channel: flatten onto white rather than black
+                    output = Image.new('RGB', resized.size, 'white')
+                    output.paste(resized, mask=resized.getchannel('A'))
+                output.save(os.path.join(DERIVED_FOLDER, file_name), image_format, **options)
+                derivative[extension] = f'/media/derived/{file_name}'
+            derivatives[size] = previous = derivative
+    return derivatives
+
+
+def _generate(app, product_id, picture):
+    with app.app_context():
+        try:
+            derivatives = build_derivatives(os.path.join(MEDIA_FOLDER, os.path.basename(picture)))
+            # Only record them if the picture hasn't been replaced while we were working
+            updated = Product.query.filter_by(id=product_id, product_picture=picture) \
+                .update(dict(product_images=derivatives))
+            db.session.commit()
+            if updated:
+                bump_catalog_version()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Image derivatives for product {product_id} failed: {e}")
+
+
+def schedule_derivatives(product_id, picture):
+    """
+    Generate the derivatives of a product's picture in the background worker pool. Until they are ready the
+    templates keep serving the original upload.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-derivatives')
+    return _executor.submit(_generate, current_app._get_current_object(), product_id, picture)
+
+
+def product_image(product, size='card', sizes='100vw', **attributes):
+    """
+    <picture> for a product, offering every derivative width in WebP and JPEG so the browser downloads the
+    smallest one that fills `sizes`; `size` is the fallback for browsers without srcset. Extra keyword
+    arguments become attributes of the <img> (class_ for class).
+    """
+    attributes = {name.rstrip('_'): value for name, value in attributes.items()}
+    attributes.setdefault('alt', product.product_name)
+    derivatives = product.product_images
+    if not derivatives:
+        attributes['src'] = product.product_picture
+        return Markup('<img {}>').format(_attributes(attributes))
+
+    def srcset(extension):
+        widths = {d['width']: d[extension] for d in derivatives.values()}
+        return ', '.join(f'{url} {width}w' for width, url in widths.items())
+
+    attributes.update(src=derivatives[size]['jpeg'], srcset=srcset('jpeg'), sizes=sizes, loading='lazy',
+                      width=derivatives[size]['width'], height=derivatives[size]['height'])
+    return Markup('<picture><source type="image/webp" srcset="{}" sizes="{}"><img {}></picture>') \
+        .format(srcset('webp'), sizes, _attributes(attributes))
+
+
+def _attributes(attributes):
+    return Markup(' '.join(f'{name}="{escape(value)}"' for name, value in attributes.items()))
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from flask import abort, send_file
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+"""
+Uploaded media: stored under content-hash names and served with cache headers to match
+"""
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'media')
+HASH_LENGTH = 16  # hex digits of the SHA-256 kept in the file name
+
+# A content-hash name never points at different bytes, so browsers may keep it for good; the older,
+# name-based files could still be overwritten and are only cached for a day
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', 24 * 3600))
+# Hash the name-based files once at startup (and each again only when it changes) to give them strong
+# content ETags; otherwise they get Werkzeug's mtime/size ETag
+PRECOMPUTE_ETAGS = os.getenv('MEDIA_PRECOMPUTE_ETAGS', '1') == '1'
+
+CHUNK_SIZE = 1024 * 1024
+# <hash>.<ext> uploads and their <hash>-<size>.<ext> derivatives
+HASHED_NAME = re.compile(rf'^[0-9a-f]{{{HASH_LENGTH}}}(-[a-z]+)?\.[a-z0-9]+$')
+
+
+def save_upload(file):
+    """
+    Stream an uploaded file into the media folder under the hash of its content. Uploading the same
+    picture twice stores it once.
+
+    :return: URL of the stored file
+    """
+    extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+    os.makedirs(MEDIA_FOLDER, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=MEDIA_FOLDER, prefix='.upload-', delete=False) as temporary:
+        try:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                temporary.write(chunk)
+        except BaseException:
+            os.remove(temporary.name)
+            raise
+    file_name = f'{digest.hexdigest()[:HASH_LENGTH]}{extension}'
+    path = os.path.join(MEDIA_FOLDER, file_name)
+    if os.path.exists(path):
+        os.remove(temporary.name)
+    else:
+        os.replace(temporary.name, path)
+    return f'/media/{file_name}'
+
+
+class ETagManifest:
+    """
+    Content ETags of the name-based media files, keyed by path and checked against the file's mtime and
+    size, so a file is hashed once rather than on every request.
+    """
+
+    def __init__(self):
+        self._etags = {}
+        self._lock = threading.Lock()
+
+    def precompute(self, folder):
+        count = 0
+        for directory, _, file_names in os.walk(folder):
+            for file_name in file_names:
+                if not file_name.startswith('.') and not HASHED_NAME.match(file_name):
+                    self.get(os.path.join(directory, file_name))
+                    count += 1
+        logger.info(f"Precomputed ETags for {count} media files")
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._etags.get(path)
+        if entry and entry[0] == key:
+            return entry[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = digest.hexdigest()[:HASH_LENGTH]
+        with self._lock:
+            self._etags[path] = (key, etag)
+        return etag
+
+
+etag_manifest = ETagManifest()
+
+
+def init_media(app):
+    # With MEDIA_X_SENDFILE=1 the file body is left to the front proxy (X-Sendfile); otherwise Werkzeug
+    # hands the open file to the server's wsgi.file_wrapper, which gunicorn sends with sendfile()
+    app.config['USE_X_SENDFILE'] = os.getenv('MEDIA_X_SENDFILE', '0') == '1'
+    if PRECOMPUTE_ETAGS and os.path.isdir(MEDIA_FOLDER):
+        etag_manifest.precompute(MEDIA_FOLDER)
+
+
+def send_media(filename):
+    """
+    Serve a media file with Range and conditional request (If-None-Match / If-Modified-Since) support.
+    """
+    path = safe_join(MEDIA_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    hashed = HASHED_NAME.match(os.path.basename(path))
+    if hashed:
+        etag, max_age = os.path.splitext(hashed.group(0))[0], IMMUTABLE_MAX_AGE
+    else:
+        etag, max_age = etag_manifest.get(path) if PRECOMPUTE_ETAGS else True, MUTABLE_MAX_AGE
+
+    response = send_file(path, conditional=True, etag=etag, max_age=max_age)
+    response.cache_control.public = True
+    if hashed:
+        response.cache_control.immutable = True
+    return response
@@ -42,9 +42,14 @@ class Product(db.Model):
     previous_price = db.Column(db.Float, nullable=False)
     in_stock = db.Column(db.Integer, nullable=False)
     product_picture = db.Column(db.String(1000), nullable=False)
+    # Resized WebP/JPEG renditions of product_picture, filled in by website/images.py once generated
+    product_images = db.Column(db.JSON)
     flash_sale = db.Column(db.Boolean, default=False)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Backs the keyset pagination of the admin shop items page
+    __table_args__ = (db.Index('ix_product_date_added_id', 'date_added', 'id'),)
+
     # Table Relation
 
     # Product can be in a cart
@@ -71,6 +76,8 @@ class Cart(db.Model):
     product_link = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
 
     # customer product
+    # One line per product in a customer's cart; add_cart_line's upsert relies on it
+    __table_args__ = (db.Index('uq_cart_customer_product', 'customer_link', 'product_link', unique=True),)
 
     def __str__(self):
         return '<Cart %r>' % self.id
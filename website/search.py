@@ -0,0 +1,104 @@
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .models import Product
+
+"""
+Full-text product search backed by an SQLite FTS5 index over product names
+"""
+
+logger = logging.getLogger(__name__)
+
+# Prefix indexes for 2- and 3-character prefixes keep short "as you type" queries fast
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE product_fts USING fts5(
+    product_name, content='product', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)
+"""
+REBUILD_INDEX = "INSERT INTO product_fts(product_fts) VALUES ('rebuild')"
+
+# The index is an external-content table, so these triggers keep it in step with every product write,
+# whether it comes from the admin pages or anywhere else
+SYNC_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, product_name) VALUES (new.id, new.product_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, product_name) VALUES ('delete', old.id, old.product_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF product_name ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, product_name) VALUES ('delete', old.id, old.product_name);
+        INSERT INTO product_fts(rowid, product_name) VALUES (new.id, new.product_name);
+    END
+    """,
+)
+
+SEARCH_QUERY = ("SELECT rowid FROM product_fts WHERE product_fts MATCH :match "
+                "ORDER BY rank LIMIT :limit OFFSET :offset")
+
+MAX_QUERY_TERMS = 8
+
+fts_enabled = False
+
+
+def create_search_index(connection):
+    """
+    Create the FTS5 index and its sync triggers on a SQLAlchemy connection if they don't exist yet,
+    indexing the existing products on first creation.
+    """
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'")).first()
+    for statement in ([] if exists else [CREATE_INDEX, REBUILD_INDEX]) + list(SYNC_TRIGGERS):
+        connection.execute(text(statement))
+
+
+def init_search():
+    global fts_enabled
+    try:
+        with db.engine.begin() as connection:
+            create_search_index(connection)
+        fts_enabled = True
+    except OperationalError as e:
+        # SQLite builds without FTS5 fall back to the old substring match
+        logger.warning(f"Full-text search unavailable, falling back to LIKE: {e}")
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query in which every word must match as a prefix. Words are quoted, so
+    FTS5 syntax typed by the user is searched for literally.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(query, page, per_page):
+    """
+    :return: (products for the page ordered by relevance, whether there is a next page)
+    """
+    offset = (page - 1) * per_page
+    if not fts_enabled:
+        products = Product.query.filter(Product.product_name.ilike(f'%{query}%')) \
+            .order_by(Product.id).offset(offset).limit(per_page + 1).all()
+        return products[:per_page], len(products) > per_page
+
+    match = match_expression(query)
+    if match is None:
+        return [], False
+    ids = db.session.execute(text(SEARCH_QUERY),
+                             {'match': match, 'limit': per_page + 1, 'offset': offset}).scalars().all()
+    rank = {product_id: position for position, product_id in enumerate(ids[:per_page])}
+    products = Product.query.filter(Product.id.in_(rank)).all() if rank else []
+    products.sort(key=lambda product: rank[product.id])
+    return products, len(ids) > per_page
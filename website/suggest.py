@@ -0,0 +1,156 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+from .models import Product
+
+"""
+In-memory autocomplete for the search box
+"""
+
+MAX_ENTRIES = 200000  # index entries held in memory, products and popular queries together
+MAX_SUGGESTION_LENGTH = 100
+MAX_TRACKED_QUERIES = 10000
+MAX_POPULAR_QUERY_LENGTH = 50  # longer queries are not tracked
+POPULAR_QUERY_MIN_COUNT = 3  # searches before a query is offered as a suggestion
+SCAN_LIMIT = 64  # matching entries looked at per lookup before ranking
+
+
+def normalize(value):
+    return ' '.join(re.findall(r'\w+', value.lower()))
+
+
+def word_suffixes(normalized):
+    # "smart watch" is found by typing "sm..." or "wa..."
+    words = normalized.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class SuggestionIndex:
+    """
+    Sorted array of (key, normalized suggestion, suggestion) entries answering prefix lookups with a bisect
+    and a short scan, so a keystroke never reaches the database.
+
+    Product names are indexed under every word, and queries searched at least POPULAR_QUERY_MIN_COUNT times
+    are added as suggestions of their own, as long as they are the start of a word of some product name (so
+    searches for things the shop doesn't sell are never suggested); more often searched suggestions rank first. The array is loaded
+    from the catalog on first use, then kept current by add_product/remove_product. It never grows past
+    MAX_ENTRIES entries.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.loaded = False
+        self._entries = []
+        self._refcounts = {}
+        self._query_counts = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Read the catalog under the lock too: a product added meanwhile is then either in what is read or
+        # added by add_product once loaded is set
+        with self._lock:
+            if self.loaded:
+                return
+            entries = {}
+            for (name,) in Product.query.with_entities(Product.product_name):
+                for entry in self._product_entries(name):
+                    entries[entry] = entries.get(entry, 0) + 1
+            self._refcounts = dict(list(entries.items())[:self.max_entries])
+            self._entries = sorted(self._refcounts)
+            for query, count in self._query_counts.items():
+                if count >= POPULAR_QUERY_MIN_COUNT and self._matches_product(query):
+                    self._add((query, query, query))
+            self.loaded = True
+
+    def suggest(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if not self.loaded:
+            self.load()
+
+        with self._lock:
+            matches = []
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(matches) < SCAN_LIMIT:
+                key, normalized, suggestion = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                matches.append((normalized, suggestion))
+                position += 1
+            counts = self._query_counts
+
+        # A popular query and the product name it matches collapse into one suggestion
+        unique = {}
+        for normalized, suggestion in matches:
+            unique.setdefault(normalized, suggestion)
+        ranked = sorted(unique.items(), key=lambda item: -counts.get(item[0], 0))
+        return [suggestion for _, suggestion in ranked[:limit]]
+
+    def add_product(self, name):
+        with self._lock:
+            if self.loaded:
+                for entry in self._product_entries(name):
+                    self._add(entry)
+
+    def remove_product(self, name):
+        with self._lock:
+            if self.loaded:
+                for entry in self._product_entries(name):
+                    self._remove(entry)
+
+    def record_query(self, query):
+        query = normalize(query)
+        if not query or len(query) > MAX_POPULAR_QUERY_LENGTH:
+            return
+        with self._lock:
+            if query not in self._query_counts and len(self._query_counts) >= MAX_TRACKED_QUERIES:
+                # Forget the less searched half; the popular queries that matter survive the cut
+                kept = sorted(self._query_counts.items(), key=lambda item: -item[1])[:MAX_TRACKED_QUERIES // 2]
+                for forgotten in set(self._query_counts) - {q for q, _ in kept}:
+                    if self._query_counts[forgotten] >= POPULAR_QUERY_MIN_COUNT:
+                        self._remove((forgotten, forgotten, forgotten))
+                self._query_counts = dict(kept)
+            count = self._query_counts.get(query, 0) + 1
+            self._query_counts[query] = count
+            if count == POPULAR_QUERY_MIN_COUNT and self.loaded and self._matches_product(query):
+                self._add((query, query, query))
+
+    def _matches_product(self, query):
+        position = bisect_left(self._entries, (query,))
+        for key, normalized, suggestion in self._entries[position:position + SCAN_LIMIT]:
+            if not key.startswith(query):
+                break
+            # Skip the entries of other popular queries
+            if not (key == normalized == suggestion and key in self._query_counts):
+                return True
+        return False
+
+    @staticmethod
+    def _product_entries(name):
+        suggestion = name.strip()[:MAX_SUGGESTION_LENGTH]
+        normalized = normalize(suggestion)
+        return [(key, normalized, suggestion) for key in word_suffixes(normalized)] if normalized else []
+
+    def _add(self, entry):
+        if entry in self._refcounts:
+            self._refcounts[entry] += 1
+        elif len(self._refcounts) < self.max_entries:
+            self._refcounts[entry] = 1
+            insort(self._entries, entry)
+
+    def _remove(self, entry):
+        count = self._refcounts.get(entry)
+        if count is None:
+            return
+        if count > 1:
+            self._refcounts[entry] = count - 1
+            return
+        del self._refcounts[entry]
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+
+suggestion_index = SuggestionIndex()
@@ -1,9 +1,15 @@
 import uuid
 
 from flask import Blueprint, render_template, flash, redirect, request, jsonify
+from sqlalchemy.orm import joinedload
 from .models import Product, Cart, Order
 from flask_login import login_required, current_user
 from . import db
+from .cache import fragment_cache, catalog_version, bump_catalog_version
+from .cart_lines import add_cart_line
+from .cart_summary import cart_summary
+from .search import search_products
+from .suggest import suggestion_index
 from intasend import APIService
 
 views = Blueprint('views', __name__)
@@ -12,45 +18,47 @@ API_PUBLISHABLE_KEY = 'YOUR_PUBLISHABLE_KEY'
 
 API_TOKEN = 'YOUR_API_TOKEN'
 
+SEARCH_PAGE_SIZE = 24
+
+
+def auth_state():
+    return 'authenticated' if current_user.is_authenticated else 'anonymous'
+
 
 @views.route('/')
 def home():
     if current_user.is_authenticated and current_user.id == 1:
         return redirect('/admin-page')
-    items = Product.query.filter_by(flash_sale=True)
+    # The product grid is the same for every visitor, so it is rendered once per catalog version and
+    # stitched into the per-user page shell
+    product_grid = fragment_cache.get_or_render(
+        ('_product_grid.html', 'flash-sale', catalog_version(), auth_state()),
+        lambda: render_template('_product_grid.html', items=Product.query.filter_by(flash_sale=True).all()))
 
-    return render_template('home.html', items=items, cart=Cart.query.filter_by(customer_link=current_user.id).all()
-    if current_user.is_authenticated else [])
+    return render_template('home.html', product_grid=product_grid,
+                           cart=Cart.query.filter_by(customer_link=current_user.id).all()
+                           if current_user.is_authenticated else [])
 
 
 @views.route('/add-to-cart/<int:item_id>')
 @login_required
 def add_to_cart(item_id):
     item_to_add = Product.query.get(item_id)
-    item_exists = Cart.query.filter_by(product_link=item_id, customer_link=current_user.id).first()
-    if item_exists:
-        try:
-            item_exists.quantity = item_exists.quantity + 1
-            db.session.commit()
-            flash(f' Quantity of {item_exists.product.product_name} has been updated')
-            return redirect(request.referrer)
-        except Exception as e:
-            print('Quantity not Updated', e)
-            flash(f'Quantity of {item_exists.product.product_name} not updated')
-            return redirect(request.referrer)
-
-    new_cart_item = Cart()
-    new_cart_item.quantity = 1
-    new_cart_item.product_link = item_to_add.id
-    new_cart_item.customer_link = current_user.id
+    if item_to_add is None:
+        return render_template('404.html')
 
     try:
-        db.session.add(new_cart_item)
+        # Inserts the line or bumps its quantity in one statement, so double clicks can't duplicate it
+        quantity = add_cart_line(current_user.id, item_to_add.id)
         db.session.commit()
-        flash(f'{new_cart_item.product.product_name} added to cart')
+        if quantity > 1:
+            flash(f' Quantity of {item_to_add.product_name} has been updated')
+        else:
+            flash(f'{item_to_add.product_name} added to cart')
     except Exception as e:
+        db.session.rollback()
         print('Item not added to cart', e)
-        flash(f'{new_cart_item.product.product_name} has not been added to cart')
+        flash(f'{item_to_add.product_name} has not been added to cart')
 
     return redirect(request.referrer)
 
@@ -58,12 +66,10 @@ def add_to_cart(item_id):
 @views.route('/cart')
 @login_required
 def show_cart():
-    cart = Cart.query.filter_by(customer_link=current_user.id).all()
-    amount = 0
-    for item in cart:
-        amount += item.product.current_price * item.quantity
+    cart = Cart.query.options(joinedload(Cart.product)).filter_by(customer_link=current_user.id).all()
+    summary = cart_summary(current_user.id)
 
-    return render_template('cart.html', cart=cart, amount=amount, total=amount + 200)
+    return render_template('cart.html', cart=cart, amount=summary['amount'], total=summary['total'])
 
 
 @views.route('/pluscart')
@@ -75,17 +81,12 @@ def plus_cart():
         cart_item.quantity = cart_item.quantity + 1
         db.session.commit()
 
-        cart = Cart.query.filter_by(customer_link=current_user.id).all()
-
-        amount = 0
-
-        for item in cart:
-            amount += item.product.current_price * item.quantity
+        summary = cart_summary(current_user.id)
 
         data = {
             'quantity': cart_item.quantity,
-            'amount': amount,
-            'total': amount + 200
+            'amount': summary['amount'],
+            'total': summary['total']
         }
 
         return jsonify(data)
@@ -100,17 +101,12 @@ def minus_cart():
         cart_item.quantity = cart_item.quantity - 1
         db.session.commit()
 
-        cart = Cart.query.filter_by(customer_link=current_user.id).all()
-
-        amount = 0
-
-        for item in cart:
-            amount += item.product.current_price * item.quantity
+        summary = cart_summary(current_user.id)
 
         data = {
             'quantity': cart_item.quantity,
-            'amount': amount,
-            'total': amount + 200
+            'amount': summary['amount'],
+            'total': summary['total']
         }
 
         return jsonify(data)
@@ -125,17 +121,12 @@ def remove_cart():
         db.session.delete(cart_item)
         db.session.commit()
 
-        cart = Cart.query.filter_by(customer_link=current_user.id).all()
-
-        amount = 0
-
-        for item in cart:
-            amount += item.product.current_price * item.quantity
+        summary = cart_summary(current_user.id)
 
         data = {
             'quantity': cart_item.quantity,
-            'amount': amount,
-            'total': amount + 200
+            'amount': summary['amount'],
+            'total': summary['total']
         }
 
         return jsonify(data)
@@ -147,9 +138,7 @@ def place_order():
     customer_cart = Cart.query.filter_by(customer_link=current_user.id)
     if customer_cart:
         try:
-            total = 0
-            for item in customer_cart:
-                total += item.product.current_price * item.quantity
+            total = cart_summary(current_user.id)['total']
 
             # service = APIService(token=API_TOKEN, publishable_key=API_PUBLISHABLE_KEY, test=True)
             # create_order_response = service.collect.mpesa_stk_push(phone_number='YOUR_NUMBER ', email=current_user.email,
@@ -182,6 +171,8 @@ def place_order():
 
                 db.session.commit()
 
+            # Stock levels shown on the product grid have changed
+            bump_catalog_version()
             flash('Order Placed Successfully')
 
             return redirect('/orders')
@@ -203,11 +194,30 @@ def order():
 
 @views.route('/search', methods=['GET', 'POST'])
 def search():
-    if request.method == 'POST':
-        search_query = request.form.get('search')
-        items = Product.query.filter(Product.product_name.ilike(f'%{search_query}%')).all()
-        return render_template('search.html', items=items,
-                               cart=Cart.query.filter_by(customer_link=current_user.id).all()
-                               if current_user.is_authenticated else [])
-
-    return render_template('search.html')
+    # The navbar form POSTs the query; result pages link to each other with ?q=...&page=...
+    search_query = request.form.get('search', '') if request.method == 'POST' else request.args.get('q', '')
+    search_query = search_query.strip()
+    if not search_query:
+        return render_template('search.html')
+    page = max(request.args.get('page', 1, type=int), 1)
+    if page == 1:
+        suggestion_index.record_query(search_query)
+
+    def render_results():
+        items, has_next = search_products(search_query, page, SEARCH_PAGE_SIZE)
+        return render_template('_search_results.html', items=items, search_query=search_query, page=page,
+                               has_next=has_next)
+
+    results = fragment_cache.get_or_render(
+        ('_search_results.html', search_query, page, catalog_version(), auth_state()), render_results)
+    return render_template('search.html', results=results, search_query=search_query,
+                           cart=Cart.query.filter_by(customer_link=current_user.id).all()
+                           if current_user.is_authenticated else [])
+
+
+@views.route('/search/suggest')
+def search_suggest():
+    # Answered from memory on every keystroke; see suggest.py
+    response = jsonify({'suggestions': suggestion_index.suggest(request.args.get('q', ''))})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response